@@ -0,0 +1,113 @@
+# backend/akimat_stub_server.py
+"""
+Локальный стенд вместо API акимата — для нагрузочных тестов и проверки ретраев офлайн.
+
+  python akimat_stub_server.py --port 8088 --latency-ms 50 --fail-rate 0.1
+  AKIMAT_ENDPOINT=http://127.0.0.1:8088/api/complaints/batch uvicorn app.main:app
+
+Протокол:
+  POST /api/complaints/batch  {"items": [{"idempotency_key": str, "payload": {...}}]}
+  → 200 {"results": [{"idempotency_key": str, "status": "accepted"|"duplicate"|"rejected", "error"?: str}]}
+  → 503 при симулированном сбое (--fail-rate)
+  GET /stats → счётчики
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_lock = threading.Lock()
+_seen: set[str] = set()
+_stats = {"requests": 0, "items": 0, "accepted": 0, "duplicate": 0, "rejected": 0, "failed_requests": 0}
+
+
+def _make_handler(latency_ms: float, fail_rate: float, reject_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with _lock:
+                    self._send(200, {**_stats, "unique_keys": len(_seen)})
+                return
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/complaints/batch":
+                self._send(404, {"error": "not found"})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, {"error": "invalid json"})
+                return
+
+            if latency_ms > 0:
+                time.sleep(latency_ms / 1000.0)
+
+            with _lock:
+                _stats["requests"] += 1
+                if random.random() < fail_rate:
+                    _stats["failed_requests"] += 1
+                    fail = True
+                else:
+                    fail = False
+            if fail:
+                self._send(503, {"error": "simulated outage"})
+                return
+
+            results = []
+            with _lock:
+                for item in body.get("items", []):
+                    key = item.get("idempotency_key")
+                    _stats["items"] += 1
+                    if not key or not isinstance(item.get("payload"), dict):
+                        _stats["rejected"] += 1
+                        results.append({"idempotency_key": key, "status": "rejected", "error": "bad item"})
+                    elif key in _seen:
+                        _stats["duplicate"] += 1
+                        results.append({"idempotency_key": key, "status": "duplicate"})
+                    elif random.random() < reject_rate:
+                        _stats["rejected"] += 1
+                        results.append({"idempotency_key": key, "status": "rejected", "error": "simulated validation error"})
+                    else:
+                        _seen.add(key)
+                        _stats["accepted"] += 1
+                        results.append({"idempotency_key": key, "status": "accepted"})
+            self._send(200, {"results": results})
+
+        def log_message(self, fmt, *args):  # не засоряем вывод при нагрузке
+            pass
+
+    return Handler
+
+
+def main():
+    p = argparse.ArgumentParser(description="Local stand-in for the akimat batch API.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8088)
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--fail-rate", type=float, default=0.0, help="доля запросов с ответом 503")
+    p.add_argument("--reject-rate", type=float, default=0.0, help="доля элементов со статусом rejected")
+    args = p.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(args.latency_ms, args.fail_rate, args.reject_rate))
+    print(f"Akimat stub listening on http://{args.host}:{args.port}/api/complaints/batch")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
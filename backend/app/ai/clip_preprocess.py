@@ -0,0 +1,97 @@
+# backend/app/ai/clip_preprocess.py
+"""
+Быстрая подготовка фото для CLIP вместо CLIPProcessor(images=...).
+
+- JPEG декодируется в draft-режиме сразу в уменьшенном масштабе (1/2…1/8):
+  12 Мп фото не распаковывается целиком ради картинки 224×224
+- resize короткой стороны до 224 (bicubic, как у CLIPProcessor) + center crop — в C (PIL)
+- rescale/normalize — векторно, сразу в переиспользуемый тензор [N, 3, 224, 224]
+  (свой на каждый поток: приём жалоб идёт из threadpool параллельно)
+- пачка фото декодируется параллельно в пуле потоков (PIL отпускает GIL)
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+
+from ..settings import settings
+
+SIZE = 224
+# Нормализация OpenAI CLIP (та же, что в CLIPProcessor для clip-vit-base-patch32)
+MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+# x / 255 → (x - mean) / std  ≡  x * SCALE - SHIFT (по каналам)
+_SCALE = torch.from_numpy(1.0 / (255.0 * STD)).view(3, 1, 1)
+_SHIFT = torch.from_numpy(MEAN / STD).view(3, 1, 1)
+
+_local = threading.local()
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def load_rgb(path: str, size: int = SIZE) -> np.ndarray:
+    """
+    Фото → uint8 [size, size, 3]: draft-декод, resize короткой стороны, center crop.
+    """
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            # масштаб декодера выбирается так, чтобы обе стороны остались ≥ size
+            img.draft("RGB", (size, size))
+        img = img.convert("RGB")
+
+    w, h = img.size
+    if w <= h:
+        new_w, new_h = size, max(size, int(size * h / w))
+    else:
+        new_w, new_h = max(size, int(size * w / h)), size
+    if (new_w, new_h) != (w, h):
+        img = img.resize((new_w, new_h), Image.BICUBIC)
+
+    left = (new_w - size) // 2
+    top = (new_h - size) // 2
+    img = img.crop((left, top, left + size, top + size))
+    return np.asarray(img, dtype=np.uint8)
+
+
+def _buffer(n: int) -> torch.Tensor:
+    buf = getattr(_local, "buf", None)
+    if buf is None or buf.shape[0] < n:
+        buf = torch.empty((max(n, 1), 3, SIZE, SIZE), dtype=torch.float32)
+        _local.buf = buf
+    return buf[:n]
+
+
+def _fill(out: torch.Tensor, arr: np.ndarray) -> None:
+    # HWC uint8 → CHW float32 нормализованный, без промежуточных тензоров кроме одного view
+    out.copy_(torch.from_numpy(arr).permute(2, 0, 1))
+    out.mul_(_SCALE).sub_(_SHIFT)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.CLIP_PREPROCESS_THREADS, thread_name_prefix="clip-preprocess"
+                )
+    return _pool
+
+
+def preprocess_images(paths: list[str]) -> torch.Tensor:
+    """
+    pixel_values [N, 3, 224, 224] для CLIPModel. Тензор — view на буфер потока:
+    валиден до следующего вызова из этого же потока (модель читает его сразу).
+    """
+    out = _buffer(len(paths))
+    if len(paths) == 1:
+        _fill(out[0], load_rgb(paths[0]))
+        return out
+    for i, arr in enumerate(_executor().map(load_rgb, paths)):
+        _fill(out[i], arr)
+    return out
@@ -1,7 +1,8 @@
 # backend/app/ai/cv_clip.py
-from PIL import Image
-import torch
-from transformers import CLIPProcessor, CLIPModel
+import hashlib
+
+from ..settings import settings
+from ..utils.metrics import model_loading, timed
 
 # Классы (строго по ТЗ)
 LABELS = [
@@ -13,46 +14,83 @@ LABELS = [
     "irrelevant photo (not city issue)",
 ]
 
+# Порог уверенности, ниже которого фото считаем нерелевантным
+RELEVANCE_THRESHOLD = 0.35
+
 _model = None
 _processor = None
+_text_inputs = None  # LABELS не меняются — токенизируем один раз
 
 def _load():
-    global _model, _processor
+    global _model, _processor, _text_inputs
     if _model is None:
-        _model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        _processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-        _model.eval()
+        # torch/transformers импортируем лениво: в режиме заглушек они не нужны
+        from transformers import CLIPProcessor, CLIPModel
+
+        with model_loading("clip"):
+            _model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+            _processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+            _model.eval()
+            _text_inputs = dict(_processor(text=LABELS, return_tensors="pt", padding=True))
     return _model, _processor
 
-def classify_image(image_path: str) -> dict:
-    """
-    Returns:
-      {
-        "cv_label": <one of defined labels mapped to RU/KZ/EN on frontend>,
-        "cv_score": float [0..1],
-        "is_relevant": bool
-      }
-    """
-    model, processor = _load()
 
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(text=LABELS, images=image, return_tensors="pt", padding=True)
+def _stub_classify(image_path: str) -> dict:
+    # Детерминированно по содержимому файла: одно и то же фото → один и тот же ответ
+    with open(image_path, "rb") as fh:
+        h = hashlib.sha1(fh.read()).digest()
+    label = LABELS[h[0] % len(LABELS)]
+    score = 0.3 + (h[1] / 255.0) * 0.69
+    is_relevant = label != "irrelevant photo (not city issue)" and score >= RELEVANCE_THRESHOLD
+    return {"cv_label": label, "cv_score": score, "is_relevant": is_relevant}
 
-    with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits_per_image  # [1, num_labels]
-        probs = logits.softmax(dim=1).cpu().numpy()[0]
 
+def _result(probs) -> dict:
     best_idx = int(probs.argmax())
     best_label = LABELS[best_idx]
     best_score = float(probs[best_idx])
 
     # Порог релевантности: если модель уверена, что "нерелевантно" или низкая уверенность
     is_irrelevant = (best_label == "irrelevant photo (not city issue)")
-    is_relevant = (not is_irrelevant) and (best_score >= 0.35)
+    is_relevant = (not is_irrelevant) and (best_score >= RELEVANCE_THRESHOLD)
 
     return {
         "cv_label": best_label,
         "cv_score": best_score,
         "is_relevant": is_relevant,
-    }
\ No newline at end of file
+    }
+
+
+def classify_image(image_path: str) -> dict:
+    """
+    Returns:
+      {
+        "cv_label": <one of defined labels mapped to RU/KZ/EN on frontend>,
+        "cv_score": float [0..1],
+        "is_relevant": bool
+      }
+    """
+    return classify_images([image_path])[0]
+
+
+@timed("cv")
+def classify_images(image_paths: list[str]) -> list[dict]:
+    """
+    Пачка фото за один прогон модели; декод/препроцессинг — параллельно (clip_preprocess).
+    """
+    if settings.AI_STUB_MODELS:
+        return [_stub_classify(p) for p in image_paths]
+
+    import torch
+
+    from .clip_preprocess import preprocess_images
+
+    model, _ = _load()
+    pixel_values = preprocess_images(image_paths)
+
+    with torch.no_grad():
+        outputs = model(pixel_values=pixel_values, **_text_inputs)
+        logits = outputs.logits_per_image  # [N, num_labels]
+        probs = logits.softmax(dim=1).cpu().numpy()
+
+    return [_result(p) for p in probs]
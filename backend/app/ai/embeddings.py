@@ -5,9 +5,10 @@ from functools import lru_cache
 from typing import List
 
 import torch
-from PIL import Image
 from transformers import CLIPModel, CLIPProcessor
 
+from .clip_preprocess import preprocess_images
+
 
 MODEL_NAME = "openai/clip-vit-base-patch32"
 
@@ -15,6 +16,12 @@ MODEL_NAME = "openai/clip-vit-base-patch32"
 @lru_cache(maxsize=1)
 def _load_clip():
     device = "cuda" if torch.cuda.is_available() else "cpu"
+    if device == "cpu":
+        # на CPU — та же модель, что у классификатора (cv_clip): одна копия весов на процесс
+        from .cv_clip import _load
+
+        model, processor = _load()
+        return model, processor, device
     model = CLIPModel.from_pretrained(MODEL_NAME).to(device)
     processor = CLIPProcessor.from_pretrained(MODEL_NAME)
     model.eval()
@@ -26,17 +33,21 @@ def image_embedding(image_path: str) -> List[float]:
     Возвращает L2-нормализованный embedding изображения (list[float]).
     Используется для duplicate detection (cosine similarity).
     """
-    model, processor, device = _load_clip()
+    return image_embeddings([image_path])[0]
+
 
-    img = Image.open(image_path).convert("RGB")
-    inputs = processor(images=img, return_tensors="pt")
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+def image_embeddings(image_paths: List[str]) -> List[List[float]]:
+    """
+    То же для пачки фото: декод/препроцессинг параллельно, один прогон модели.
+    """
+    model, _, device = _load_clip()
+    pixel_values = preprocess_images(image_paths).to(device)
 
     with torch.no_grad():
-        feats = model.get_image_features(**inputs)  # [1, D]
+        feats = model.get_image_features(pixel_values=pixel_values)  # [N, D]
         feats = feats / feats.norm(dim=-1, keepdim=True).clamp(min=1e-12)
 
-    return feats.squeeze(0).detach().cpu().tolist()
+    return feats.detach().cpu().tolist()
 
 
 def cosine_similarity(a: List[float], b: List[float]) -> float:
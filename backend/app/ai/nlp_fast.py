@@ -0,0 +1,266 @@
+# backend/app/ai/nlp_fast.py
+"""
+Первая ступень NLP-каскада: линейная модель (softmax) по хэшированным
+символьным n-граммам и словам, две головы — category и urgency.
+Работает за микросекунды на CPU без torch; XLM-R вызывается, только если
+уверенность головы ниже NLP_FAST_THRESHOLD (см. nlp_zero_shot.analyze_text).
+
+Модель обучается скриптом train_nlp_fast.py по уже размеченным жалобам
+(разметка — ответы XLM-R) плюс словарь-затравка SEED_LEXICON.
+Нет файла модели → первая ступень выключена, всё идёт в XLM-R.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import re
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..settings import settings
+
+DIM = 1 << 18
+NGRAMS = (3, 4, 5)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Затравка для обучения (ru / kk / en): короткие очевидные формулировки.
+# Ключи — метки CATEGORIES / URGENCY из nlp_zero_shot.
+SEED_LEXICON: dict[str, dict[str, list[str]]] = {
+    "category": {
+        "trash issue": [
+            "мусор", "переполнен контейнер", "мусорный бак", "не вывозят мусор", "отходы",
+            "қоқыс", "контейнер толы", "қоқыс шығарылмайды",
+            "trash", "garbage bin overflowing", "garbage not collected",
+        ],
+        "illegal dump": [
+            "свалка", "стихийная свалка", "строительный мусор выбросили", "незаконная свалка",
+            "заңсыз үйінді", "құрылыс қоқысы төгілген",
+            "illegal dump", "construction waste dumped",
+        ],
+        "yard/road litter": [
+            "мусор во дворе", "мусор на обочине", "пакеты и бутылки", "грязно во дворе",
+            "аулада қоқыс", "жол жиегінде қоқыс",
+            "litter in the yard", "litter on the roadside",
+        ],
+        "broken playground": [
+            "сломаны качели", "детская площадка", "горка сломана", "песочница",
+            "балалар алаңы", "әткеншек сынған",
+            "broken playground", "broken swing", "slide is broken",
+        ],
+        "street lighting problem": [
+            "не горит фонарь", "нет освещения", "темно на улице", "лампа не работает", "фонарь",
+            "жарық жоқ", "шам жанбайды", "көше қараңғы",
+            "street light not working", "lamp post broken", "dark street",
+        ],
+        "road/pavement problem": [
+            "яма на дороге", "разбитый асфальт", "тротуар разбит", "выбоина", "открытый люк", "дорога",
+            "жолда шұңқыр", "асфальт бұзылған", "тротуар бұзылған",
+            "pothole", "broken road", "damaged sidewalk",
+        ],
+        "other city issue": [
+            "шумят соседи", "бродячие собаки", "прорвало трубу", "нет воды",
+            "қаңғыбас иттер", "су жоқ",
+            "stray dogs", "water leak", "noise at night",
+        ],
+    },
+    "urgency": {
+        "high urgency (dangerous, needs immediate fix)": [
+            "опасно", "срочно", "угроза жизни", "ребёнок упал", "авария", "оголённые провода", "открытый люк",
+            "қауіпті", "шұғыл", "бала құлады",
+            "dangerous", "urgent", "emergency", "exposed wires",
+        ],
+        "medium urgency": [
+            "уже неделю", "давно не убирают", "мешает проходу", "просим решить",
+            "бір апта бойы", "өтуге кедергі",
+            "for a week already", "blocks the way",
+        ],
+        "low urgency": [
+            "некрасиво", "желательно", "при возможности", "просьба покрасить",
+            "мүмкіндік болса", "әдемі емес",
+            "would be nice", "when possible", "looks untidy",
+        ],
+    },
+}
+
+
+def norm_lang(lang: str | None) -> str:
+    lang = (lang or "ru").lower()
+    return "kk" if lang in ("kz", "kk") else lang
+
+
+def _bucket(token: str) -> int:
+    # zlib.crc32 — стабильный между процессами (в отличие от hash())
+    return zlib.crc32(token.encode("utf-8")) & (DIM - 1)
+
+
+def features(text: str, lang: str | None) -> dict[int, float]:
+    t = (text or "").lower().replace("ё", "е")
+    words = _WORD_RE.findall(t)
+    feats: dict[int, float] = {_bucket("lang=" + norm_lang(lang)): 1.0}
+    for w in words:
+        i = _bucket("w=" + w)
+        feats[i] = feats.get(i, 0.0) + 1.0
+        padded = f" {w} "
+        for n in NGRAMS:
+            for k in range(max(1, len(padded) - n + 1)):
+                i = _bucket(padded[k:k + n])
+                feats[i] = feats.get(i, 0.0) + 1.0
+    for a, b in zip(words, words[1:]):
+        i = _bucket(f"b={a}_{b}")
+        feats[i] = feats.get(i, 0.0) + 1.0
+    # L2-нормировка: длинные тексты не получают сверхуверенных логитов
+    norm = math.sqrt(sum(v * v for v in feats.values())) or 1.0
+    return {i: v / norm for i, v in feats.items()}
+
+
+def _softmax(z: list[float]) -> list[float]:
+    m = max(z)
+    e = [math.exp(v - m) for v in z]
+    s = sum(e)
+    return [v / s for v in e]
+
+
+@dataclass
+class Head:
+    labels: list[str]
+    weights: dict[int, list[float]]
+    bias: list[float]
+
+    def scores(self, feats: dict[int, float]) -> list[float]:
+        z = list(self.bias)
+        for i, x in feats.items():
+            w = self.weights.get(i)
+            if w is not None:
+                for k in range(len(z)):
+                    z[k] += w[k] * x
+        return _softmax(z)
+
+    def predict(self, feats: dict[int, float]) -> tuple[str, float]:
+        p = self.scores(feats)
+        k = max(range(len(p)), key=p.__getitem__)
+        return self.labels[k], p[k]
+
+
+@dataclass
+class FastTextModel:
+    heads: dict[str, Head]
+
+    def predict(self, text: str, lang: str | None) -> dict[str, tuple[str, float]]:
+        feats = features(text, lang)
+        return {name: head.predict(feats) for name, head in self.heads.items()}
+
+    def save(self, path: Path, min_abs: float = 1e-4) -> None:
+        data = {
+            "version": 1,
+            "dim": DIM,
+            "ngrams": list(NGRAMS),
+            "heads": {
+                name: {
+                    "labels": h.labels,
+                    "bias": [round(b, 6) for b in h.bias],
+                    # почти нулевые веса не храним — файл в разы меньше
+                    "weights": {
+                        str(i): [round(v, 5) for v in w]
+                        for i, w in h.weights.items()
+                        if max(abs(v) for v in w) >= min_abs
+                    },
+                }
+                for name, h in self.heads.items()
+            },
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FastTextModel":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("dim") != DIM or tuple(data.get("ngrams", ())) != NGRAMS:
+            raise ValueError(f"{path}: модель обучена с другими признаками, переобучите train_nlp_fast.py")
+        return cls(
+            heads={
+                name: Head(
+                    labels=h["labels"],
+                    bias=h["bias"],
+                    weights={int(i): w for i, w in h["weights"].items()},
+                )
+                for name, h in data["heads"].items()
+            }
+        )
+
+
+Sample = tuple[str, str, dict[str, str]]  # (текст, язык, голова → метка)
+
+
+def seed_samples() -> list[Sample]:
+    out: list[Sample] = []
+    for head, by_label in SEED_LEXICON.items():
+        for label, phrases in by_label.items():
+            out.extend((p, "", {head: label}) for p in phrases)
+    return out
+
+
+def train(
+    samples: list[Sample],
+    labels: dict[str, list[str]],
+    *,
+    epochs: int = 8,
+    lr: float = 0.5,
+    l2: float = 1e-6,
+    seed: int = 42,
+) -> FastTextModel:
+    """
+    SGD по softmax-регрессии, отдельно для каждой головы. Образец без метки
+    головы (например, из словаря-затравки только для category) её не обучает.
+    """
+    heads = {name: Head(labels=list(ls), weights={}, bias=[0.0] * len(ls)) for name, ls in labels.items()}
+    index = {name: {l: k for k, l in enumerate(ls)} for name, ls in labels.items()}
+    data = [(features(text, lang), y) for text, lang, y in samples]
+    rnd = random.Random(seed)
+
+    for epoch in range(epochs):
+        rnd.shuffle(data)
+        rate = lr / (1.0 + epoch)
+        for feats, y in data:
+            for name, label in y.items():
+                head = heads.get(name)
+                k_true = index.get(name, {}).get(label)
+                if head is None or k_true is None:
+                    continue
+                p = head.scores(feats)
+                p[k_true] -= 1.0  # градиент по логитам: p - onehot
+                n = len(p)
+                for i, x in feats.items():
+                    w = head.weights.get(i)
+                    if w is None:
+                        w = head.weights[i] = [0.0] * n
+                    for k in range(n):
+                        w[k] -= rate * (p[k] * x + l2 * w[k])
+                for k in range(n):
+                    head.bias[k] -= rate * p[k]
+    return FastTextModel(heads=heads)
+
+
+_model: FastTextModel | None = None
+_model_mtime: float | None = None
+
+
+def get_model() -> FastTextModel | None:
+    """
+    Модель из NLP_FAST_MODEL_PATH; перечитывается, если файл переобучили.
+    """
+    global _model, _model_mtime
+    path = settings.NLP_FAST_MODEL_PATH
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        _model, _model_mtime = None, None
+        return None
+    if _model is None or mtime != _model_mtime:
+        _model, _model_mtime = FastTextModel.load(path), mtime
+    return _model
@@ -0,0 +1,100 @@
+# backend/app/ai/nlp_student.py
+"""
+Дистиллированный студент вместо XLM-R large zero-shot: маленький мультиязычный
+энкодер (по умолчанию mMiniLMv2-L6-H384 — сам дистиллирован из XLM-R large)
++ две линейные головы category / urgency поверх mean-pooling.
+
+Обучается distill_nlp.py на разметке учителя; включается NLP_BACKEND=student
+(вторая ступень каскада в nlp_zero_shot.classify_heads).
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import torch
+from torch import nn
+from transformers import AutoModel, AutoTokenizer
+
+from ..settings import settings
+from ..utils.metrics import model_loading
+
+DEFAULT_BASE = "nreimers/mMiniLMv2-L6-H384-distilled-from-XLMR-Large"
+MAX_LEN = 128
+HEADS = ("category", "urgency")
+
+
+class StudentModel(nn.Module):
+    def __init__(self, encoder, n_labels: dict[str, int], dropout: float = 0.1):
+        super().__init__()
+        self.encoder = encoder
+        hidden = encoder.config.hidden_size
+        self.dropout = nn.Dropout(dropout)
+        self.heads = nn.ModuleDict({h: nn.Linear(hidden, n) for h, n in n_labels.items()})
+
+    def forward(self, input_ids, attention_mask) -> dict[str, torch.Tensor]:
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1.0)
+        pooled = self.dropout(pooled)
+        return {h: head(pooled) for h, head in self.heads.items()}
+
+
+def build_student(base: str, labels: dict[str, list[str]]) -> tuple[StudentModel, object]:
+    tokenizer = AutoTokenizer.from_pretrained(base)
+    encoder = AutoModel.from_pretrained(base)
+    return StudentModel(encoder, {h: len(ls) for h, ls in labels.items()}), tokenizer
+
+
+def save_student(model: StudentModel, tokenizer, labels: dict[str, list[str]], path: Path, meta: dict) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    model.encoder.save_pretrained(path / "encoder")
+    tokenizer.save_pretrained(path / "encoder")
+    torch.save(model.heads.state_dict(), path / "heads.pt")
+    (path / "student.json").write_text(
+        json.dumps({"labels": labels, "max_len": MAX_LEN, **meta}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+
+
+def load_student(path: Path, quantize: bool = False) -> tuple[StudentModel, object, dict[str, list[str]]]:
+    meta = json.loads((path / "student.json").read_text(encoding="utf-8"))
+    labels = meta["labels"]
+    tokenizer = AutoTokenizer.from_pretrained(path / "encoder")
+    encoder = AutoModel.from_pretrained(path / "encoder")
+    model = StudentModel(encoder, {h: len(ls) for h, ls in labels.items()})
+    model.heads.load_state_dict(torch.load(path / "heads.pt", map_location="cpu"))
+    model.eval()
+    if quantize:
+        # int8 для Linear-слоёв: на CPU ещё ~2× быстрее, точность почти не меняется
+        model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer, labels
+
+
+_student = None
+
+
+def _load():
+    global _student
+    if _student is None:
+        with model_loading("nlp_student"):
+            _student = load_student(settings.NLP_STUDENT_DIR, quantize=settings.NLP_STUDENT_INT8)
+    return _student
+
+
+@torch.inference_mode()
+def predict_batch(texts: list[str], student=None) -> list[dict[str, tuple[str, float]]]:
+    model, tokenizer, labels = student or _load()
+    enc = tokenizer(texts, padding=True, truncation=True, max_length=MAX_LEN, return_tensors="pt")
+    logits = model(enc["input_ids"], enc["attention_mask"])
+    out: list[dict[str, tuple[str, float]]] = [{} for _ in texts]
+    for head, z in logits.items():
+        probs = z.softmax(dim=-1)
+        conf, idx = probs.max(dim=-1)
+        for i, (c, k) in enumerate(zip(conf.tolist(), idx.tolist())):
+            out[i][head] = (labels[head][k], float(c))
+    return out
+
+
+def predict(text: str) -> dict[str, tuple[str, float]]:
+    return predict_batch([text])[0]
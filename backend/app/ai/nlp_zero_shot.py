@@ -1,5 +1,9 @@
 # backend/app/ai/nlp_zero_shot.py
-from transformers import pipeline
+import hashlib
+
+from ..settings import settings
+from ..utils.metrics import NLP_CASCADE, model_loading, timed
+from . import nlp_fast
 
 # Категории (семантически привязаны к вашему MVP)
 CATEGORIES = [
@@ -23,12 +27,67 @@ _zs = None
 def _load():
     global _zs
     if _zs is None:
-        _zs = pipeline(
-            "zero-shot-classification",
-            model="joeddav/xlm-roberta-large-xnli",
-        )
+        # transformers импортируем лениво: в режиме заглушек он не нужен
+        from transformers import pipeline
+
+        with model_loading("nlp"):
+            _zs = pipeline(
+                "zero-shot-classification",
+                model="joeddav/xlm-roberta-large-xnli",
+            )
     return _zs
 
+
+def _stub_head(txt: str, head: str) -> tuple[str, float]:
+    # Детерминированно по тексту
+    h = hashlib.sha1(txt.encode("utf-8")).digest()
+    if head == "category":
+        return CATEGORIES[h[0] % len(CATEGORIES)], 0.4 + (h[1] / 255.0) * 0.59
+    return URGENCY[h[2] % len(URGENCY)], 0.4 + (h[3] / 255.0) * 0.59
+
+
+def _teacher(txt: str, head: str) -> tuple[str, float]:
+    """
+    Вторая ступень: XLM-R zero-shot по одной голове.
+    """
+    if settings.AI_STUB_MODELS:
+        return _stub_head(txt, head)
+    out = _load()(txt, CATEGORIES if head == "category" else URGENCY, multi_label=False)
+    return out["labels"][0], float(out["scores"][0])
+
+
+def _second_stage(txt: str, heads: list[str]) -> dict[str, tuple[str, float, str]]:
+    if settings.NLP_BACKEND == "student" and not settings.AI_STUB_MODELS:
+        # студент считает обе головы за один проход — берём нужные
+        from . import nlp_student
+
+        pred = nlp_student.predict(txt)
+        return {h: (*pred[h], "student") for h in heads}
+    return {h: (*_teacher(txt, h), "teacher") for h in heads}
+
+
+def classify_heads(txt: str, lang: str) -> dict[str, tuple[str, float, str]]:
+    """
+    Каскад по головам: голова → (метка, уверенность, ступень "fast"|"teacher"|"student").
+    Уверенная голова первой ступени не идёт во вторую; неуверенная — идёт одна
+    (текст, где ясна категория, но не срочность, стоит один вызов XLM-R вместо двух).
+    """
+    fast = nlp_fast.get_model()
+    first = fast.predict(txt, lang) if fast is not None else {}
+    out = {}
+    for head in ("category", "urgency"):
+        label, conf = first.get(head, ("", 0.0))
+        if conf >= settings.NLP_FAST_THRESHOLD:
+            out[head] = (label, conf, "fast")
+    missing = [h for h in ("category", "urgency") if h not in out]
+    if missing:
+        out.update(_second_stage(txt, missing))
+    for head, (_, _, stage) in out.items():
+        NLP_CASCADE.inc(head, stage)
+    return out
+
+
+@timed("nlp")
 def analyze_text(text: str, lang: str) -> dict:
     """
     Returns:
@@ -36,10 +95,10 @@ def analyze_text(text: str, lang: str) -> dict:
         "nlp_category": str,
         "nlp_confidence": float,
         "nlp_urgency": str,
-        "urgency_confidence": float
+        "urgency_confidence": float,
+        "nlp_source": "fast|teacher|student" по головам, напр. "fast/teacher" (None для пустого текста)
       }
     """
-    zs = _load()
     txt = (text or "").strip()
     if not txt:
         return {
@@ -47,14 +106,14 @@ def analyze_text(text: str, lang: str) -> dict:
             "nlp_confidence": 0.0,
             "nlp_urgency": "low urgency",
             "urgency_confidence": 0.0,
+            "nlp_source": None,
         }
 
-    cat = zs(txt, CATEGORIES, multi_label=False)
-    urg = zs(txt, URGENCY, multi_label=False)
-
+    heads = classify_heads(txt, lang)
     return {
-        "nlp_category": cat["labels"][0],
-        "nlp_confidence": float(cat["scores"][0]),
-        "nlp_urgency": urg["labels"][0],
-        "urgency_confidence": float(urg["scores"][0]),
-    }
\ No newline at end of file
+        "nlp_category": heads["category"][0],
+        "nlp_confidence": heads["category"][1],
+        "nlp_urgency": heads["urgency"][0],
+        "urgency_confidence": heads["urgency"][1],
+        "nlp_source": f'{heads["category"][2]}/{heads["urgency"][2]}',
+    }
@@ -1,5 +1,8 @@
 # backend/app/ai/router.py
+from ..utils.metrics import timed
 
+
+@timed("routing")
 def route(cv_label: str, nlp_category: str, nlp_urgency: str, is_relevant: bool) -> dict:
     if not is_relevant:
         return {
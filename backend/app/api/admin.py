@@ -1,100 +1,34 @@
 # backend/app/api/admin.py
 from __future__ import annotations
 
-import json
-from datetime import datetime, timezone
-
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
 from ..db import get_db
-from ..models import Complaint
 from ..settings import settings
-from ..crud import get_complaint, update_complaint
-from ..utils.files import save_image_bytes
+from ..crud import get_complaint
+from ..services.akimat import read_akimat_payload
+from ..services.akimat_dispatch import sweep_eligible
+from ..services.ingestion import attach_after_photo, prepare_for_akimat, queue_for_akimat
+from ..services.notifications import enqueue_notification
+from ..services.sync import delete_complaints
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-def _akimat_quality_gate(c: Complaint) -> tuple[bool, list[str]]:
-    reasons: list[str] = []
-
-    is_relevant = str(getattr(c, "is_relevant", "0")) in ("1", "true", "True")
-    if not is_relevant:
-        reasons.append("AI: нерелевантно городской инфраструктуре.")
-
-    if not getattr(c, "image_path", None):
-        reasons.append("Нет фото-доказательства.")
-
-    text = (getattr(c, "text", "") or "").strip()
-    if len(text) < 20 and float(getattr(c, "cv_score", 0.0) or 0.0) < 0.75:
-        reasons.append("Недостаточно доказательств: короткий текст и низкая уверенность по фото.")
-
-    if getattr(c, "lat", None) is None or getattr(c, "lng", None) is None:
-        reasons.append("Нет координат (lat/lng).")
-
-    # Не отправляем автоматически LOW
-    pr = (getattr(c, "priority_level", "MEDIUM") or "MEDIUM").upper()
-    if pr == "LOW":
-        reasons.append("Низкий приоритет: отправка только вручную/после подтверждения.")
-
-    ok = len(reasons) == 0
-    return ok, reasons
-
-
-def _build_payload(c: Complaint) -> dict:
-    return {
-        "service": "Smart City Shymkent",
-        "type": "city_complaint",
-        "complaint_id": c.id,
-        "created_at": (c.created_at.isoformat() if c.created_at else None),
-        "status": c.status,
-        "location": {"lat": c.lat, "lng": c.lng},
-        "message": {"lang": c.lang, "text": c.text},
-        "ui_category": c.ui_category,
-        "ai": {
-            "cv_label": c.cv_label,
-            "cv_score": c.cv_score,
-            "is_relevant": c.is_relevant,
-            "nlp_category": c.nlp_category,
-            "nlp_urgency": c.nlp_urgency,
-            "nlp_confidence": c.nlp_confidence,
-        },
-        "routing": {
-            "department": c.department,
-            "explain": c.routing_explain,
-        },
-        "priority": {
-            "score": c.priority_score,
-            "level": c.priority_level,
-            "confirmations": c.confirmations,
-            "duplicate_of": c.duplicate_of,
-        },
-        "attachments": [
-            {"type": "image_before", "path": c.image_path},
-        ],
-    }
-
-
-def _export_payload(payload: dict) -> str:
-    file_path = settings.EXPORTS_DIR / f"akimat_payload_{payload.get('complaint_id')}.json"
-    file_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    return str(file_path)
-
-
 @router.post("/akimat/prepare/{complaint_id}")
 def prepare_akimat(complaint_id: str, db: Session = Depends(get_db)):
     c = get_complaint(db, complaint_id)
     if not c:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
-    ok, reasons = _akimat_quality_gate(c)
-    if not ok:
-        return {"ok": False, "reasons": reasons, "payload": None, "export_path": None}
+    reasons, body = prepare_for_akimat(db, c, mark_prepared=False)
+    if reasons:
+        return {"ok": False, "reasons": reasons, "payload": None}
 
-    payload = _build_payload(c)
-    export_path = _export_payload(payload)
-    return {"ok": True, "reasons": [], "payload": payload, "export_path": export_path}
+    # payload уже сериализован — вклеиваем как есть, без json.loads/dumps
+    return Response(content=f'{{"ok":true,"reasons":[],"payload":{body}}}', media_type="application/json")
 
 
 @router.get("/akimat/payload/{complaint_id}")
@@ -103,39 +37,56 @@ def get_akimat_payload(complaint_id: str, db: Session = Depends(get_db)):
     if not c:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
-    payload = _build_payload(c)
-    return payload
+    # только чтение: кэш пишет prepare, здесь устаревший payload собирается без сохранения
+    body = read_akimat_payload(c)
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/akimat/send/{complaint_id}")
 def send_akimat_stub(complaint_id: str, db: Session = Depends(get_db)):
     """
-    Заглушка отправки:
-    - НИЧЕГО реально не отправляет
-    - Только помечает sent_to_akimat и время
+    Ставит жалобу в очередь отправки в акимат:
+    - сама отправка/экспорт — фоновым диспетчером пачками
+    - без AKIMAT_ENDPOINT диспетчер работает как заглушка (только NDJSON-экспорт)
     """
     c = get_complaint(db, complaint_id)
     if not c:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
-    ok, reasons = _akimat_quality_gate(c)
-    if not ok:
-        return {"sent": False, "mode": "stub", "reasons": reasons}
+    return {"sent": False, **queue_for_akimat(db, c)}
 
-    c.sent_to_akimat = True
-    c.akimat_sent_at = datetime.now(timezone.utc)
-    update_complaint(db, c)
 
-    payload = _build_payload(c)
-    export_path = _export_payload(payload)
+@router.post("/akimat/sweep")
+def sweep_akimat(
+    department: str | None = None,
+    status: str | None = Query(default=None, description="Через запятую, например NEW,IN_PROGRESS"),
+    limit: int | None = Query(default=None, ge=1),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Массовая отправка: все жалобы, прошедшие гейт, ставятся в очередь пачками.
+    dry_run=true — только посчитать подходящие.
+    """
+    statuses = tuple(s.strip() for s in status.split(",") if s.strip()) if status else None
+    result = sweep_eligible(db, department=department, statuses=statuses, limit=limit, dry_run=dry_run)
+    return {**result, "mode": "live" if settings.AKIMAT_ENDPOINT else "stub"}
 
-    return {
-        "sent": False,
-        "mode": "stub",
-        "message": "Заглушка: реальная интеграция с акиматом не подключена.",
-        "akimat_marked": True,
-        "export_path": export_path,
-    }
+
+@router.delete("/complaints/{complaint_id}")
+def delete_complaint(complaint_id: str, db: Session = Depends(get_db)):
+    """
+    Удаление (спам/тест). Остаётся tombstone — офлайн-клиенты узнают об удалении через /complaints/changes.
+    """
+    c = get_complaint(db, complaint_id)
+    if not c:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+
+    department = c.department
+    delete_complaints(db, [complaint_id])
+    enqueue_notification(db, "complaint_deleted", {"id": complaint_id}, recipient=department)
+    db.commit()
+    return {"ok": True, "id": complaint_id}
 
 
 @router.post("/complaints/{complaint_id}/after_photo")
@@ -145,18 +96,12 @@ async def upload_after_photo(
     db: Session = Depends(get_db),
 ):
     """
-    MVP before/after:
-    Сейчас в модели нет after_image_path, поэтому:
-    - сохраняем файл
-    - возвращаем путь
-    Позже добавим поле в Complaint и начнём хранить в БД.
+    Before/after: тот же путь, что и /complaints/{id}/after_photo (путь сохраняется в Complaint).
     """
     c = get_complaint(db, complaint_id)
     if not c:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
-    ext = (photo.filename.split(".")[-1] or "jpg").lower()
     content = await photo.read()
-    after_path = save_image_bytes(f"{complaint_id}_after", content, ext=ext)
-
-    return {"ok": True, "complaint_id": complaint_id, "after_image_path": after_path}
+    c = attach_after_photo(db, c, content, photo.filename)
+    return {"ok": True, "complaint_id": complaint_id, "after_image_path": c.after_image_path}
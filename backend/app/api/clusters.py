@@ -0,0 +1,44 @@
+# backend/app/api/clusters.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..models import DuplicateCluster
+from ..schemas import ClusterOut
+from ..services.clusters import find_root
+
+router = APIRouter(prefix="/clusters", tags=["clusters"])
+
+
+@router.get("", response_model=list[ClusterOut])
+def list_clusters(
+    min_members: int = Query(2, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Крупнейшие кластеры дублей. Размер хранится в самом кластере — без подсчёта по жалобам.
+    """
+    return (
+        db.query(DuplicateCluster)
+        .filter(DuplicateCluster.parent_id.is_(None))
+        .filter(DuplicateCluster.member_count >= min_members)
+        .order_by(DuplicateCluster.member_count.desc(), DuplicateCluster.last_seen.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+@router.get("/{cluster_id}", response_model=ClusterOut)
+def get_cluster(cluster_id: str, db: Session = Depends(get_db)):
+    """
+    cluster_id может быть id любой жалобы-основателя, в т.ч. слитого кластера:
+    union-find вернёт актуальный корень.
+    """
+    root = find_root(db, cluster_id)
+    if root is None:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    db.commit()  # сохраняем сжатие пути
+    return root
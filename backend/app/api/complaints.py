@@ -1,191 +1,169 @@
 # backend/app/api/complaints.py
 from __future__ import annotations
 
-import uuid
-from datetime import datetime, timezone
-
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+import anyio
+from fastapi import APIRouter, UploadFile, File, Form, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
 from ..db import get_db
-from ..models import Complaint
-from ..schemas import ComplaintOut, ComplaintPatch
-from ..utils.files import save_image_bytes
-from ..settings import settings
-
-from ..ai.cv_clip import classify_image
-from ..ai.nlp_zero_shot import analyze_text
-from ..ai.router import route
-
-from ..crud import get_complaint, list_complaints, create_complaint as crud_create, apply_patch
+from ..schemas import ComplaintOut, ComplaintPatch, ComplaintSearchHit
+from ..crud import get_complaint, list_complaint_rows
+from ..services.idempotency import MAX_KEY_LENGTH, acquire_key, release_key, request_fingerprint
+from ..services.ingestion import (
+    attach_after_photo,
+    ingest_complaint,
+    prepare_for_akimat,
+    queue_for_akimat,
+    update_status,
+)
+from ..services.search import search_complaints
+from ..utils.admission import inference_gate
+from ..utils.jsonfast import FastJSONResponse
 
 router = APIRouter(prefix="/complaints", tags=["complaints"])
 
 
-# ---- helpers ----
-def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    from math import radians, cos, sin, asin, sqrt
-
-    r = 6371000.0
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    return r * c
-
-
-def _find_geo_duplicate(db: Session, lat: float | None, lng: float | None) -> str | None:
-    """
-    MVP: если есть жалоба в радиусе settings.DUP_RADIUS_METERS — считаем дублем.
-    Возвращаем id "оригинала".
-    """
-    if lat is None or lng is None:
-        return None
-
-    recent = (
-        db.query(Complaint)
-        .filter(Complaint.lat.isnot(None))
-        .filter(Complaint.lng.isnot(None))
-        .order_by(Complaint.created_at.desc())
-        .limit(settings.DUP_SCAN_LIMIT)
-        .all()
-    )
-
-    for c in recent:
-        try:
-            dist = _haversine_m(lat, lng, float(c.lat), float(c.lng))
-        except Exception:
-            continue
-        if dist <= settings.DUP_RADIUS_METERS:
-            return c.id
-
-    return None
-
-
-def _priority_score(urgency: str, confirmations: int, created_at: datetime) -> tuple[float, str]:
-    """
-    Реалистичная простая формула:
-    - urgency: low/medium/high
-    - confirmations: подтверждения/дубликаты
-    - waiting time
-    """
-    urg_map = {"low": 0.2, "medium": 0.6, "high": 1.0}
-    urg = urg_map.get((urgency or "medium").lower(), 0.6)
-
-    conf_norm = min(max(confirmations, 0) / 10.0, 1.0)
-
-    now = datetime.now(timezone.utc)
-    ca = created_at
-    if ca.tzinfo is None:
-        ca = ca.replace(tzinfo=timezone.utc)
-    days = max(0.0, (now - ca).total_seconds() / 86400.0)
-    wait_norm = min(days / 7.0, 1.0)
-
-    score = (0.40 * urg) + (0.35 * conf_norm) + (0.25 * wait_norm)
-
-    if score >= settings.PRIORITY_HIGH:
-        level = "HIGH"
-    elif score >= settings.PRIORITY_MEDIUM:
-        level = "MEDIUM"
-    else:
-        level = "LOW"
-
-    return round(float(score), 3), level
-
-
-# ---- endpoints ----
 @router.post("", response_model=ComplaintOut)
-async def create(
+async def create_complaint(
+    response: Response,
     photo: UploadFile = File(...),
     text: str = Form(""),
     ui_category: str = Form(""),
     lat: str = Form(""),
     lng: str = Form(""),
     lang: str = Form("ru"),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
 ):
-    complaint_id = str(uuid.uuid4())
-
-    # Save image
-    ext = (photo.filename.split(".")[-1] or "jpg").lower()
     content = await photo.read()
-    image_path = save_image_bytes(complaint_id, content, ext=ext)
-
-    # Parse geo
-    lat_val = float(lat) if str(lat).strip() else None
-    lng_val = float(lng) if str(lng).strip() else None
-
-    # AI
-    cv = classify_image(image_path)
-    nlp = analyze_text(text, lang)
-    routing = route(
-        cv_label=cv["cv_label"],
-        nlp_category=nlp["nlp_category"],
-        nlp_urgency=nlp["nlp_urgency"],
-        is_relevant=cv["is_relevant"],
-    )
-
-    status = "REJECTED" if not cv["is_relevant"] else "NEW"
-
-    # Duplicate (geo MVP)
-    duplicate_of = _find_geo_duplicate(db, lat_val, lng_val)
-
-    # confirmations: если это дубль — увеличим подтверждения у оригинала
-    confirmations = 1
-    if duplicate_of:
-        orig = get_complaint(db, duplicate_of)
-        if orig:
-            orig.confirmations = int(orig.confirmations or 0) + 1
-            db.commit()
-        confirmations = 0  # сам дубль не считается отдельным подтверждением
-
-    created_at = datetime.utcnow()
-    score, level = _priority_score(nlp.get("nlp_urgency", "medium"), max(1, confirmations), created_at)
-
-    obj = Complaint(
-        id=complaint_id,
-        created_at=created_at,
-
-        lang=lang,
-        text=text or "",
-        ui_category=ui_category or "",
-        lat=lat_val,
-        lng=lng_val,
-        image_path=image_path,
-        status=status,
+    key = (idempotency_key or "").strip() or None
+    if key:
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH}")
+        fp = request_fingerprint(content, text=text, ui_category=ui_category, lat=lat, lng=lng, lang=lang)
+        claim = await acquire_key(db, key, fp)
+        if claim.state == "mismatch":
+            raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+        if claim.state == "gone":
+            raise HTTPException(status_code=410, detail="Complaint created with this Idempotency-Key was deleted")
+        if claim.state == "pending":
+            raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is still in progress")
+        if claim.state == "done":
+            # повтор: отдаём жалобу первого запроса, ничего не пересчитывая
+            obj = get_complaint(db, claim.complaint_id)
+            if not obj:
+                raise HTTPException(status_code=404, detail="Complaint not found")
+            response.headers["Idempotent-Replayed"] = "true"
+            return obj
+
+    # CV/NLP блокируют — уводим весь пайплайн из event loop, не больше INFERENCE_MAX_INFLIGHT сразу
+    started = False
+
+    def _ingest():
+        nonlocal started
+        started = True  # дальше ключ ведёт сам ingest_complaint: DONE в коммите жалобы или release при ошибке
+        return ingest_complaint(
+            db,
+            content=content,
+            filename=photo.filename,
+            text=text,
+            ui_category=ui_category,
+            lat=lat,
+            lng=lng,
+            lang=lang,
+            idempotency_key=key,
+        )
+
+    try:
+        ctx = await inference_gate.run(lambda: run_in_threadpool(_ingest))
+    except BaseException:
+        # отказ или разрыв соединения, пока ждали слот: без этого ключ висел бы
+        # PENDING до locked_until, и повтор клиента получал бы 409
+        if key and not started:
+            with anyio.CancelScope(shield=True):  # отменённый запрос: иначе await тут же отменится снова
+                await run_in_threadpool(release_key, db, key)
+        raise
+    return ctx.complaint
+
+
+@router.get("", response_model=list[ComplaintOut], response_class=FastJSONResponse)
+def list_complaints(
+    limit: int | None = Query(default=None, ge=1),
+    offset: int = Query(default=0, ge=0),
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+):
+    # Возвращаем Response сами: FastAPI не гоняет строки через ComplaintOut,
+    # response_model остаётся только для OpenAPI
+    rows = list_complaint_rows(db, limit=limit, offset=offset, include_archived=include_archived)
+    return FastJSONResponse(rows)
+
+
+@router.get("/search", response_model=list[ComplaintSearchHit], response_class=FastJSONResponse)
+def search(
+    q: str = Query(min_length=1, max_length=200),
+    status: list[str] | None = Query(default=None),
+    department: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+):
+    # архив (complaints_archive) не индексируется: явный отказ вместо молча неполной выдачи
+    if include_archived:
+        raise HTTPException(status_code=422, detail="Search does not cover archived complaints")
+    # status можно повторять: ?status=NEW&status=IN_PROGRESS
+    rows = search_complaints(db, q, statuses=status, department=department, limit=limit, offset=offset)
+    return FastJSONResponse(rows)
 
-        cv_label=cv.get("cv_label", ""),
-        cv_score=float(cv.get("cv_score", 0.0) or 0.0),
-        is_relevant="1" if cv.get("is_relevant", False) else "0",
 
-        nlp_category=nlp.get("nlp_category", ""),
-        nlp_urgency=nlp.get("nlp_urgency", ""),
-        nlp_confidence=float(nlp.get("nlp_confidence", 0.0) or 0.0),
+@router.patch("/{complaint_id}", response_model=ComplaintOut)
+def patch_complaint(complaint_id: str, payload: ComplaintPatch, db: Session = Depends(get_db)):
+    obj = get_complaint(db, complaint_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    return update_status(db, obj, payload.status)
 
-        department=routing.get("department", ""),
-        routing_explain=routing.get("routing_explain", ""),
 
-        priority_score=score,
-        priority_level=level,
-        confirmations=confirmations,
+@router.post("/{complaint_id}/after_photo", response_model=ComplaintOut)
+def upload_after_photo(
+    complaint_id: str,
+    photo: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    # обычный def: FastAPI выполняет его в threadpool — запрос к БД, запись файла
+    # и коммит не блокируют event loop
+    obj = get_complaint(db, complaint_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Complaint not found")
 
-        duplicate_of=duplicate_of,
+    content = photo.file.read()
+    return attach_after_photo(db, obj, content, photo.filename)
 
-        sent_to_akimat=False,
-        akimat_sent_at=None,
-    )
 
-    return crud_create(db, obj)
+@router.post("/{complaint_id}/prepare_akimat")
+def prepare_akimat(complaint_id: str, db: Session = Depends(get_db)):
+    obj = get_complaint(db, complaint_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Complaint not found")
 
+    reasons, body = prepare_for_akimat(db, obj)
+    if reasons:
+        return {"ok": False, "reasons": reasons, "payload": None}
 
-@router.get("", response_model=list[ComplaintOut])
-def get_all(db: Session = Depends(get_db)):
-    return list_complaints(db)
+    # payload уже сериализован — вклеиваем как есть, без json.loads/dumps
+    return Response(content=f'{{"ok":true,"reasons":[],"payload":{body}}}', media_type="application/json")
 
 
-@router.patch("/{complaint_id}", response_model=ComplaintOut)
-def patch(complaint_id: str, payload: ComplaintPatch, db: Session = Depends(get_db)):
+@router.post("/{complaint_id}/send_to_akimat")
+def send_to_akimat(complaint_id: str, db: Session = Depends(get_db)):
     obj = get_complaint(db, complaint_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Complaint not found")
-    return apply_patch(db, obj, payload)
+
+    if not obj.akimat_payload:
+        raise HTTPException(status_code=400, detail="Not prepared. Call /prepare_akimat first.")
+
+    return queue_for_akimat(db, obj)
@@ -0,0 +1,79 @@
+# backend/app/api/live.py
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..db import SessionLocal
+from ..services.live_feed import feed_broker, fetch_events
+from ..settings import settings
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+
+def _catch_up(after_id: int, department: str | None) -> list[tuple[int, str, str]]:
+    # пропущенные события постранично, пока не догоним текущий конец ленты
+    db = SessionLocal()
+    try:
+        out: list[tuple[int, str, str]] = []
+        while True:
+            page = fetch_events(db, after_id, department)
+            out.extend(page)
+            if len(page) < settings.FEED_CATCHUP_LIMIT:
+                return out
+            after_id = page[-1][0]
+    finally:
+        db.close()
+
+
+@router.get("/complaints")
+async def complaints_feed(
+    request: Request,
+    department: str | None = None,
+    last_event_id: int | None = Query(default=None, ge=0),
+    last_event_id_header: str | None = Header(default=None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events: create / patch / after_photo / akimat события.
+    - department — только события своего департамента
+    - Last-Event-ID (заголовок, его шлёт EventSource при переподключении) или ?last_event_id=
+      — сначала досылаются пропущенные события, потом живой поток
+    В data — событие и актуальная строка жалобы (формат GET /complaints).
+    """
+    after = last_event_id
+    if last_event_id_header and last_event_id_header.isdigit():
+        after = int(last_event_id_header)
+
+    # подписываемся до догоняющего запроса, чтобы не потерять события между ними
+    sub = feed_broker.subscribe(department)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            replayed: set[int] = set()
+            if after is not None:
+                for event_id, _, msg in await asyncio.to_thread(_catch_up, after, department):
+                    replayed.add(event_id)
+                    yield msg
+
+            while not sub.closed:
+                try:
+                    event_id, msg = await asyncio.wait_for(sub.queue.get(), timeout=settings.FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if event_id in replayed:
+                    continue
+                yield msg
+        finally:
+            feed_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
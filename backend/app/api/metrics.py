@@ -0,0 +1,49 @@
+# backend/app/api/metrics.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..ai import cv_clip, nlp_zero_shot
+from ..db import get_db
+from ..models import AkimatSubmission, Complaint, NotificationOutbox, OPEN_STATUSES
+from ..services.live_feed import feed_broker
+from ..utils.admission import inference_gate
+from ..utils.metrics import MODEL_LOADED, QUEUE_DEPTH, render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _refresh_gauges(db: Session) -> None:
+    # Глубины очередей считаем в момент опроса — Prometheus ходит раз в 15–60 с
+    QUEUE_DEPTH.set(
+        db.query(func.count(NotificationOutbox.id)).filter(NotificationOutbox.status == "PENDING").scalar() or 0,
+        "notifications",
+    )
+    QUEUE_DEPTH.set(
+        db.query(func.count(AkimatSubmission.id)).filter(AkimatSubmission.status == "PENDING").scalar() or 0,
+        "akimat",
+    )
+    QUEUE_DEPTH.set(
+        db.query(func.count(Complaint.id)).filter(Complaint.status.in_(OPEN_STATUSES)).scalar() or 0,
+        "complaints_open",
+    )
+    inflight, waiting = inference_gate.stats()
+    QUEUE_DEPTH.set(inflight, "inference_inflight")
+    QUEUE_DEPTH.set(waiting, "inference_waiting")
+    subscribers, buffered = feed_broker.queue_stats()
+    QUEUE_DEPTH.set(subscribers, "live_subscribers")
+    QUEUE_DEPTH.set(buffered, "live_buffered")
+
+    MODEL_LOADED.set(cv_clip._model is not None, "clip")
+    MODEL_LOADED.set(nlp_zero_shot._zs is not None, "nlp")
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(db: Session = Depends(get_db)):
+    _refresh_gauges(db)
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,62 @@
+# backend/app/api/queue.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..schemas import ComplaintOut
+from ..settings import settings
+from ..services.work_queue import claim_next, peek_queue, release_claim, renew_claim
+
+router = APIRouter(prefix="/queue", tags=["queue"])
+
+# department может содержать "/" ("Коммунальные службы / Санитария"),
+# поэтому в путях используется конвертер :path, а claim-операции по id
+# объявлены раньше, чтобы не перехватываться им.
+
+
+@router.post("/claims/{complaint_id}/renew")
+def renew(
+    complaint_id: str,
+    worker: str = Query(..., min_length=1),
+    lease_s: int = Query(settings.QUEUE_LEASE_SECONDS, ge=10, le=3600),
+    db: Session = Depends(get_db),
+):
+    if not renew_claim(db, complaint_id, worker, lease_s):
+        raise HTTPException(status_code=409, detail="Claim not held by this worker or expired")
+    return {"ok": True, "complaint_id": complaint_id, "lease_s": lease_s}
+
+
+@router.post("/claims/{complaint_id}/release")
+def release(complaint_id: str, worker: str = Query(..., min_length=1), db: Session = Depends(get_db)):
+    if not release_claim(db, complaint_id, worker):
+        raise HTTPException(status_code=409, detail="Claim not held by this worker")
+    return {"ok": True, "complaint_id": complaint_id}
+
+
+@router.post("/{department:path}/claim", response_model=list[ComplaintOut])
+def claim(
+    department: str,
+    worker: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=settings.QUEUE_MAX_LIMIT),
+    lease_s: int = Query(settings.QUEUE_LEASE_SECONDS, ge=10, le=3600),
+    db: Session = Depends(get_db),
+):
+    """
+    Забрать следующие N жалоб департамента в работу (lease на lease_s секунд).
+    Параллельные диспетчеры получают непересекающиеся наборы.
+    """
+    return claim_next(db, department, worker=worker, limit=limit, lease_s=lease_s)
+
+
+@router.get("/{department:path}", response_model=list[ComplaintOut])
+def get_queue(
+    department: str,
+    limit: int = Query(10, ge=1, le=settings.QUEUE_MAX_LIMIT),
+    db: Session = Depends(get_db),
+):
+    """
+    Следующие N самых срочных открытых жалоб департамента (без захвата).
+    """
+    return peek_queue(db, department, limit)
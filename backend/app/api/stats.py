@@ -9,28 +9,29 @@ router = APIRouter(prefix="/stats", tags=["stats"])
 
 
 @router.get("/summary")
-def get_summary(db: Session = Depends(get_db)):
+def get_summary(include_archived: bool = False, db: Session = Depends(get_db)):
     """
     Общая статистика:
     - общее количество
     - по статусам
     - по категориям
     - по приоритетам
+    include_archived — вместе с архивом закрытых жалоб
     """
-    return stats_summary(db)
+    return stats_summary(db, include_archived=include_archived)
 
 
 @router.get("/trends")
-def get_trends(days: int = 7, db: Session = Depends(get_db)):
+def get_trends(days: int = 7, include_archived: bool = False, db: Session = Depends(get_db)):
     """
     Тренды за N дней
     """
-    return stats_trends(db, days)
+    return stats_trends(db, days, include_archived=include_archived)
 
 
 @router.get("/heatmap")
-def get_heatmap(grid_size: float = 0.01, db: Session = Depends(get_db)):
+def get_heatmap(grid_size: float = 0.01, include_archived: bool = False, db: Session = Depends(get_db)):
     """
     Простая heatmap-агрегация
     """
-    return stats_heatmap(db, grid_size)
+    return stats_heatmap(db, grid_size, include_archived=include_archived)
@@ -0,0 +1,31 @@
+# backend/app/api/sync.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..services.sync import changes_since
+from ..settings import settings
+from ..utils.jsonfast import FastJSONResponse
+
+router = APIRouter(prefix="/complaints", tags=["sync"])
+
+
+@router.get("/changes", response_class=FastJSONResponse)
+def complaint_changes(
+    since: str | None = None,
+    limit: int = Query(default=settings.SYNC_PAGE_LIMIT, ge=1, le=settings.SYNC_MAX_LIMIT),
+    db: Session = Depends(get_db),
+):
+    """
+    Delta-sync для офлайн-клиентов:
+    - без since — полный снимок (страницами), дальше — только изменения
+    - changed: массивы значений в порядке columns (без повторения ключей)
+    - deleted: id удалённых жалоб
+    - more=true → сразу запросить следующую страницу с новым token
+    """
+    try:
+        return FastJSONResponse(changes_since(db, since, limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,20 @@
 # backend/app/crud.py
 from __future__ import annotations
 
+from datetime import datetime
+from typing import Any, Iterator
+
+from sqlalchemy import select, union_all
 from sqlalchemy.orm import Session
 
-from .models import Complaint
-from .schemas import ComplaintPatch
+from .models import Complaint, complaints_archive
+from .schemas import ComplaintOut
+
+# Колонки списка = поля ComplaintOut (кроме вычисляемого sent_to_akimat)
+LIST_COLUMNS = tuple(getattr(Complaint, name) for name in ComplaintOut.model_fields if name != "sent_to_akimat")
+_LIST_KEYS = tuple(c.key for c in LIST_COLUMNS)
+# Те же колонки в архиве закрытых жалоб
+ARCHIVE_LIST_COLUMNS = tuple(complaints_archive.c[k] for k in _LIST_KEYS)
 
 
 def get_complaint(db: Session, complaint_id: str) -> Complaint | None:
@@ -15,6 +25,70 @@ def list_complaints(db: Session) -> list[Complaint]:
     return db.query(Complaint).order_by(Complaint.created_at.desc()).all()
 
 
+def list_complaint_rows(
+    db: Session,
+    limit: int | None = None,
+    offset: int = 0,
+    include_archived: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    Быстрый путь для GET /complaints: только нужные колонки через Core select —
+    без ORM-объектов, identity map и валидации ComplaintOut на каждую строку.
+    Результат — готовые dict в формате ComplaintOut.
+    include_archived — вместе с архивом (UNION ALL, общий порядок по created_at).
+    """
+    if include_archived:
+        u = union_all(select(*LIST_COLUMNS), select(*ARCHIVE_LIST_COLUMNS)).subquery()
+        q = select(*(u.c[k] for k in _LIST_KEYS)).order_by(u.c.created_at.desc())
+    else:
+        q = select(*LIST_COLUMNS).order_by(Complaint.created_at.desc())
+    if offset:
+        q = q.offset(offset)
+    if limit is not None:
+        q = q.limit(limit)
+
+    return [_row_dict(row) for row in db.execute(q)]
+
+
+def complaint_rows_by_ids(db: Session, ids: list[str]) -> dict[str, dict[str, Any]]:
+    if not ids:
+        return {}
+    rows = db.execute(select(*LIST_COLUMNS).where(Complaint.id.in_(ids)))
+    return {r.id: _row_dict(r) for r in rows}
+
+
+def iter_complaint_rows(
+    db: Session,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    include_archived: bool = True,
+    chunk: int = 5000,
+) -> Iterator[dict[str, Any]]:
+    """
+    Выгрузка: жалобы за [start, end) по created_at, сначала горячие, затем архив
+    (поле archived). Потоково — архив целиком в память не грузится.
+    """
+    sources = [(LIST_COLUMNS, False)] + ([(ARCHIVE_LIST_COLUMNS, True)] if include_archived else [])
+    for cols, archived in sources:
+        created = cols[_LIST_KEYS.index("created_at")]
+        q = select(*cols).order_by(created.asc())
+        if start is not None:
+            q = q.where(created >= start)
+        if end is not None:
+            q = q.where(created < end)
+        for row in db.execute(q.execution_options(yield_per=chunk)):
+            d = _row_dict(row)
+            d["archived"] = archived
+            yield d
+
+
+def _row_dict(row) -> dict[str, Any]:
+    d = dict(zip(_LIST_KEYS, row))
+    d["sent_to_akimat"] = d["akimat_status"] in ("STUB_SENT", "SENT")
+    return d
+
+
 def create_complaint(db: Session, obj: Complaint) -> Complaint:
     db.add(obj)
     db.commit()
@@ -26,15 +100,3 @@ def update_complaint(db: Session, obj: Complaint) -> Complaint:
     db.commit()
     db.refresh(obj)
     return obj
-
-
-def apply_patch(db: Session, obj: Complaint, payload: ComplaintPatch) -> Complaint:
-    if payload.status is not None:
-        obj.status = payload.status
-
-    if payload.confirmations is not None:
-        obj.confirmations = int(payload.confirmations)
-
-    db.commit()
-    db.refresh(obj)
-    return obj
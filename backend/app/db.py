@@ -17,7 +17,8 @@ is_sqlite = DATABASE_URL.startswith("sqlite")
 
 engine_kwargs = {}
 if is_sqlite:
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
+    # timeout — сколько ждать write-lock (dedup жалоб в одном месте идёт по очереди)
+    engine_kwargs["connect_args"] = {"check_same_thread": False, "timeout": 30}
 
 engine = create_engine(DATABASE_URL, **engine_kwargs)
 
@@ -0,0 +1,96 @@
+# backend/app/migrations.py
+"""
+Схема БД без Alembic: create_all создаёт только отсутствующие таблицы, а колонки
+и индексы, добавленные в модели позже (updated_at, payload_version, claimed_by, ...),
+в уже существующих таблицах не появляются — и каждый SELECT падает с "no such column".
+
+upgrade_schema (при старте API и в CLI, работающих с боевой БД) идемпотентно
+доводит существующую БД до моделей:
+- недостающие колонки — ALTER TABLE ADD COLUMN, старые строки заполняются default
+  (NOT NULL — только если у колонки есть server_default: иначе ADD COLUMN на
+  непустой таблице невозможен)
+- недостающие индексы — CREATE INDEX; устаревшие (OBSOLETE_INDEXES) — DROP INDEX
+Удаление/переименование колонок и смена типов — не здесь.
+"""
+from __future__ import annotations
+
+from sqlalchemy import Column, Table, inspect, text
+
+from .db import Base
+from . import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+
+# индексы, заменённые другими: (таблица, имя)
+OBSOLETE_INDEXES: tuple[tuple[str, str], ...] = (
+    ("complaints", "ix_complaints_queue"),  # → ix_complaints_queue_order (+ created_at)
+)
+
+# чем заполнить новую колонку у старых строк, если не default: колонка → другая колонка
+_BACKFILL_FROM = {"updated_at": "created_at"}
+
+
+def _column_ddl(engine, column: Column) -> str:
+    dialect = engine.dialect
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def _backfill_value(column: Column):
+    default = column.default
+    if default is None:
+        return None
+    if default.is_callable:
+        return default.arg(None)
+    if default.is_scalar:
+        return default.arg
+    return None
+
+
+def _add_missing_columns(engine, conn, table: Table, existing: set[str]) -> list[str]:
+    done = []
+    quote = engine.dialect.identifier_preparer.quote
+    for column in table.columns:
+        if column.name in existing or column.primary_key:
+            continue
+        conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {_column_ddl(engine, column)}"))
+        source = _BACKFILL_FROM.get(column.name)
+        if source in existing:
+            conn.execute(text(f"UPDATE {quote(table.name)} SET {quote(column.name)} = {quote(source)}"))
+        elif column.server_default is None:
+            value = _backfill_value(column)
+            if value is not None:
+                conn.execute(
+                    table.update().where(table.c[column.name].is_(None)).values({column.name: value})
+                )
+        done.append(f"{table.name}.{column.name}")
+    return done
+
+
+def upgrade_schema(engine) -> list[str]:
+    """
+    create_all + недостающие колонки/индексы. → список изменений (пусто — схема актуальна).
+    """
+    Base.metadata.create_all(bind=engine)
+    insp = inspect(engine)
+    done: list[str] = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            done += _add_missing_columns(engine, conn, table, existing)
+
+        quote = engine.dialect.identifier_preparer.quote
+        for table_name, index_name in OBSOLETE_INDEXES:
+            if index_name in {i["name"] for i in insp.get_indexes(table_name)}:
+                conn.execute(text(f"DROP INDEX {quote(index_name)}"))
+                done.append(f"-{index_name}")
+
+        for table in Base.metadata.sorted_tables:
+            indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    done.append(index.name)
+    return done
@@ -1,15 +1,22 @@
 # backend/app/models.py
-from sqlalchemy import String, Float, DateTime, Text, Integer
+from sqlalchemy import Column, String, Float, DateTime, Text, Integer, Index, LargeBinary, Table
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 from .db import Base
 
+# Статусы, по которым жалоба ещё "в работе"
+OPEN_STATUSES = ("NEW", "IN_PROGRESS")
+
 
 class Complaint(Base):
     __tablename__ = "complaints"
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # onupdate срабатывает на любой UPDATE через SQLAlchemy (ORM, bulk, Core) — для delta-sync
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True
+    )
 
     lang: Mapped[str] = mapped_column(String, default="ru")
     text: Mapped[str] = mapped_column(Text, default="")
@@ -31,23 +38,33 @@ class Complaint(Base):
     nlp_category: Mapped[str] = mapped_column(String, default="")
     nlp_urgency: Mapped[str] = mapped_column(String, default="")
     nlp_confidence: Mapped[float] = mapped_column(Float, default=0.0)
+    # Кто разметил category/urgency в каскаде: "fast/teacher" и т.п.; NULL — до каскада (XLM-R)
+    nlp_source: Mapped[str | None] = mapped_column(String, nullable=True)
 
     # Routing
     department: Mapped[str] = mapped_column(String, default="")
     routing_explain: Mapped[str] = mapped_column(Text, default="")
 
     # Duplicate / confirmations / priority
-    duplicate_group_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    duplicate_group_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
     duplicates_count: Mapped[int] = mapped_column(Integer, default=0)
     confirmations: Mapped[int] = mapped_column(Integer, default=1)
-    duplicate_of: Mapped[str | None] = mapped_column(String, nullable=True)  # id "главной" жалобы
+    duplicate_of: Mapped[str | None] = mapped_column(String, nullable=True, index=True)  # id "главной" жалобы
+    # JSON: что сказал каждый сигнал дедупа (geo / text) и какой из них решил
+    duplicate_explain: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # похожая по тексту жалоба, когда группа — своя по координатам (гео-кластер не трогаем)
+    text_duplicate_of: Mapped[str | None] = mapped_column(String, nullable=True)
 
     priority_score: Mapped[float] = mapped_column(Float, default=0.0)
     priority_level: Mapped[str] = mapped_column(String, default="LOW")  # LOW|MEDIUM|HIGH
 
+    # Растёт при каждом изменении полей, входящих в payload для акимата (кэш akimat_payload)
+    payload_version: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
+
     # Akimat pipeline (prototype)
-    akimat_status: Mapped[str | None] = mapped_column(String, nullable=True)  # PREPARED|STUB_SENT|SENT|FAILED
-    akimat_payload: Mapped[str | None] = mapped_column(Text, nullable=True)   # JSON string
+    akimat_status: Mapped[str | None] = mapped_column(String, nullable=True)  # PREPARED|QUEUED|STUB_SENT|SENT|FAILED
+    akimat_payload: Mapped[str | None] = mapped_column(Text, nullable=True)   # канонический компактный JSON
+    akimat_payload_version: Mapped[int | None] = mapped_column(Integer, nullable=True)  # payload_version, для которой собран akimat_payload
     akimat_sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     @property
@@ -56,3 +73,209 @@ class Complaint(Base):
 
     # Before / After
     after_image_path: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    # Очередь диспетчеров: кто взял жалобу в работу и до какого времени (lease)
+    claimed_by: Mapped[str | None] = mapped_column(String, nullable=True)
+    claim_expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+# "Следующие N самых срочных по департаменту" — без сортировки: work_queue читает
+# по одному статусу (равенство по department, status), дальше строки уже в порядке очереди
+Index(
+    "ix_complaints_queue_order",
+    Complaint.department,
+    Complaint.status,
+    Complaint.priority_score.desc(),
+    Complaint.created_at,
+)
+
+
+# Архив закрытых жалоб (services/archive.py): те же колонки, что у complaints, + archived_at.
+# Горячая таблица остаётся маленькой — в ней только то, с чем работают диспетчеры.
+complaints_archive = Table(
+    "complaints_archive",
+    Base.metadata,
+    *(
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+        for c in Complaint.__table__.columns
+    ),
+    Column("archived_at", DateTime, nullable=False, index=True),
+)
+Index("ix_complaints_archive_created_at", complaints_archive.c.created_at)
+Index("ix_complaints_archive_status", complaints_archive.c.status)
+
+
+class PriorityTransition(Base):
+    """
+    Журнал смены priority_level при периодическом пересчёте.
+    """
+    __tablename__ = "priority_transitions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    complaint_id: Mapped[str] = mapped_column(String, index=True)
+    from_level: Mapped[str] = mapped_column(String)
+    to_level: Mapped[str] = mapped_column(String)
+    score: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class DuplicateCluster(Base):
+    """
+    Кластер дублей (одна проблема в одном месте).
+    id = id первой жалобы кластера. parent_id — union-find: None у корня,
+    у слитого кластера указывает на кластер, в который его влили.
+    """
+    __tablename__ = "duplicate_clusters"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    parent_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+
+    # ячейка геосетки центроида — для O(1) поиска соседей
+    cell_key: Mapped[str] = mapped_column(String, index=True)
+    centroid_lat: Mapped[float] = mapped_column(Float)
+    centroid_lng: Mapped[float] = mapped_column(Float)
+
+    member_count: Mapped[int] = mapped_column(Integer, default=1)
+    first_seen: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_seen: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    priority_max: Mapped[float] = mapped_column(Float, default=0.0)
+    priority_sum: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class DedupCellLock(Base):
+    """
+    Строка-замок на ячейку геосетки: назначение в кластер берёт замки 3x3 соседних
+    ячеек до коммита (services/clusters.lock_cells). Две жалобы в одном месте
+    проходят dedup по очереди, в разных местах — параллельно.
+    Ключи "text:<департамент>" — замок текстового дедупа (services/text_dedup.lock_text).
+    """
+    __tablename__ = "dedup_cell_locks"
+
+    cell_key: Mapped[str] = mapped_column(String, primary_key=True)
+    acquired: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class TextSignature(Base):
+    """
+    MinHash-сигнатура текста жалобы (services/text_dedup.py): пишется в коммите
+    жалобы, по id воркеры догружают новые сигнатуры в свой LSH-индекс.
+    """
+    __tablename__ = "text_signatures"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    complaint_id: Mapped[str] = mapped_column(String, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    sig: Mapped[bytes] = mapped_column(LargeBinary)  # PERMUTATIONS × uint32, little-endian
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key клиента для POST /complaints (services/idempotency.py).
+    PENDING — первый запрос ещё в пайплайне; DONE — жалоба создана, повтор отдаёт её;
+    GONE — жалобу потом удалили или перенесли в архив.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String)  # sha256 тела запроса: тот же ключ с другим телом — ошибка
+    status: Mapped[str] = mapped_column(String, default="PENDING")  # PENDING|DONE|GONE (жалобу удалили)
+    complaint_id: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    # до какого момента PENDING принадлежит первому запросу (упал воркер — ключ перехватывают)
+    locked_until: Mapped[datetime] = mapped_column(DateTime)
+
+
+class NotificationOutbox(Base):
+    """
+    Transactional outbox: строка пишется в том же commit, что и изменение жалобы,
+    а реальную отправку делает фоновый диспетчер (services/notifications.py).
+    """
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    event: Mapped[str] = mapped_column(String)
+    channel: Mapped[str] = mapped_column(String)  # log|file|smtp
+    recipient: Mapped[str] = mapped_column(String, default="")
+    payload: Mapped[str] = mapped_column(Text, default="{}")  # JSON string
+
+    status: Mapped[str] = mapped_column(String, default="PENDING")  # PENDING|SENT|DEAD
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    # захват пачки диспетчером (несколько воркеров не шлют одно и то же)
+    claim_token: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+Index(
+    "ix_notification_outbox_due",
+    NotificationOutbox.status,
+    NotificationOutbox.next_attempt_at,
+)
+
+
+class AkimatSubmission(Base):
+    """
+    Очередь отправки в акимат. idempotency_key = complaint_id + хеш payload:
+    повторная постановка того же payload не создаёт новую строку,
+    а сервер акимата по этому ключу отбрасывает повторы после ретраев.
+    """
+    __tablename__ = "akimat_submissions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    complaint_id: Mapped[str] = mapped_column(String, index=True)
+    idempotency_key: Mapped[str] = mapped_column(String, unique=True)
+    payload: Mapped[str] = mapped_column(Text)  # JSON string
+
+    status: Mapped[str] = mapped_column(String, default="PENDING")  # PENDING|SENT|STUB_SENT|DEAD|CANCELLED
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    export_file: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    claim_token: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+Index(
+    "ix_akimat_submissions_due",
+    AkimatSubmission.status,
+    AkimatSubmission.next_attempt_at,
+)
+
+
+class FeedEvent(Base):
+    """
+    Лента событий для live-подписчиков (SSE, services/live_feed.py).
+    Пишется вместе с уведомлением в том же commit; id — курсор для Last-Event-ID.
+    """
+    __tablename__ = "feed_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    event: Mapped[str] = mapped_column(String)
+    department: Mapped[str] = mapped_column(String, default="", index=True)
+    complaint_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    payload: Mapped[str] = mapped_column(Text, default="{}")  # JSON string
+
+
+class ComplaintTombstone(Base):
+    """
+    Следы удалённых жалоб для /complaints/changes: клиент удаляет их из локальной копии.
+    """
+    __tablename__ = "complaint_tombstones"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # id удалённой жалобы
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    reason: Mapped[str] = mapped_column(String, default="deleted")
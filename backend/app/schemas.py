@@ -6,6 +6,7 @@ from datetime import datetime
 class ComplaintOut(BaseModel):
     id: str
     created_at: datetime
+    updated_at: datetime | None = None
 
     lang: str
     text: str
@@ -37,14 +38,40 @@ class ComplaintOut(BaseModel):
     duplicates_count: int
     duplicate_group_id: str | None
     duplicate_of: str | None
+    duplicate_explain: str | None = None
+    text_duplicate_of: str | None = None
 
     sent_to_akimat: bool
     akimat_sent_at: datetime | None
     akimat_status: str | None
 
+    claimed_by: str | None = None
+    claim_expires_at: datetime | None = None
+
     class Config:
         from_attributes = True
 
 
+class ComplaintSearchHit(ComplaintOut):
+    rank: float
+    snippet: str  # фрагмент текста, совпадения в <mark>…</mark>
+
+
 class ComplaintPatch(BaseModel):
     status: str | None = None
+
+
+class ClusterOut(BaseModel):
+    id: str
+    centroid_lat: float
+    centroid_lng: float
+
+    member_count: int
+    first_seen: datetime
+    last_seen: datetime
+
+    priority_max: float
+    priority_sum: float
+
+    class Config:
+        from_attributes = True
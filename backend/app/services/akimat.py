@@ -1,12 +1,21 @@
 # backend/app/services/akimat.py
 from __future__ import annotations
 from dataclasses import dataclass
-from datetime import datetime, timezone
-import json
-from pathlib import Path
-from typing import Any
+from typing import Any, Callable
+
+from sqlalchemy import and_, event, func, inspect, or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from ..models import Complaint
+from ..utils.jsonfast import dumps
+
+MIN_TEXT_LEN = 20
+MIN_CV_SCORE = 0.75
+# Пробельные символы, которые не считаются текстом. Один набор и для str.strip, и для
+# SQL trim: без аргумента trim в SQLite/Postgres снимает только пробел, а strip() —
+# любой пробельный символ, и гейт по одной жалобе и по выборке расходился.
+TEXT_TRIM_CHARS = " \t\r\n\v\f\u00a0"
 
 
 @dataclass
@@ -16,54 +25,128 @@ class AkimatGateResult:
     payload: dict[str, Any] | None
 
 
+@dataclass(frozen=True)
+class _GateRule:
+    reason: str
+    check: Callable[[Any], bool]  # True = правило пройдено (по одной жалобе)
+    sql: Callable[[], Any]  # то же правило как SQL-выражение (по выборке)
+
+
+def _is_relevant(c) -> bool:
+    return str(getattr(c, "is_relevant", "0")) in ("1", "true", "True")
+
+
 def _text_ok(text: str) -> bool:
-    t = (text or "").strip()
-    return len(t) >= 20
+    t = (text or "").strip(TEXT_TRIM_CHARS)
+    return len(t) >= MIN_TEXT_LEN
 
 
-def prepare_akimat_payload(complaint: Complaint) -> AkimatGateResult:
+def _text_ok_sql():
+    return func.length(func.trim(func.coalesce(Complaint.text, ""), TEXT_TRIM_CHARS)) >= MIN_TEXT_LEN
+
+
+def _priority_level(c) -> str:
+    return (getattr(c, "priority_level", None) or "MEDIUM").upper()
+
+
+# Единый гейт: и для одной жалобы (с причинами), и для SQL-выборки (akimat_gate_sql).
+# Порядок = порядок причин в ответе.
+GATE_RULES: tuple[_GateRule, ...] = (
+    _GateRule(
+        "Нерелевантно городской инфраструктуре (AI).",
+        _is_relevant,
+        lambda: Complaint.is_relevant.in_(("1", "true", "True")),
+    ),
+    _GateRule(
+        "Нет фото-доказательства.",
+        lambda c: bool(getattr(c, "image_path", None)),
+        lambda: and_(Complaint.image_path.isnot(None), Complaint.image_path != ""),
+    ),
+    _GateRule(
+        "Недостаточно доказательств: текст слишком короткий и низкая уверенность по фото.",
+        lambda c: _text_ok(getattr(c, "text", "") or "")
+        or float(getattr(c, "cv_score", 0.0) or 0.0) >= MIN_CV_SCORE,
+        lambda: or_(
+            _text_ok_sql(),
+            func.coalesce(Complaint.cv_score, 0.0) >= MIN_CV_SCORE,
+        ),
+    ),
+    _GateRule(
+        "Нет координат (lat/lng).",
+        lambda c: getattr(c, "lat", None) is not None and getattr(c, "lng", None) is not None,
+        lambda: and_(Complaint.lat.isnot(None), Complaint.lng.isnot(None)),
+    ),
+    _GateRule(
+        "Низкий приоритет — не отправляем автоматически.",
+        lambda c: _priority_level(c) != "LOW",
+        lambda: func.upper(func.coalesce(func.nullif(Complaint.priority_level, ""), "MEDIUM")) != "LOW",
+    ),
+)
+
+
+def akimat_gate_reasons(complaint) -> list[str]:
+    return [r.reason for r in GATE_RULES if not r.check(complaint)]
+
+
+def akimat_gate_sql():
     """
-    AI/качество-гейт:
-    - релевантность
-    - наличие фото
-    - достаточность текста или высокая уверенность CV
-    - координаты (или хотя бы что-то одно)
-    - приоритет не LOW (можно менять)
+    Весь гейт одним WHERE — для массового отбора (sweep) без загрузки строк в Python.
     """
-    reasons: list[str] = []
+    return and_(*(r.sql() for r in GATE_RULES))
 
-    is_relevant = str(getattr(complaint, "is_relevant", "0")) in ("1", "true", "True")
-    if not is_relevant:
-        reasons.append("Нерелевантно городской инфраструктуре (AI).")
 
-    if not getattr(complaint, "image_path", None):
-        reasons.append("Нет фото-доказательства.")
+# Колонки, нужные для payload: массовый отбор читает только их, без ORM-объектов
+PAYLOAD_COLUMNS = (
+    Complaint.id,
+    Complaint.created_at,
+    Complaint.status,
+    Complaint.lat,
+    Complaint.lng,
+    Complaint.lang,
+    Complaint.text,
+    Complaint.ui_category,
+    Complaint.image_path,
+    Complaint.cv_label,
+    Complaint.cv_score,
+    Complaint.is_relevant,
+    Complaint.nlp_category,
+    Complaint.nlp_urgency,
+    Complaint.nlp_confidence,
+    Complaint.department,
+    Complaint.routing_explain,
+    Complaint.priority_level,
+    Complaint.confirmations,
+    Complaint.duplicate_of,
+)
 
-    text = getattr(complaint, "text", "") or ""
-    cv_score = float(getattr(complaint, "cv_score", 0.0) or 0.0)
 
-    if not _text_ok(text) and cv_score < 0.75:
-        reasons.append("Недостаточно доказательств: текст слишком короткий и низкая уверенность по фото.")
+_PAYLOAD_FIELDS = tuple(c.key for c in PAYLOAD_COLUMNS)
 
-    lat = getattr(complaint, "lat", None)
-    lng = getattr(complaint, "lng", None)
-    if lat is None or lng is None:
-        reasons.append("Нет координат (lat/lng).")
-
-    priority_level = (getattr(complaint, "priority_level", None) or "").upper()
-    if priority_level in ("", None):
-        priority_level = "MEDIUM"
+# Колонки кэша: массовый отбор берёт готовый payload, если он актуален
+CACHE_COLUMNS = (
+    Complaint.payload_version,
+    Complaint.akimat_payload,
+    Complaint.akimat_payload_version,
+)
 
-    if priority_level == "LOW":
-        reasons.append("Низкий приоритет — не отправляем автоматически.")
 
-    ok = len(reasons) == 0
+@event.listens_for(Complaint, "before_update")
+def _bump_payload_version(mapper, connection, target) -> None:
+    # ORM-изменения полей payload инвалидируют кэш. Массовые UPDATE (пересчёт приоритетов,
+    # кластеры, reprocess) увеличивают payload_version сами.
+    state = inspect(target)
+    if any(state.attrs[f].history.has_changes() for f in _PAYLOAD_FIELDS):
+        target.payload_version = int(target.payload_version or 0) + 1
 
-    if not ok:
-        return AkimatGateResult(ok=False, reasons=reasons, payload=None)
 
-    # Структурированный payload (можно легко конвертировать в PDF/Excel/email)
-    payload = {
+def build_akimat_payload(complaint) -> dict[str, Any]:
+    """
+    Структурированный payload (можно легко конвертировать в PDF/Excel/email).
+    Принимает ORM-объект или строку выборки PAYLOAD_COLUMNS.
+    """
+    lat = getattr(complaint, "lat", None)
+    lng = getattr(complaint, "lng", None)
+    return {
         "service": "Smart City Shymkent",
         "type": "city_complaint",
         "complaint_id": complaint.id,
@@ -71,20 +154,23 @@ def prepare_akimat_payload(complaint: Complaint) -> AkimatGateResult:
         "status": getattr(complaint, "status", None),
 
         "location": {
-            "lat": float(lat),
-            "lng": float(lng),
+            "lat": float(lat) if lat is not None else None,
+            "lng": float(lng) if lng is not None else None,
         },
         "ui_category": getattr(complaint, "ui_category", None),
         "ai": {
             "cv_label": getattr(complaint, "cv_label", None),
             "cv_score": float(getattr(complaint, "cv_score", 0.0) or 0.0),
+            "is_relevant": getattr(complaint, "is_relevant", None),
             "nlp_category": getattr(complaint, "nlp_category", None),
             "nlp_urgency": getattr(complaint, "nlp_urgency", None),
             "nlp_confidence": float(getattr(complaint, "nlp_confidence", 0.0) or 0.0),
         },
+        # без score: он растёт с ожиданием (priority_recompute), а payload меняется только со сменой уровня
         "priority": {
-            "score": float(getattr(complaint, "priority_score", 0.0) or 0.0),
-            "level": priority_level,
+            "level": _priority_level(complaint),
+            "confirmations": getattr(complaint, "confirmations", None),
+            "duplicate_of": getattr(complaint, "duplicate_of", None),
         },
         "routing": {
             "department": getattr(complaint, "department", None),
@@ -92,7 +178,7 @@ def prepare_akimat_payload(complaint: Complaint) -> AkimatGateResult:
         },
         "message": {
             "lang": getattr(complaint, "lang", None),
-            "text": text,
+            "text": getattr(complaint, "text", "") or "",
         },
         "attachments": [
             {
@@ -102,31 +188,103 @@ def prepare_akimat_payload(complaint: Complaint) -> AkimatGateResult:
         ],
     }
 
-    return AkimatGateResult(ok=True, reasons=[], payload=payload)
 
+def prepare_akimat_payload(complaint: Complaint) -> AkimatGateResult:
+    """
+    AI/качество-гейт:
+    - релевантность
+    - наличие фото
+    - достаточность текста или высокая уверенность CV
+    - координаты (или хотя бы что-то одно)
+    - приоритет не LOW (можно менять)
+    """
+    reasons = akimat_gate_reasons(complaint)
+    if reasons:
+        return AkimatGateResult(ok=False, reasons=reasons, payload=None)
+    return AkimatGateResult(ok=True, reasons=[], payload=build_akimat_payload(complaint))
+
+
+def is_payload_fresh(complaint) -> bool:
+    return (
+        complaint.akimat_payload is not None
+        and complaint.akimat_payload_version == complaint.payload_version
+    )
 
-def send_to_akimat_stub(payload: dict[str, Any]) -> dict[str, Any]:
+
+def akimat_payload_json(complaint: Complaint) -> str:
     """
-    Заглушка: ничего никуда не отправляет.
-    Просто возвращает "как будто отправили".
+    Канонический компактный JSON payload для текущей версии жалобы.
+    Собирается один раз на payload_version и хранится в akimat_payload;
+    GET/экспорт/отправка отдают его как есть. Вызывающий коммитит.
     """
-    return {
-        "sent": False,
-        "mode": "stub",
-        "message": "Это заглушка. Реальная отправка в акимат не подключена.",
-        "prepared_at": datetime.now(timezone.utc).isoformat(),
-        "payload_preview": payload,
-    }
+    if is_payload_fresh(complaint):
+        return complaint.akimat_payload
+    body = dumps(build_akimat_payload(complaint)).decode("utf-8")
+    complaint.akimat_payload = body
+    complaint.akimat_payload_version = complaint.payload_version
+    return body
+
+
+def read_akimat_payload(complaint) -> str:
+    """
+    Для чтения (GET): сохранённый payload, если он актуален, иначе собранный заново —
+    без записи в БД. Сохраняет его prepare (store_akimat_payload) и постановка в очередь.
+    """
+    if is_payload_fresh(complaint):
+        return complaint.akimat_payload
+    return dumps(build_akimat_payload(complaint)).decode("utf-8")
+
+
+def store_akimat_payload(db: Session, complaint: Complaint) -> str:
+    """
+    akimat_payload_json для prepare: устаревший кэш перезаписывается отдельным UPDATE
+    только кэш-колонок. updated_at (курсор /complaints/changes) не меняется, версии
+    условных GET — тоже (колонки кэша не отслеживаются). НЕ коммитит.
+    """
+    if is_payload_fresh(complaint):
+        return complaint.akimat_payload
+    body = read_akimat_payload(complaint)
+    db.execute(
+        update(Complaint)
+        .where(Complaint.id == complaint.id)
+        .where(Complaint.payload_version == complaint.payload_version)  # жалобу не изменили параллельно
+        .values(
+            akimat_payload=body,
+            akimat_payload_version=complaint.payload_version,
+            updated_at=Complaint.updated_at,  # без onupdate
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # в объекте — как загруженное из БД: flush жалобы не перепишет кэш ещё раз
+    set_committed_value(complaint, "akimat_payload", body)
+    set_committed_value(complaint, "akimat_payload_version", complaint.payload_version)
+    return body
 
 
-def export_payload_json(payload: dict[str, Any], export_dir: str) -> str:
+def select_eligible(
+    db: Session,
+    *,
+    department: str | None = None,
+    statuses: tuple[str, ...] | None = None,
+    limit: int | None = None,
+):
     """
-    Экспорт в JSON файл (как часть прототипа передачи).
+    Запрос по колонкам PAYLOAD_COLUMNS (+ CACHE_COLUMNS): все жалобы, прошедшие гейт и ещё не отправленные
+    (уже поставленные в очередь/отправленные повторно не трогаем).
     """
-    Path(export_dir).mkdir(parents=True, exist_ok=True)
-    file_path = Path(export_dir) / f"akimat_payload_{payload.get('complaint_id','unknown')}.json"
-    file_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    return str(file_path)
+    q = (
+        db.query(*PAYLOAD_COLUMNS, *CACHE_COLUMNS)
+        .filter(akimat_gate_sql())
+        .filter(or_(Complaint.akimat_status.is_(None), Complaint.akimat_status == "PREPARED"))
+    )
+    if department:
+        q = q.filter(Complaint.department == department)
+    if statuses:
+        q = q.filter(Complaint.status.in_(statuses))
+    q = q.order_by(Complaint.priority_score.desc(), Complaint.created_at.asc())
+    if limit is not None:
+        q = q.limit(limit)
+    return q
 
 
 def _dt_iso(dt) -> str | None:
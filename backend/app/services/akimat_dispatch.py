@@ -0,0 +1,396 @@
+# backend/app/services/akimat_dispatch.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import AkimatSubmission, Complaint
+from ..settings import settings
+from ..utils.jsonfast import dumps
+from .akimat import build_akimat_payload, is_payload_fresh, select_eligible
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def idempotency_key(complaint_id: str, payload_json: str) -> str:
+    digest = hashlib.sha256(payload_json.encode("utf-8")).hexdigest()[:16]
+    return f"{complaint_id}:{digest}"
+
+
+def _insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _revive_dead(db: Session, keys: list[str], now: datetime) -> None:
+    """
+    DEAD-строки с этими ключами — снова в очередь с нуля: повторная постановка
+    того же payload после разбора ошибки — это ручной ретрай, а не дубль.
+    """
+    db.execute(
+        update(AkimatSubmission)
+        .where(AkimatSubmission.idempotency_key.in_(keys))
+        .where(AkimatSubmission.status == "DEAD")
+        .values(
+            status="PENDING",
+            attempts=0,
+            next_attempt_at=now,
+            last_error=None,
+            claim_token=None,
+            locked_until=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def enqueue_submission(db: Session, complaint: Complaint, payload_json: str) -> AkimatSubmission:
+    """
+    Ставит payload жалобы (канонический JSON, см. akimat_payload_json) в очередь отправки. НЕ коммитит.
+    Тот же payload повторно не ставится (idempotency_key, INSERT ... ON CONFLICT DO NOTHING —
+    параллельная постановка не падает на уникальности) — возвращаем существующую строку;
+    DEAD-строка при этом возвращается в PENDING.
+    """
+    key = idempotency_key(complaint.id, payload_json)
+    now = _utcnow_naive()
+
+    res = db.execute(
+        _insert(db)(AkimatSubmission)
+        .values(
+            created_at=now,
+            complaint_id=complaint.id,
+            idempotency_key=key,
+            payload=payload_json,
+            status="PENDING",
+            attempts=0,
+            next_attempt_at=now,
+        )
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+    if res.rowcount != 1:
+        _revive_dead(db, [key], now)
+
+    sub = (
+        db.query(AkimatSubmission)
+        .filter(AkimatSubmission.idempotency_key == key)
+        .populate_existing()
+        .one()
+    )
+    complaint.akimat_status = _COMPLAINT_STATUS.get(sub.status, "QUEUED")
+    return sub
+
+
+# статус submission → akimat_status жалобы
+_COMPLAINT_STATUS = {"PENDING": "QUEUED", "SENT": "SENT", "STUB_SENT": "STUB_SENT", "DEAD": "FAILED"}
+
+
+def enqueue_many(db: Session, items: list[tuple[str, str]]) -> dict:
+    """
+    Массовая постановка в очередь: один INSERT ... ON CONFLICT DO NOTHING, один SELECT
+    статусов, один UPDATE жалоб на каждый статус. DEAD-строки — снова в PENDING. НЕ коммитит.
+    """
+    if not items:
+        return {"queued": 0, "existing": 0}
+
+    now = _utcnow_naive()
+    rows = [(cid, idempotency_key(cid, payload_json), payload_json) for cid, payload_json in items]
+    keys = [k for _, k, _ in rows]
+
+    res = db.execute(
+        _insert(db)(AkimatSubmission)
+        .values(
+            [
+                {
+                    "created_at": now,
+                    "complaint_id": cid,
+                    "idempotency_key": key,
+                    "payload": body,
+                    "status": "PENDING",
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                }
+                for cid, key, body in rows
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+    queued = int(res.rowcount or 0)
+    if queued < len(rows):
+        _revive_dead(db, keys, now)
+
+    status = dict(
+        db.query(AkimatSubmission.idempotency_key, AkimatSubmission.status)
+        .filter(AkimatSubmission.idempotency_key.in_(keys))
+        .all()
+    )
+
+    by_status: dict[str, list[str]] = {}
+    for cid, key, _ in rows:
+        st = _COMPLAINT_STATUS.get(status.get(key, "PENDING"), "QUEUED")
+        by_status.setdefault(st, []).append(cid)
+    for st, ids in by_status.items():
+        db.execute(
+            update(Complaint)
+            .where(Complaint.id.in_(ids))
+            .values(akimat_status=st)
+            .execution_options(synchronize_session=False)
+        )
+
+    return {"queued": queued, "existing": len(rows) - queued}
+
+
+def sweep_eligible(
+    db: Session,
+    *,
+    department: str | None = None,
+    statuses: tuple[str, ...] | None = None,
+    limit: int | None = None,
+    chunk_size: int = 500,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Отбирает все жалобы, прошедшие гейт (одним SQL WHERE), строит payload пачками
+    и ставит в очередь. Поставленные выпадают из выборки, поэтому каждый кусок —
+    просто "следующие chunk_size подходящих".
+    """
+    if dry_run:
+        q = select_eligible(db, department=department, statuses=statuses, limit=limit)
+        total = q.order_by(None).with_entities(Complaint.id).count()
+        preview = [r.id for r in q.limit(20).all()]
+        return {"dry_run": True, "eligible": total, "preview_ids": preview}
+
+    queued = existing = 0
+    while limit is None or queued + existing < limit:
+        n = chunk_size if limit is None else min(chunk_size, limit - queued - existing)
+        chunk = select_eligible(db, department=department, statuses=statuses, limit=n).all()
+        if not chunk:
+            break
+        items = []
+        cache = []
+        for r in chunk:
+            if is_payload_fresh(r):
+                items.append((r.id, r.akimat_payload))
+                continue
+            body = dumps(build_akimat_payload(r)).decode("utf-8")
+            items.append((r.id, body))
+            cache.append({"id": r.id, "akimat_payload": body, "akimat_payload_version": r.payload_version})
+        if cache:
+            db.bulk_update_mappings(Complaint, cache)
+        res = enqueue_many(db, items)
+        db.commit()
+        queued += res["queued"]
+        existing += res["existing"]
+
+    return {"dry_run": False, "queued": queued, "existing": existing}
+
+
+# ---- экспорт ----
+def _export_path(now: datetime) -> Path:
+    """
+    Ротация NDJSON: файл на день, при превышении AKIMAT_EXPORT_MAX_BYTES — следующий номер.
+    """
+    settings.EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    day = now.strftime("%Y%m%d")
+    n = 0
+    while True:
+        path = settings.EXPORTS_DIR / f"akimat_batch_{day}_{n:03d}.ndjson"
+        if not path.exists() or path.stat().st_size < settings.AKIMAT_EXPORT_MAX_BYTES:
+            return path
+        n += 1
+
+
+def _export_batch(rows: list[AkimatSubmission], now: datetime) -> str:
+    path = _export_path(now)
+    ts = json.dumps(now.isoformat())
+    # payload уже сериализован — склеиваем строки без json.loads/dumps
+    lines = [
+        f'{{"exported_at":{ts},"idempotency_key":{json.dumps(r.idempotency_key)},"payload":{r.payload}}}\n'
+        for r in rows
+    ]
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write("".join(lines))
+    return str(path)
+
+
+# ---- отправка ----
+def _post_batch(rows: list[AkimatSubmission]) -> dict[str, dict]:
+    """
+    POST {"items": [{"idempotency_key", "payload"}]} → {"results": [{"idempotency_key", "status", "error"}]}
+    status: accepted | duplicate | rejected.
+    Сетевые ошибки и 5xx пробрасываются исключением (ретрай всей пачки).
+    """
+    items = ",".join(
+        f'{{"idempotency_key":{json.dumps(r.idempotency_key)},"payload":{r.payload}}}' for r in rows
+    )
+    body = f'{{"items":[{items}]}}'.encode("utf-8")
+    req = urllib.request.Request(
+        settings.AKIMAT_ENDPOINT,
+        data=body,
+        method="POST",
+        headers={"Content-Type": "application/json; charset=utf-8"},
+    )
+    with urllib.request.urlopen(req, timeout=settings.AKIMAT_TIMEOUT_SECONDS) as resp:
+        data = json.loads(resp.read().decode("utf-8") or "{}")
+    return {r.get("idempotency_key"): r for r in data.get("results", [])}
+
+
+def _backoff(attempts: int) -> timedelta:
+    s = settings.AKIMAT_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(s, settings.AKIMAT_BACKOFF_MAX_SECONDS))
+
+
+def _claim_batch(db: Session, now: datetime, limit: int) -> list[AkimatSubmission]:
+    free = or_(AkimatSubmission.locked_until.is_(None), AkimatSubmission.locked_until < now)
+    ids = [
+        i
+        for (i,) in db.query(AkimatSubmission.id)
+        .filter(AkimatSubmission.status == "PENDING")
+        .filter(AkimatSubmission.next_attempt_at <= now)
+        .filter(free)
+        .order_by(AkimatSubmission.id.asc())
+        .limit(limit)
+        .all()
+    ]
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    db.execute(
+        update(AkimatSubmission)
+        .where(AkimatSubmission.id.in_(ids))
+        .where(free)
+        .values(claim_token=token, locked_until=now + timedelta(seconds=settings.AKIMAT_LOCK_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return (
+        db.query(AkimatSubmission)
+        .filter(AkimatSubmission.claim_token == token)
+        .order_by(AkimatSubmission.id.asc())
+        .all()
+    )
+
+
+def _fail(r: AkimatSubmission, now: datetime, error: str, permanent: bool = False) -> str:
+    r.attempts = int(r.attempts or 0) + 1
+    r.last_error = error[:500]
+    if permanent or r.attempts >= settings.AKIMAT_MAX_ATTEMPTS:
+        r.status = "DEAD"
+        return "dead"
+    r.next_attempt_at = now + _backoff(r.attempts)
+    return "retry"
+
+
+def drain_submissions(db: Session, limit: int | None = None) -> dict:
+    """
+    Один проход: пачка из N payload → один экспорт в NDJSON + один HTTP-запрос.
+    Без AKIMAT_ENDPOINT работает как заглушка (STUB_SENT после экспорта).
+    """
+    now = _utcnow_naive()
+    rows = _claim_batch(db, now, limit or settings.AKIMAT_BATCH_SIZE)
+    if not rows:
+        return {"claimed": 0, "sent": 0, "retry": 0, "dead": 0, "export_file": None}
+
+    # в NDJSON каждая жалоба попадает один раз, ретраи не дублируют экспорт
+    fresh = [r for r in rows if not r.export_file]
+    export_file = _export_batch(fresh, now) if fresh else None
+    for r in fresh:
+        r.export_file = export_file
+    counts = {"sent": 0, "retry": 0, "dead": 0}
+    done_status = "SENT" if settings.AKIMAT_ENDPOINT else "STUB_SENT"
+    done_ids: list[str] = []
+    dead_ids: list[str] = []
+
+    results: dict[str, dict] | None = None
+    error: str | None = None
+    if settings.AKIMAT_ENDPOINT:
+        try:
+            results = _post_batch(rows)
+        except urllib.error.HTTPError as e:
+            error = f"HTTP {e.code}"
+            if 400 <= e.code < 500 and e.code != 429:
+                # вся пачка отвергнута — разбираться вручную
+                for r in rows:
+                    counts[_fail(r, now, error, permanent=True)] += 1
+                    dead_ids.append(r.complaint_id)
+                error = None
+                results = {}
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+
+    for r in rows:
+        r.claim_token = None
+        r.locked_until = None
+        if r.status == "DEAD":
+            continue
+        if error is not None:
+            outcome = _fail(r, now, error)
+            counts[outcome] += 1
+            if outcome == "dead":
+                dead_ids.append(r.complaint_id)
+            continue
+
+        if results is None:  # режим заглушки
+            res: dict = {"status": "accepted"}
+        else:
+            res = results.get(r.idempotency_key) or {}
+        status = res.get("status")
+        if status in ("accepted", "duplicate"):
+            r.attempts = int(r.attempts or 0) + 1
+            r.status = done_status
+            r.sent_at = now
+            done_ids.append(r.complaint_id)
+            counts["sent"] += 1
+        else:
+            permanent = status == "rejected"
+            outcome = _fail(r, now, res.get("error") or f"no result ({status})", permanent=permanent)
+            counts[outcome] += 1
+            if outcome == "dead":
+                dead_ids.append(r.complaint_id)
+
+    if done_ids:
+        db.execute(
+            update(Complaint)
+            .where(Complaint.id.in_(done_ids))
+            .values(akimat_status=done_status, akimat_sent_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    if dead_ids:
+        db.execute(
+            update(Complaint)
+            .where(Complaint.id.in_(dead_ids))
+            .values(akimat_status="FAILED")
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+    return {"claimed": len(rows), **counts, "export_file": export_file}
+
+
+async def akimat_dispatch_loop(interval_s: float) -> None:
+    def _run() -> dict:
+        db = SessionLocal()
+        try:
+            return drain_submissions(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            result = await asyncio.to_thread(_run)
+        except Exception as e:
+            print(f"[AKIMAT] dispatcher failed: {e}")
+            result = {"claimed": 0}
+        if result["claimed"] < settings.AKIMAT_BATCH_SIZE:
+            await asyncio.sleep(interval_s)
@@ -0,0 +1,140 @@
+# backend/app/services/archive.py
+"""
+Горячее/холодное хранение жалоб.
+
+Закрытые (DONE/REJECTED) жалобы, не менявшиеся дольше ARCHIVE_AFTER_DAYS,
+переносятся пачками в complaints_archive: INSERT ... SELECT + DELETE в одной
+транзакции, с tombstone reason="archived" — delta-sync клиенты убирают их из
+локальной копии. Не трогаем жалобы, у которых ещё не ушла отправка в акимат.
+
+Чтения: include_archived=true у GET /complaints и /stats/* — горячая таблица
+и архив вместе (crud.list_complaint_rows, complaint_tables); выгрузка —
+python archive.py export (crud.iter_complaint_rows).
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import Table, delete, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import AkimatSubmission, Complaint, ComplaintTombstone, complaints_archive
+from ..settings import settings
+from .clusters import rejoin_groups
+from .sync import delete_complaints
+
+ARCHIVE_STATUSES = ("DONE", "REJECTED")
+
+_HOT = Complaint.__table__
+_COLUMNS = [c.name for c in _HOT.columns]
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def complaint_tables(include_archived: bool) -> list[Table]:
+    return [_HOT, complaints_archive] if include_archived else [_HOT]
+
+
+def _archivable_ids(db: Session, cutoff: datetime, limit: int) -> list[str]:
+    unsent = (
+        select(AkimatSubmission.complaint_id)
+        .where(AkimatSubmission.status == "PENDING")
+        .where(AkimatSubmission.complaint_id == Complaint.id)
+        .exists()
+    )
+    q = (
+        select(Complaint.id)
+        .where(Complaint.status.in_(ARCHIVE_STATUSES))
+        .where(Complaint.updated_at < cutoff)
+        .where(~unsent)
+        .order_by(Complaint.updated_at.asc())
+        .limit(limit)
+    )
+    return list(db.execute(q).scalars())
+
+
+def archive_closed(
+    db: Session,
+    older_than_days: int | None = None,
+    batch_size: int | None = None,
+    max_batches: int | None = None,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """
+    Переносит закрытые жалобы в архив пачками по batch_size (коммит на пачку:
+    write-lock не держится на всё время переноса).
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = _utcnow_naive() - timedelta(days=days)
+
+    if dry_run:
+        n = len(_archivable_ids(db, cutoff, batch * (max_batches or 1_000_000)))
+        return {"cutoff": cutoff.isoformat(), "archivable": n, "archived": 0, "batches": 0}
+
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = _archivable_ids(db, cutoff, batch)
+        if not ids:
+            break
+        now = _utcnow_naive()
+        db.execute(
+            insert(complaints_archive).from_select(
+                [*_COLUMNS, "archived_at"],
+                select(*(_HOT.c[c] for c in _COLUMNS), literal(now, complaints_archive.c.archived_at.type))
+                .where(_HOT.c.id.in_(ids)),
+            )
+        )
+        moved += delete_complaints(db, ids, reason="archived")
+        db.commit()
+        batches += 1
+        if len(ids) < batch:
+            break
+    return {"cutoff": cutoff.isoformat(), "archived": moved, "batches": batches}
+
+
+def restore_complaints(db: Session, ids: list[str]) -> int:
+    """
+    Возвращает жалобы из архива в горячую таблицу (например, если её переоткрыли).
+    НЕ коммитит.
+    """
+    if not ids:
+        return 0
+    arc = complaints_archive
+    db.execute(
+        insert(_HOT).from_select(_COLUMNS, select(*(arc.c[c] for c in _COLUMNS)).where(arc.c.id.in_(ids)))
+    )
+    res = db.execute(delete(arc).where(arc.c.id.in_(ids)))
+    rejoin_groups(db, ids)
+    # tombstone "archived" больше не нужен, а свежий updated_at вернёт строку delta-sync клиентам
+    db.execute(delete(ComplaintTombstone).where(ComplaintTombstone.id.in_(ids)))
+    db.execute(
+        update(Complaint)
+        .where(Complaint.id.in_(ids))
+        .values(updated_at=_utcnow_naive())
+        .execution_options(synchronize_session=False)
+    )
+    return int(res.rowcount or 0)
+
+
+async def archive_loop(interval_s: float) -> None:
+    def _run() -> dict:
+        db = SessionLocal()
+        try:
+            return archive_closed(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            result = await asyncio.to_thread(_run)
+            if result["archived"]:
+                print(f"[ARCHIVE] moved {result['archived']} complaints (updated before {result['cutoff']})")
+        except Exception as e:
+            print(f"[ARCHIVE] failed: {e}")
+        await asyncio.sleep(interval_s)
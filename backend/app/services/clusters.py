@@ -0,0 +1,417 @@
+# backend/app/services/clusters.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from math import cos, floor, radians
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models import Complaint, DedupCellLock, DuplicateCluster
+from ..utils.metrics import timed
+from .duplicate import haversine_m
+
+_M_PER_DEG_LAT = 111_320.0
+
+
+@dataclass
+class ClusterAssignment:
+    group_id: str | None
+    duplicate_of: str | None  # id первой жалобы кластера (None, если это она сама)
+    duplicates_count: int  # сколько ДРУГИХ жалоб в кластере
+    is_new: bool
+    distance_m: float | None = None  # до центроида кластера, в который попала жалоба (гео-сигнал)
+
+
+# ---- геосетка ----
+def _cell(lat: float, lng: float, radius_m: float) -> tuple[int, int]:
+    """
+    Сетка с шагом ~radius_m. Шаг по долготе зависит только от ряда (широты),
+    поэтому ключ ячейки детерминирован для любой точки.
+    """
+    lat_step = radius_m / _M_PER_DEG_LAT
+    row = floor(lat / lat_step)
+    row_lat = (row + 0.5) * lat_step
+    lng_step = radius_m / (_M_PER_DEG_LAT * max(cos(radians(row_lat)), 1e-6))
+    return row, floor(lng / lng_step)
+
+
+def cell_key(lat: float, lng: float, radius_m: float) -> str:
+    row, col = _cell(lat, lng, radius_m)
+    return f"{row}:{col}"
+
+
+def _neighbour_keys(lat: float, lng: float, radius_m: float) -> list[str]:
+    """
+    Все ячейки, в которых может лежать центроид не дальше radius_m:
+    соседние ряды сдвигаем на ±шаг по широте, а колонку считаем уже в их сетке.
+    """
+    lat_step = radius_m / _M_PER_DEG_LAT
+    keys: set[str] = set()
+    for dlat in (-lat_step, 0.0, lat_step):
+        row, col = _cell(lat + dlat, lng, radius_m)
+        for dc in (-1, 0, 1):
+            keys.add(f"{row}:{col + dc}")
+    return sorted(keys)
+
+
+# ---- блокировка ячеек ----
+def lock_cells(db: Session, keys: list[str]) -> None:
+    """
+    Замки ячеек до конца транзакции (снимает commit/rollback вызывающего).
+
+    Без них две жалобы в одном месте одновременно не видят кластеров друг друга
+    и обе создают «оригинал», а member_count теряет инкременты.
+    - PostgreSQL: строки dedup_cell_locks, SELECT ... FOR UPDATE в порядке cell_key —
+      пересекающиеся окрестности ждут друг друга без взаимоблокировок
+    - SQLite: первая запись транзакции берёт write-lock всей базы — следующий
+      dedup ждёт коммита (busy timeout), пока CV/NLP других запросов идут параллельно
+    Кластеры, которые меняет assign_cluster, лежат в этих же ячейках: центроиды
+    кандидатов и их слияния не дальше radius_m от новой точки.
+    """
+    keys = sorted(set(keys))
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(
+        insert(DedupCellLock)
+        .values([{"cell_key": k, "acquired": 0} for k in keys])
+        .on_conflict_do_nothing(index_elements=["cell_key"])
+    )
+    db.execute(
+        select(DedupCellLock.cell_key)
+        .where(DedupCellLock.cell_key.in_(keys))
+        .order_by(DedupCellLock.cell_key)
+        .with_for_update()
+    ).all()
+
+
+# ---- union-find ----
+def find_root(db: Session, cluster_id: str) -> DuplicateCluster | None:
+    """
+    find() со сжатием пути: все промежуточные кластеры начинают
+    указывать сразу на корень.
+    """
+    node = db.get(DuplicateCluster, cluster_id)
+    if node is None:
+        return None
+
+    path: list[DuplicateCluster] = []
+    while node.parent_id is not None:
+        path.append(node)
+        parent = db.get(DuplicateCluster, node.parent_id)
+        if parent is None:
+            break
+        node = parent
+
+    for p in path[:-1]:
+        p.parent_id = node.id
+    return node
+
+
+def _union(db: Session, root: DuplicateCluster, child: DuplicateCluster, radius_m: float, joining: int = 0) -> None:
+    """
+    Вливает child в root (root — больший по размеру, union by size).
+    Жалобы обоих кластеров обновляются одним UPDATE по индексу duplicate_group_id:
+    у влитых — новая группа и оригинал, у всех — duplicates_count нового размера
+    (иначе до периодического refresh_duplicate_counts они показывали бы старый).
+    joining — жалобы, которые войдут в кластер в этой же транзакции (новая жалоба
+    в assign_cluster): их учитываем в duplicates_count сразу.
+    """
+    total = root.member_count + child.member_count
+    root.centroid_lat = (root.centroid_lat * root.member_count + child.centroid_lat * child.member_count) / total
+    root.centroid_lng = (root.centroid_lng * root.member_count + child.centroid_lng * child.member_count) / total
+    root.cell_key = cell_key(root.centroid_lat, root.centroid_lng, radius_m)
+    root.member_count = total
+    root.first_seen = min(root.first_seen, child.first_seen)
+    root.last_seen = max(root.last_seen, child.last_seen)
+    root.priority_max = max(root.priority_max or 0.0, child.priority_max or 0.0)
+    root.priority_sum = (root.priority_sum or 0.0) + (child.priority_sum or 0.0)
+
+    child.parent_id = root.id
+
+    db.execute(
+        update(Complaint)
+        .where(Complaint.duplicate_group_id.in_([root.id, child.id]))
+        .values(
+            duplicate_group_id=root.id,
+            duplicate_of=case((Complaint.id == root.id, None), else_=root.id),
+            duplicates_count=total + joining - 1,
+            payload_version=Complaint.payload_version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _sync_root_count(db: Session, root: DuplicateCluster) -> None:
+    # duplicates_count у "оригинала" раньше никогда не обновлялся
+    db.execute(
+        update(Complaint)
+        .where(Complaint.id == root.id)
+        .values(duplicates_count=root.member_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@timed("dedup")
+def assign_cluster(
+    db: Session,
+    *,
+    complaint_id: str,
+    lat: float | None,
+    lng: float | None,
+    created_at: datetime | None = None,
+    radius_m: float = 250.0,
+) -> ClusterAssignment:
+    """
+    Назначает новую жалобу в кластер дублей:
+    - берём замки 3x3 соседних ячеек (lock_cells) — конкурентные жалобы рядом ждут
+    - смотрим только кластеры в этих ячейках (индекс по cell_key)
+    - если рядом несколько кластеров — сливаем их (union-find)
+    - иначе создаём новый кластер с id = complaint_id
+    Коммит — на стороне вызывающего (в той же транзакции, что и сама жалоба).
+    """
+    if lat is None or lng is None:
+        return ClusterAssignment(group_id=None, duplicate_of=None, duplicates_count=0, is_new=False)
+
+    seen = created_at or datetime.utcnow()
+    keys = _neighbour_keys(lat, lng, radius_m)
+    lock_cells(db, keys)
+
+    candidates = (
+        db.query(DuplicateCluster)
+        .filter(DuplicateCluster.cell_key.in_(keys))
+        .filter(DuplicateCluster.parent_id.is_(None))
+        .all()
+    )
+    near = [
+        (haversine_m(lat, lng, c.centroid_lat, c.centroid_lng), c)
+        for c in candidates
+    ]
+    near = sorted((x for x in near if x[0] <= radius_m), key=lambda x: x[0])
+
+    if not near:
+        db.add(
+            DuplicateCluster(
+                id=complaint_id,
+                parent_id=None,
+                cell_key=cell_key(lat, lng, radius_m),
+                centroid_lat=lat,
+                centroid_lng=lng,
+                member_count=1,
+                first_seen=seen,
+                last_seen=seen,
+                priority_max=0.0,
+                priority_sum=0.0,
+            )
+        )
+        # flush, чтобы новый кластер был в identity map (autoflush выключен)
+        db.flush()
+        return ClusterAssignment(group_id=complaint_id, duplicate_of=None, duplicates_count=0, is_new=True)
+
+    clusters = [c for _, c in near]
+    root = max(clusters, key=lambda c: (c.member_count, -c.first_seen.timestamp()))
+    for other in clusters:
+        if other is not root:
+            _union(db, root, other, radius_m, joining=1)
+
+    # Инкремент — одним UPDATE от значений в базе, а не read-modify-write объекта.
+    # Несохранённые изменения root (слияния) уходят до него, иначе flush при
+    # коммите перезаписал бы результат старыми значениями.
+    db.flush()
+    n = DuplicateCluster.member_count
+    db.execute(
+        update(DuplicateCluster)
+        .where(DuplicateCluster.id == root.id)
+        .values(
+            centroid_lat=(DuplicateCluster.centroid_lat * n + lat) / (n + 1),
+            centroid_lng=(DuplicateCluster.centroid_lng * n + lng) / (n + 1),
+            member_count=n + 1,
+            last_seen=case((DuplicateCluster.last_seen < seen, seen), else_=DuplicateCluster.last_seen),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.refresh(root)
+    root.cell_key = cell_key(root.centroid_lat, root.centroid_lng, radius_m)
+    _sync_root_count(db, root)
+
+    return ClusterAssignment(
+        group_id=root.id,
+        duplicate_of=root.id,
+        duplicates_count=root.member_count - 1,
+        is_new=False,
+        distance_m=round(near[0][0], 1),
+    )
+
+
+def join_group(db: Session, group_id: str, seen: datetime | None = None) -> ClusterAssignment:
+    """
+    Добавляет жалобу без координат в известную группу дублей (текстовый дубль):
+    - группа — кластер: member_count + 1, центроид не трогаем — координат нет
+    - кластера нет (у оригинала тоже нет координат): группа — id оригинала,
+      счётчик дублей — у него
+    Коммит — на стороне вызывающего.
+    """
+    seen = seen or datetime.utcnow()
+    root = find_root(db, group_id)
+    if root is not None:
+        # та же ячейка, что берёт assign_cluster рядом с кластером: не разойдёмся со слиянием
+        lock_cells(db, [root.cell_key])
+        db.refresh(root)
+        if root.parent_id is not None:
+            root = find_root(db, root.id)
+        db.flush()
+        db.execute(
+            update(DuplicateCluster)
+            .where(DuplicateCluster.id == root.id)
+            .values(
+                member_count=DuplicateCluster.member_count + 1,
+                last_seen=case((DuplicateCluster.last_seen < seen, seen), else_=DuplicateCluster.last_seen),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.refresh(root)
+        _sync_root_count(db, root)
+        return ClusterAssignment(
+            group_id=root.id,
+            duplicate_of=root.id,
+            duplicates_count=root.member_count - 1,
+            is_new=False,
+        )
+
+    db.execute(
+        update(Complaint)
+        .where(Complaint.id == group_id)
+        .values(duplicate_group_id=group_id, duplicates_count=Complaint.duplicates_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    count = db.execute(select(Complaint.duplicates_count).where(Complaint.id == group_id)).scalar_one_or_none()
+    return ClusterAssignment(group_id=group_id, duplicate_of=group_id, duplicates_count=count or 1, is_new=False)
+
+
+def _shift_groups(db: Session, ids: list[str], sign: int) -> None:
+    """
+    Жалобы ids уходят из своих групп (sign=-1) или возвращаются (sign=+1):
+    member_count кластеров — на ±n (по одному UPDATE на каждое n), duplicates_count
+    остальных жалоб группы — новый размер кластера - 1 (группа без кластера — тоже ±n).
+    Жалобы ids должны быть в complaints.
+    """
+    sizes = dict(
+        db.execute(
+            select(Complaint.duplicate_group_id, func.count())
+            .where(Complaint.id.in_(ids))
+            .where(Complaint.duplicate_group_id.is_not(None))
+            .group_by(Complaint.duplicate_group_id)
+        ).all()
+    )
+    if not sizes:
+        return
+    keys = list(
+        db.execute(select(DuplicateCluster.cell_key).where(DuplicateCluster.id.in_(list(sizes)))).scalars()
+    )
+    if keys:
+        # те же замки, что у assign_cluster/join_group: инкременты приёма не теряются
+        lock_cells(db, keys)
+    db.flush()
+
+    by_n: dict[int, list[str]] = {}
+    for group_id, n in sizes.items():
+        by_n.setdefault(int(n), []).append(group_id)
+    for n, group_ids in by_n.items():
+        d = sign * n
+        db.execute(
+            update(DuplicateCluster)
+            .where(DuplicateCluster.id.in_(group_ids))
+            .values(member_count=DuplicateCluster.member_count + d)
+            .execution_options(synchronize_session=False)
+        )
+        cluster_size = (
+            select(DuplicateCluster.member_count - 1)
+            .where(DuplicateCluster.id == Complaint.duplicate_group_id)
+            .scalar_subquery()
+        )
+        left = Complaint.duplicates_count + d
+        db.execute(
+            update(Complaint)
+            .where(Complaint.duplicate_group_id.in_(group_ids))
+            .where(Complaint.id.not_in(ids))
+            .values(
+                duplicates_count=func.coalesce(cluster_size, case((left < 0, 0), else_=left)),
+                payload_version=Complaint.payload_version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+    if sign < 0:
+        db.execute(
+            delete(DuplicateCluster)
+            .where(DuplicateCluster.id.in_(list(sizes)))
+            .where(DuplicateCluster.member_count <= 0)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def leave_groups(db: Session, ids: list[str]) -> None:
+    """
+    Перед удалением/архивацией жалоб ids (в той же транзакции). НЕ коммитит.
+    Опустевшие кластеры удаляются.
+    """
+    _shift_groups(db, ids, -1)
+
+
+def rejoin_groups(db: Session, ids: list[str]) -> None:
+    """
+    После возврата жалоб ids из архива (в той же транзакции). НЕ коммитит.
+    Если кластер за это время опустел и удалён — группа остаётся без кластера.
+    """
+    _shift_groups(db, ids, +1)
+
+
+def record_cluster_priority(db: Session, group_id: str | None, score: float) -> None:
+    if not group_id:
+        return
+    root = find_root(db, group_id)
+    if root is None:
+        return
+    score = float(score)
+    db.flush()
+    cur_max = func.coalesce(DuplicateCluster.priority_max, 0.0)
+    db.execute(
+        update(DuplicateCluster)
+        .where(DuplicateCluster.id == root.id)
+        .values(
+            priority_max=case((cur_max < score, score), else_=cur_max),
+            priority_sum=func.coalesce(DuplicateCluster.priority_sum, 0.0) + score,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.expire(root, ["priority_max", "priority_sum"])
+
+
+def refresh_cluster_priorities(db: Session) -> int:
+    """
+    priority_max/priority_sum корневых кластеров по текущим priority_score жалоб
+    (после периодического пересчёта приоритетов).
+    """
+    members = Complaint.duplicate_group_id == DuplicateCluster.id
+    max_q = select(func.coalesce(func.max(Complaint.priority_score), 0.0)).where(members).scalar_subquery()
+    sum_q = select(func.coalesce(func.sum(Complaint.priority_score), 0.0)).where(members).scalar_subquery()
+
+    # только изменившиеся: иначе каждый цикл пересчёта менял бы версию таблицы (ETag /clusters)
+    changed = (func.coalesce(DuplicateCluster.priority_max, -1.0) != max_q) | (
+        func.coalesce(DuplicateCluster.priority_sum, -1.0) != sum_q
+    )
+    res = db.execute(
+        update(DuplicateCluster)
+        .where(DuplicateCluster.parent_id.is_(None))
+        .where(changed)
+        .values(priority_max=max_q, priority_sum=sum_q)
+        .execution_options(synchronize_session=False)
+    )
+    return int(res.rowcount or 0)
+
+
+def reset_clusters(db: Session) -> None:
+    """
+    Полная очистка (для пересборки через reprocess --stages dedup).
+    """
+    db.query(DuplicateCluster).delete(synchronize_session=False)
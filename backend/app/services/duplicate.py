@@ -33,9 +33,8 @@ def find_duplicate_geo(
     limit: int = 200,
 ) -> DuplicateResult:
     """
-    Пока делаем просто geo-дубликаты:
-    - ищем последние жалобы с координатами
-    - если нашли близко → считаем это дублем
+    Прежний гео-дедуп перебором последних жалоб — только базовая линия для bench.py.
+    В приёме его заменил assign_cluster (services/clusters.py), он же пишет метрику "dedup".
     """
     if lat is None or lng is None:
         return DuplicateResult(group_id=None, count=0)
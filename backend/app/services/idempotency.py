@@ -0,0 +1,152 @@
+# backend/app/services/idempotency.py
+"""
+Idempotency-Key для POST /complaints: повтор запроса с тем же ключом отдаёт уже
+созданную жалобу — без повторного сохранения фото, CLIP/XLM-R и ложного дубля.
+
+- ключ вставляется и коммитится до пайплайна (PENDING); complaint_id и DONE
+  пишутся в том же коммите, что и сама жалоба (ingestion._stage_persist)
+- параллельный запрос с тем же ключом ждёт, пока первый закончит (опрос строки —
+  работает и между воркерами serve.py)
+- первый запрос упал — строка удаляется, повтор выполняется заново;
+  упал весь воркер — ключ перехватывают после locked_until
+- ключи живут IDEMPOTENCY_TTL_HOURS, просроченные чистит фоновый цикл
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import IdempotencyKey
+from ..settings import settings
+
+MAX_KEY_LENGTH = 255
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class KeyClaim:
+    state: str  # new | done | gone | pending | mismatch
+    complaint_id: str | None = None
+
+
+def request_fingerprint(content: bytes, **fields: str | None) -> str:
+    h = hashlib.sha256()
+    for name in sorted(fields):
+        h.update(f"{name}={fields[name] or ''}\x00".encode("utf-8"))
+    h.update(hashlib.sha256(content).digest())
+    return h.hexdigest()
+
+
+def claim_key(db: Session, key: str, fingerprint: str) -> KeyClaim:
+    """
+    Одна попытка: new — ключ наш, выполняем запрос; done — отдать complaint_id;
+    gone — жалобу первого запроса удалили; pending — первый запрос ещё идёт;
+    mismatch — ключ уже занят другим телом.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    while True:
+        now = _utcnow_naive()
+        res = db.execute(
+            insert(IdempotencyKey)
+            .values(
+                key=key,
+                fingerprint=fingerprint,
+                status="PENDING",
+                created_at=now,
+                expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+                locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+            )
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+        db.commit()
+        if res.rowcount == 1:
+            return KeyClaim("new")
+
+        row = db.get(IdempotencyKey, key, populate_existing=True)
+        if row is None:
+            continue  # первый запрос упал и освободил ключ — пробуем снова
+        if row.expires_at < now:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at < now))
+            db.commit()
+            continue
+        if row.fingerprint != fingerprint:
+            return KeyClaim("mismatch")
+        if row.status == "DONE":
+            return KeyClaim("done", row.complaint_id)
+        if row.status == "GONE":
+            return KeyClaim("gone", row.complaint_id)
+        if row.locked_until < now:
+            # владелец пропал (воркер убит посреди пайплайна) — перехватываем условным UPDATE
+            took = db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .where(IdempotencyKey.status == "PENDING")
+                .where(IdempotencyKey.locked_until == row.locked_until)
+                .values(locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if took.rowcount == 1:
+                return KeyClaim("new")
+        return KeyClaim("pending")
+
+
+async def acquire_key(db: Session, key: str, fingerprint: str) -> KeyClaim:
+    """
+    claim_key, пока первый запрос с этим ключом не закончится
+    (или не истечёт IDEMPOTENCY_WAIT_SECONDS — тогда pending).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claim = await asyncio.to_thread(claim_key, db, key, fingerprint)
+        if claim.state != "pending" or loop.time() >= deadline:
+            return claim
+        await asyncio.sleep(settings.IDEMPOTENCY_POLL_SECONDS)
+
+
+def complete_key(db: Session, key: str, complaint_id: str) -> None:
+    # без commit: пишется в транзакции самой жалобы
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(status="DONE", complaint_id=complaint_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_key(db: Session, key: str) -> None:
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.status == "PENDING"))
+    db.commit()
+
+
+def prune_keys(db: Session) -> int:
+    res = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < _utcnow_naive()))
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+async def idempotency_prune_loop(interval_s: float) -> None:
+    def _run() -> int:
+        db = SessionLocal()
+        try:
+            return prune_keys(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            await asyncio.to_thread(_run)
+        except Exception as e:
+            print(f"[IDEMPOTENCY] prune failed: {e}")
+        await asyncio.sleep(interval_s)
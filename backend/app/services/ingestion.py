@@ -0,0 +1,432 @@
+# backend/app/services/ingestion.py
+"""
+Единый сервис жалоб: приём (пайплайн этапов) и изменения (статус, фото "после", акимат).
+И app/main.py, и роутеры в app/api/ вызывают только его — логика и оптимизации в одном месте.
+
+Пайплайн приёма: image → cv → nlp → routing → dedup → priority → persist → commit.
+Каждый этап — функция от IngestContext; время этапа пишется в ctx.timings
+и передаётся хукам (add_stage_hook) — для метрик/профилирования.
+"""
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from ..ai.cv_clip import classify_image
+from ..ai.nlp_zero_shot import analyze_text
+from ..ai.router import route
+from ..models import Complaint
+from ..settings import settings
+from ..utils.files import save_image_bytes
+from .akimat import akimat_gate_reasons, akimat_payload_json, store_akimat_payload
+from .akimat_dispatch import enqueue_submission
+from .clusters import ClusterAssignment, assign_cluster, join_group, record_cluster_priority
+from .idempotency import complete_key, release_key
+from .notifications import enqueue_notification
+from .priority import PriorityResult, compute_priority
+from .text_dedup import Signature, TextIndex, TextMatch, find_text_duplicate, lock_text, record_signature, signature
+
+
+# ---- общие вычисления (их же использует reprocess) ----
+def parse_relevant(value: Any) -> bool:
+    return str(value) in ("1", "true", "True")
+
+
+def route_complaint(cv_label: str, nlp_category: str, nlp_urgency: str, is_relevant: bool) -> dict[str, str]:
+    routing = route(
+        cv_label=cv_label or "",
+        nlp_category=nlp_category or "",
+        nlp_urgency=nlp_urgency or "LOW",
+        is_relevant=is_relevant,
+    )
+    return {
+        "department": routing.get("department", ""),
+        "routing_explain": routing.get("routing_explain", ""),
+    }
+
+
+def score_complaint(
+    *,
+    urgency: str | None,
+    is_relevant: bool,
+    created_at: datetime | None,
+    confirmations: int = 1,
+    duplicates_count: int = 0,
+) -> PriorityResult:
+    # Единственная формула приоритета — services/priority.compute_priority
+    # (её же повторяет SQL-пересчёт в priority_recompute.py)
+    return compute_priority(
+        confirmations=confirmations,
+        created_at=created_at,
+        object_type="unknown",
+        urgency=urgency or "LOW",
+        is_relevant=is_relevant,
+        duplicates_count=duplicates_count,
+    )
+
+
+def parse_coord(v: str | None) -> float | None:
+    if not v:
+        return None
+    s = str(v).strip()
+    if not s:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+# ---- пайплайн приёма ----
+@dataclass
+class IngestContext:
+    db: Session
+    content: bytes
+    ext: str
+    text: str
+    ui_category: str
+    lat: float | None
+    lng: float | None
+    lang: str
+    idempotency_key: str | None = None
+
+    complaint_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    image_path: str = ""
+    cv: dict[str, Any] = field(default_factory=dict)
+    nlp: dict[str, Any] = field(default_factory=dict)
+    is_relevant: bool = True
+    routing: dict[str, str] = field(default_factory=dict)
+    dup: ClusterAssignment | None = None
+    dup_explain: str | None = None
+    text_duplicate_of: str | None = None
+    text_sig: Signature | None = None
+    priority: PriorityResult | None = None
+    complaint: Complaint | None = None
+
+    timings: dict[str, float] = field(default_factory=dict)  # этап → секунды
+
+
+StageFn = Callable[[IngestContext], None]
+StageHook = Callable[[str, float, IngestContext], None]
+
+_STAGE_HOOKS: list[StageHook] = []
+
+
+def add_stage_hook(fn: StageHook) -> None:
+    """
+    fn(stage, seconds, ctx) вызывается после каждого этапа приёма.
+    """
+    _STAGE_HOOKS.append(fn)
+
+
+def _stage_image(ctx: IngestContext) -> None:
+    ctx.image_path = save_image_bytes(ctx.complaint_id, ctx.content, ext=ctx.ext)
+
+
+def _stage_cv(ctx: IngestContext) -> None:
+    ctx.cv = classify_image(ctx.image_path)
+    ctx.is_relevant = bool(ctx.cv.get("is_relevant", True))
+
+
+def _stage_nlp(ctx: IngestContext) -> None:
+    ctx.nlp = analyze_text(ctx.text, ctx.lang)
+
+
+def _stage_routing(ctx: IngestContext) -> None:
+    ctx.routing = route_complaint(
+        ctx.cv.get("cv_label", ""),
+        ctx.nlp.get("nlp_category", ""),
+        ctx.nlp.get("nlp_urgency", "LOW"),
+        ctx.is_relevant,
+    )
+
+
+def duplicate_explain(geo: ClusterAssignment, has_coords: bool, text: TextMatch | None, has_sig: bool, decision: str) -> str:
+    """
+    JSON для complaints.duplicate_explain: что сказал каждый сигнал и какой решил.
+    None у сигнала — он не применялся (нет координат / слишком короткий текст).
+    """
+    data = {
+        "decision": decision,  # geo | text | text_link | none
+        "geo": None if not has_coords else (
+            {"new_cluster": True} if geo.is_new
+            else {"group_id": geo.group_id, "distance_m": geo.distance_m}
+        ),
+        "text": None if not has_sig else (
+            {"matched": False} if text is None
+            else {"complaint_id": text.complaint_id, "group_id": text.group_id, "similarity": text.similarity}
+        ),
+    }
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass
+class DedupResult:
+    dup: ClusterAssignment
+    explain: str
+    text_duplicate_of: str | None
+    sig: Signature | None
+
+
+def dedup_complaint(
+    db: Session,
+    *,
+    complaint_id: str,
+    lat: float | None,
+    lng: float | None,
+    text: str,
+    department: str,
+    created_at: datetime,
+    index: TextIndex | None = None,
+) -> DedupResult:
+    """
+    Гео + текстовый сигнал дублей — одно решение для приёма и reprocess.
+    Гео-кластер назначается всегда; текст решает, только если гео-дубля нет:
+    с координатами — связь text_duplicate_of (свой кластер остаётся, следующие
+    жалобы рядом попадут в него), без координат — вход в группу найденной жалобы.
+    index — см. text_dedup.find_text_duplicates. Берёт замок text_dedup.lock_text;
+    сигнатуру не записывает. НЕ коммитит.
+    """
+    geo = assign_cluster(
+        db,
+        complaint_id=complaint_id,
+        lat=lat,
+        lng=lng,
+        created_at=created_at,
+        radius_m=settings.DUP_RADIUS_METERS,
+    )
+    dup = geo
+    has_coords = lat is not None and lng is not None
+
+    # Текстовый сигнал — всегда (для объяснения)
+    sig = signature(text)
+    match = None
+    if sig is not None:
+        # до коммита (в нём же record_signature) конкурент того же департамента ждёт здесь
+        lock_text(db, department)
+        match = find_text_duplicate(db, sig, department, created_at, index)
+
+    text_duplicate_of = None
+    decision = "geo" if has_coords and not geo.is_new else "none"
+    if decision == "none" and match is not None:
+        if has_coords:
+            # счётчики чужой группы не трогаем
+            text_duplicate_of = match.complaint_id
+            decision = "text_link"
+        else:
+            dup = join_group(db, match.group_id, created_at)
+            decision = "text"
+    explain = duplicate_explain(geo, has_coords, match, sig is not None, decision)
+    return DedupResult(dup=dup, explain=explain, text_duplicate_of=text_duplicate_of, sig=sig)
+
+
+def _stage_dedup(ctx: IngestContext) -> None:
+    res = dedup_complaint(
+        ctx.db,
+        complaint_id=ctx.complaint_id,
+        lat=ctx.lat,
+        lng=ctx.lng,
+        text=ctx.text,
+        department=ctx.routing.get("department", ""),
+        created_at=ctx.created_at,
+    )
+    ctx.dup = res.dup
+    ctx.dup_explain = res.explain
+    ctx.text_duplicate_of = res.text_duplicate_of
+    ctx.text_sig = res.sig
+
+
+def _stage_priority(ctx: IngestContext) -> None:
+    ctx.priority = score_complaint(
+        urgency=ctx.nlp.get("nlp_urgency", "LOW"),
+        is_relevant=ctx.is_relevant,
+        created_at=ctx.created_at,
+        confirmations=1,
+        duplicates_count=ctx.dup.duplicates_count,
+    )
+
+
+def _stage_persist(ctx: IngestContext) -> None:
+    dup, pr = ctx.dup, ctx.priority
+    obj = Complaint(
+        id=ctx.complaint_id,
+        created_at=ctx.created_at,
+
+        lang=ctx.lang,
+        text=ctx.text or "",
+        ui_category=ctx.ui_category or "",
+        lat=ctx.lat,
+        lng=ctx.lng,
+        image_path=ctx.image_path,
+        status="NEW" if ctx.is_relevant else "REJECTED",
+
+        cv_label=ctx.cv.get("cv_label", ""),
+        cv_score=float(ctx.cv.get("cv_score", 0.0) or 0.0),
+        is_relevant="1" if ctx.is_relevant else "0",
+
+        nlp_category=ctx.nlp.get("nlp_category", ""),
+        nlp_urgency=ctx.nlp.get("nlp_urgency", "LOW"),
+        nlp_confidence=float(ctx.nlp.get("nlp_confidence", 0.0) or 0.0),
+        nlp_source=ctx.nlp.get("nlp_source"),
+
+        department=ctx.routing.get("department", ""),
+        routing_explain=ctx.routing.get("routing_explain", ""),
+
+        duplicate_group_id=dup.group_id,
+        duplicates_count=dup.duplicates_count,
+        duplicate_of=dup.duplicate_of,
+        duplicate_explain=ctx.dup_explain,
+        text_duplicate_of=ctx.text_duplicate_of,
+        confirmations=1,
+
+        priority_score=float(pr.score),
+        priority_level=str(pr.level),
+    )
+    record_cluster_priority(ctx.db, dup.group_id, pr.score)
+    ctx.db.add(obj)
+    if ctx.text_sig is not None:
+        record_signature(ctx.db, obj.id, ctx.created_at, ctx.text_sig)
+    if ctx.idempotency_key:
+        complete_key(ctx.db, ctx.idempotency_key, obj.id)
+    enqueue_notification(
+        ctx.db,
+        "complaint_created",
+        {"id": obj.id, "status": obj.status, "priority": obj.priority_level},
+        recipient=obj.department,
+    )
+    ctx.complaint = obj
+
+
+def _stage_commit(ctx: IngestContext) -> None:
+    ctx.db.commit()
+    ctx.db.refresh(ctx.complaint)
+
+
+# Порядок важен: routing зависит от CV/NLP, priority — от NLP и дублей
+STAGES: list[tuple[str, StageFn]] = [
+    ("image", _stage_image),
+    ("cv", _stage_cv),
+    ("nlp", _stage_nlp),
+    ("routing", _stage_routing),
+    ("dedup", _stage_dedup),
+    ("priority", _stage_priority),
+    ("persist", _stage_persist),
+    ("commit", _stage_commit),
+]
+
+
+def run_pipeline(ctx: IngestContext) -> IngestContext:
+    try:
+        for name, fn in STAGES:
+            t0 = time.perf_counter()
+            fn(ctx)
+            dt = time.perf_counter() - t0
+            ctx.timings[name] = dt
+            for hook in _STAGE_HOOKS:
+                hook(name, dt, ctx)
+    except Exception:
+        ctx.db.rollback()
+        raise
+    return ctx
+
+
+def ingest_complaint(
+    db: Session,
+    *,
+    content: bytes,
+    filename: str | None,
+    text: str = "",
+    ui_category: str = "",
+    lat: str | None = None,
+    lng: str | None = None,
+    lang: str = "ru",
+    idempotency_key: str | None = None,
+) -> IngestContext:
+    """
+    Синхронный (CV/NLP — тяжёлые вызовы моделей): из async-роутов вызывать через threadpool.
+    idempotency_key — уже захваченный (services/idempotency.claim_key): помечается DONE
+    в коммите жалобы, при ошибке освобождается.
+    """
+    ext = ((filename or "").split(".")[-1] or "jpg").lower()
+    ctx = IngestContext(
+        db=db,
+        content=content,
+        ext=ext,
+        text=text or "",
+        ui_category=ui_category or "",
+        lat=parse_coord(lat),
+        lng=parse_coord(lng),
+        lang=lang or "ru",
+        idempotency_key=idempotency_key,
+    )
+    try:
+        return run_pipeline(ctx)
+    except Exception:
+        if idempotency_key:
+            release_key(db, idempotency_key)
+        raise
+
+
+# ---- изменения жалобы ----
+def update_status(db: Session, obj: Complaint, status: str | None) -> Complaint:
+    if status:
+        obj.status = status
+    enqueue_notification(db, "complaint_updated", {"id": obj.id, "status": obj.status}, recipient=obj.department)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
+def attach_after_photo(db: Session, obj: Complaint, content: bytes, filename: str | None) -> Complaint:
+    ext = ((filename or "").split(".")[-1] or "jpg").lower()
+    obj.after_image_path = save_image_bytes(f"{obj.id}_after", content, ext=ext)
+    enqueue_notification(db, "after_photo_uploaded", {"id": obj.id}, recipient=obj.department)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
+def prepare_for_akimat(db: Session, obj: Complaint, mark_prepared: bool = True) -> tuple[list[str], str | None]:
+    """
+    Гейт + канонический payload (сохраняется в кэш жалобы). → (причины отказа, payload JSON или None).
+    """
+    reasons = akimat_gate_reasons(obj)
+    if reasons:
+        return reasons, None
+    body = store_akimat_payload(db, obj)
+    if mark_prepared:
+        obj.akimat_status = "PREPARED"
+    db.commit()
+    return [], body
+
+
+def queue_for_akimat(db: Session, obj: Complaint) -> dict[str, Any]:
+    """
+    Ставит в очередь отправки (саму отправку делает akimat_dispatch пачками).
+    Если жалоба менялась после prepare — payload пересобирается под новую версию,
+    а гейт проверяется заново: после prepare жалоба могла перестать его проходить.
+    """
+    mode = "live" if settings.AKIMAT_ENDPOINT else "stub"
+    reasons = akimat_gate_reasons(obj)
+    if reasons:
+        return {"queued": False, "mode": mode, "reasons": reasons}
+
+    sub = enqueue_submission(db, obj, akimat_payload_json(obj))
+    enqueue_notification(db, "akimat_queued", {"id": obj.id, "key": sub.idempotency_key}, recipient=obj.department)
+    db.commit()
+    db.refresh(sub)
+    return {
+        "queued": True,
+        "mode": mode,
+        "submission_id": sub.id,
+        "idempotency_key": sub.idempotency_key,
+        "status": sub.status,
+    }
@@ -0,0 +1,191 @@
+# backend/app/services/live_feed.py
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..crud import complaint_rows_by_ids
+from ..db import SessionLocal
+from ..models import FeedEvent
+from ..settings import settings
+from ..utils.jsonfast import dumps_fast
+
+# id из автоинкремента могут стать видимыми не по порядку (параллельные транзакции),
+# поэтому каждый опрос перечитывает небольшое окно перед last_id и отсеивает уже разосланные
+_REORDER_WINDOW = 50
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_feed_event(db: Session, event: str, payload_json: str, department: str, complaint_id: str | None) -> None:
+    """
+    Пишет событие ленты в текущую транзакцию. НЕ коммитит (см. enqueue_notification).
+    """
+    db.add(
+        FeedEvent(
+            created_at=_utcnow_naive(),
+            event=event,
+            department=department or "",
+            complaint_id=complaint_id,
+            payload=payload_json,
+        )
+    )
+
+
+def fetch_events(
+    db: Session,
+    after_id: int,
+    department: str | None = None,
+    limit: int | None = None,
+) -> list[tuple[int, str, str]]:
+    """
+    События с id > after_id → [(id, department, готовое SSE-сообщение)].
+    К событию прикладывается текущая строка жалобы (как в GET /complaints) — клиенту не нужно её перезапрашивать.
+    """
+    q = select(FeedEvent).where(FeedEvent.id > after_id)
+    if department:
+        q = q.where(FeedEvent.department == department)
+    q = q.order_by(FeedEvent.id.asc()).limit(limit or settings.FEED_CATCHUP_LIMIT)
+    return _render(db, db.execute(q).scalars().all())
+
+
+def _render(db: Session, events: list[FeedEvent]) -> list[tuple[int, str, str]]:
+    rows = complaint_rows_by_ids(db, list({e.complaint_id for e in events if e.complaint_id}))
+    out = []
+    for e in events:
+        data = {
+            "event": e.event,
+            "department": e.department,
+            "created_at": e.created_at,
+            "payload": json.loads(e.payload or "{}"),
+            "complaint": rows.get(e.complaint_id),
+        }
+        msg = f"id: {e.id}\nevent: {e.event}\ndata: {dumps_fast(data).decode('utf-8')}\n\n"
+        out.append((e.id, e.department, msg))
+    return out
+
+
+def prune_events(db: Session) -> int:
+    cutoff = _utcnow_naive() - timedelta(hours=settings.FEED_RETENTION_HOURS)
+    res = db.execute(delete(FeedEvent).where(FeedEvent.created_at < cutoff))
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+@dataclass(eq=False)
+class Subscriber:
+    department: str | None
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=settings.FEED_QUEUE_SIZE))
+    # клиент не успевает читать → закрываем поток, он переподключится с Last-Event-ID
+    closed: bool = False
+
+
+class FeedBroker:
+    """
+    Один опрос feed_events на процесс, раздача по asyncio-очередям подписчиков.
+    Нагрузка на БД не растёт с числом открытых дашбордов.
+    """
+
+    def __init__(self) -> None:
+        self.last_id: int | None = None
+        self._subs: set[Subscriber] = set()
+        self._recent: deque[int] = deque(maxlen=5000)
+        self._recent_set: set[int] = set()
+
+    def subscribe(self, department: str | None) -> Subscriber:
+        sub = Subscriber(department=department)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subs.discard(sub)
+
+    def queue_stats(self) -> tuple[int, int]:
+        """
+        (подписчиков, событий в их очередях) — для /metrics.
+        """
+        subs = list(self._subs)
+        return len(subs), sum(s.queue.qsize() for s in subs)
+
+    def _remember(self, event_id: int) -> None:
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_set.discard(self._recent[0])
+        self._recent.append(event_id)
+        self._recent_set.add(event_id)
+
+    def _poll(self) -> list[tuple[int, str, str]]:
+        db = SessionLocal()
+        try:
+            if self.last_id is None or not self._subs:
+                # подписчиков нет — только двигаем курсор
+                self.last_id = int(db.execute(select(func.coalesce(func.max(FeedEvent.id), 0))).scalar_one())
+                return []
+            ids = [
+                i
+                for (i,) in db.execute(
+                    select(FeedEvent.id)
+                    .where(FeedEvent.id > max(0, self.last_id - _REORDER_WINDOW))
+                    .order_by(FeedEvent.id.asc())
+                    .limit(settings.FEED_CATCHUP_LIMIT)
+                )
+            ]
+            new_ids = [i for i in ids if i not in self._recent_set]
+            if not new_ids:
+                return []
+            events = db.execute(
+                select(FeedEvent).where(FeedEvent.id.in_(new_ids)).order_by(FeedEvent.id.asc())
+            ).scalars().all()
+            items = _render(db, events)
+        finally:
+            db.close()
+        for i in new_ids:
+            self._remember(i)
+        self.last_id = max(self.last_id, new_ids[-1])
+        return items
+
+    def publish(self, items: list[tuple[int, str, str]]) -> None:
+        for sub in list(self._subs):
+            if sub.closed:
+                continue
+            for event_id, department, msg in items:
+                if sub.department and sub.department != department:
+                    continue
+                try:
+                    sub.queue.put_nowait((event_id, msg))
+                except asyncio.QueueFull:
+                    sub.closed = True
+                    break
+
+    async def run(self, interval_s: float) -> None:
+        last_prune = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                items = await asyncio.to_thread(self._poll)
+                if items:
+                    self.publish(items)
+                if loop.time() - last_prune > 3600:
+                    last_prune = loop.time()
+                    await asyncio.to_thread(_prune)
+            except Exception as e:
+                print(f"[FEED] poll failed: {e}")
+            await asyncio.sleep(interval_s)
+
+
+def _prune() -> None:
+    db = SessionLocal()
+    try:
+        prune_events(db)
+    finally:
+        db.close()
+
+
+feed_broker = FeedBroker()
@@ -1,6 +1,23 @@
 # backend/app/services/notifications.py
 from __future__ import annotations
-from datetime import datetime, timezone
+
+import asyncio
+import json
+import smtplib
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Callable
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import NotificationOutbox
+from ..settings import settings
+from .live_feed import record_feed_event
+
 
 def notify_mock(event: str, payload: dict) -> None:
     """
@@ -9,3 +26,188 @@ def notify_mock(event: str, payload: dict) -> None:
     """
     ts = datetime.now(timezone.utc).isoformat()
     print(f"[NOTIFY][{ts}] {event}: {payload}")
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ---- каналы ----
+# Канал получает получателя и ВСЕ его накопившиеся события одной пачкой
+# (coalescing): одно письмо/сообщение вместо десятка.
+Channel = Callable[[str, list[dict[str, Any]]], None]
+
+
+def _log_channel(recipient: str, events: list[dict[str, Any]]) -> None:
+    for e in events:
+        notify_mock(e["event"], {**e["payload"], "recipient": recipient})
+
+
+def _file_channel(recipient: str, events: list[dict[str, Any]]) -> None:
+    # Локальный sink для офлайн-проверки: одна NDJSON-строка на получателя и пачку
+    path = settings.NOTIFICATIONS_DIR / "sent.ndjson"
+    line = {
+        "sent_at": datetime.now(timezone.utc).isoformat(),
+        "recipient": recipient,
+        "events": events,
+    }
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def _smtp_channel(recipient: str, events: list[dict[str, Any]]) -> None:
+    msg = EmailMessage()
+    msg["From"] = settings.SMTP_FROM
+    msg["To"] = settings.SMTP_TO
+    msg["Subject"] = f"[Smart City Shymkent] {recipient}: {len(events)} событ."
+    body = "\n".join(f"- {e['event']}: {json.dumps(e['payload'], ensure_ascii=False)}" for e in events)
+    msg.set_content(body)
+    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=10) as smtp:
+        smtp.send_message(msg)
+
+
+CHANNELS: dict[str, Channel] = {
+    "log": _log_channel,
+    "file": _file_channel,
+    "smtp": _smtp_channel,
+}
+
+
+def register_channel(name: str, fn: Channel) -> None:
+    CHANNELS[name] = fn
+
+
+# ---- outbox ----
+def enqueue_notification(
+    db: Session,
+    event: str,
+    payload: dict,
+    recipient: str | None = None,
+    channels: tuple[str, ...] | None = None,
+) -> None:
+    """
+    Кладёт уведомление в outbox (по строке на канал). НЕ коммитит:
+    вызывающий коммитит вместе с изменением жалобы, так что уведомление
+    появляется тогда и только тогда, когда изменение сохранено.
+    То же событие попадает в live-ленту (feed_events, SSE).
+    """
+    now = _utcnow_naive()
+    body = json.dumps(payload, ensure_ascii=False, default=str)
+    for ch in channels or settings.NOTIFY_CHANNELS:
+        db.add(
+            NotificationOutbox(
+                created_at=now,
+                event=event,
+                channel=ch,
+                recipient=recipient or "dispatch",
+                payload=body,
+                status="PENDING",
+                attempts=0,
+                next_attempt_at=now,
+            )
+        )
+    record_feed_event(db, event, body, recipient or "", payload.get("id"))
+
+
+def _backoff(attempts: int) -> timedelta:
+    s = settings.NOTIFY_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(s, settings.NOTIFY_BACKOFF_MAX_SECONDS))
+
+
+def _claim_batch(db: Session, now: datetime, limit: int) -> list[NotificationOutbox]:
+    ids = [
+        i
+        for (i,) in db.query(NotificationOutbox.id)
+        .filter(NotificationOutbox.status == "PENDING")
+        .filter(NotificationOutbox.next_attempt_at <= now)
+        .filter(or_(NotificationOutbox.locked_until.is_(None), NotificationOutbox.locked_until < now))
+        .order_by(NotificationOutbox.id.asc())
+        .limit(limit)
+        .all()
+    ]
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    db.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(ids))
+        .where(or_(NotificationOutbox.locked_until.is_(None), NotificationOutbox.locked_until < now))
+        .values(claim_token=token, locked_until=now + timedelta(seconds=settings.NOTIFY_LOCK_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return (
+        db.query(NotificationOutbox)
+        .filter(NotificationOutbox.claim_token == token)
+        .order_by(NotificationOutbox.id.asc())
+        .all()
+    )
+
+
+def drain_outbox(db: Session, limit: int | None = None) -> dict:
+    """
+    Один проход диспетчера:
+    - захватываем пачку готовых к отправке строк
+    - группируем по (канал, получатель) и шлём одной пачкой
+    - успех → SENT, ошибка → повтор с экспоненциальной задержкой,
+      после NOTIFY_MAX_ATTEMPTS → DEAD
+    """
+    now = _utcnow_naive()
+    rows = _claim_batch(db, now, limit or settings.NOTIFY_BATCH_SIZE)
+
+    groups: dict[tuple[str, str], list[NotificationOutbox]] = defaultdict(list)
+    for r in rows:
+        groups[(r.channel, r.recipient)].append(r)
+
+    sent = failed = dead = 0
+    for (channel, recipient), items in groups.items():
+        fn = CHANNELS.get(channel)
+        try:
+            if fn is None:
+                raise RuntimeError(f"Unknown notification channel: {channel}")
+            fn(recipient, [{"event": r.event, "payload": json.loads(r.payload or "{}")} for r in items])
+        except Exception as e:
+            for r in items:
+                r.attempts = int(r.attempts or 0) + 1
+                r.last_error = str(e)[:500]
+                if r.attempts >= settings.NOTIFY_MAX_ATTEMPTS:
+                    r.status = "DEAD"
+                    dead += 1
+                else:
+                    r.next_attempt_at = now + _backoff(r.attempts)
+                    failed += 1
+        else:
+            for r in items:
+                r.attempts = int(r.attempts or 0) + 1
+                r.status = "SENT"
+                r.sent_at = now
+                sent += 1
+        for r in items:
+            r.claim_token = None
+            r.locked_until = None
+        db.commit()
+
+    return {"claimed": len(rows), "groups": len(groups), "sent": sent, "retry": failed, "dead": dead}
+
+
+async def notification_dispatch_loop(interval_s: float) -> None:
+    """
+    Фоновый диспетчер для FastAPI. Пока outbox не пуст — дренируем без паузы.
+    """
+
+    def _run() -> dict:
+        db = SessionLocal()
+        try:
+            return drain_outbox(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            result = await asyncio.to_thread(_run)
+        except Exception as e:
+            print(f"[NOTIFY] dispatcher failed: {e}")
+            result = {"claimed": 0}
+        if result["claimed"] < settings.NOTIFY_BATCH_SIZE:
+            await asyncio.sleep(interval_s)
@@ -3,6 +3,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+from ..utils.metrics import timed
+
 URG_WEIGHT = {"low": 0.2, "medium": 0.6, "high": 1.0}
 OBJ_WEIGHT = {
     "hospital": 1.0,
@@ -14,6 +16,10 @@ OBJ_WEIGHT = {
     "unknown": 0.4,
 }
 
+HIGH_THRESHOLD = 0.75
+MEDIUM_THRESHOLD = 0.45
+WAITING_FULL_DAYS = 7.0
+
 @dataclass
 class PriorityResult:
     score: float
@@ -28,6 +34,7 @@ def _clamp01(x: float) -> float:
     return x
 
 
+@timed("priority")
 def compute_priority(
     *,
     confirmations: int,
@@ -62,7 +69,7 @@ def compute_priority(
         if ca.tzinfo is None:
             ca = ca.replace(tzinfo=timezone.utc)
         days = max(0.0, (now - ca).total_seconds() / 86400.0)
-        waiting_norm = _clamp01(days / 7.0)
+        waiting_norm = _clamp01(days / WAITING_FULL_DAYS)
 
     # Веса: можно потом тюнить
     score = (
@@ -72,9 +79,9 @@ def compute_priority(
         + 0.20 * obj
     )
 
-    if score >= 0.75:
+    if score >= HIGH_THRESHOLD:
         level = "HIGH"
-    elif score >= 0.45:
+    elif score >= MEDIUM_THRESHOLD:
         level = "MEDIUM"
     else:
         level = "LOW"
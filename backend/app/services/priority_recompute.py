@@ -0,0 +1,199 @@
+# backend/app/services/priority_recompute.py
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import Numeric, case, cast, func, insert, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+from ..db import SessionLocal
+from ..models import Complaint, DuplicateCluster, OPEN_STATUSES, PriorityTransition
+from ..settings import settings
+from .clusters import refresh_cluster_priorities
+from .priority import (
+    HIGH_THRESHOLD,
+    MEDIUM_THRESHOLD,
+    OBJ_WEIGHT,
+    URG_WEIGHT,
+    WAITING_FULL_DAYS,
+)
+
+
+def _utcnow_naive() -> datetime:
+    # created_at хранится как naive UTC (datetime.utcnow)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _days_waiting(dialect: str, now: datetime):
+    if dialect == "sqlite":
+        return func.julianday(literal(now)) - func.julianday(Complaint.created_at)
+    # postgresql и прочие с EXTRACT(EPOCH ...)
+    return func.extract("epoch", literal(now) - Complaint.created_at) / 86400.0
+
+
+def _clamp01(expr):
+    return case((expr < 0, 0.0), (expr > 1, 1.0), else_=expr)
+
+
+def _raw_score_expr(dialect: str, now: datetime):
+    """
+    SQL-версия compute_priority (те же веса и пороги), чтобы пересчитать
+    все открытые жалобы одним UPDATE без выгрузки строк в Python.
+    Нерелевантные → 0.0, как и в compute_priority.
+    """
+    urg = case(
+        *[(func.lower(Complaint.nlp_urgency) == k, v) for k, v in URG_WEIGHT.items()],
+        else_=URG_WEIGHT["medium"],
+    )
+    # object_type пока не хранится — как и при создании, считаем "unknown"
+    obj = OBJ_WEIGHT["unknown"]
+
+    conf_total = (
+        case((Complaint.confirmations > 1, Complaint.confirmations), else_=1)
+        + case((Complaint.duplicates_count > 0, Complaint.duplicates_count), else_=0)
+    )
+    confirmations_norm = _clamp01(conf_total / 10.0)
+
+    days = _days_waiting(dialect, now)
+    waiting_norm = case(
+        (Complaint.created_at.is_(None), 0.0),
+        else_=_clamp01(case((days < 0, 0.0), else_=days) / WAITING_FULL_DAYS),
+    )
+
+    raw = 0.35 * urg + 0.25 * confirmations_norm + 0.20 * waiting_norm + 0.20 * obj
+    return case((Complaint.is_relevant == "1", raw), else_=0.0)
+
+
+def _rounded(raw):
+    return func.round(cast(raw, Numeric(10, 6)), 3)
+
+
+def _level_expr(raw):
+    # уровень считаем по неокруглённому значению — как compute_priority
+    return case(
+        (raw >= HIGH_THRESHOLD, "HIGH"),
+        (raw >= MEDIUM_THRESHOLD, "MEDIUM"),
+        else_="LOW",
+    )
+
+
+def refresh_duplicate_counts(db: Session) -> int:
+    """
+    duplicates_count = member_count - 1 кластера жалобы (duplicate_clusters).
+    У текстовых групп без координат кластера нет — там считаем участников
+    по complaints.duplicate_group_id (индекс). confirmations из дублей больше
+    не выводятся (их учитывает duplicates_count), только нормализуем < 1 → 1.
+    """
+    cluster_size = (
+        select(DuplicateCluster.member_count - 1)
+        .where(DuplicateCluster.id == Complaint.duplicate_group_id)
+        .scalar_subquery()
+    )
+    member = aliased(Complaint)
+    group_size = (
+        select(func.count() - 1)
+        .select_from(member)
+        .where(member.duplicate_group_id == Complaint.duplicate_group_id)
+        .scalar_subquery()
+    )
+
+    dup_count = case(
+        (Complaint.duplicate_group_id.is_(None), 0),
+        else_=func.coalesce(cluster_size, group_size, 0),
+    )
+    res = db.execute(
+        update(Complaint)
+        .where(Complaint.status.in_(OPEN_STATUSES))
+        .where((func.coalesce(Complaint.duplicates_count, -1) != dup_count) | (Complaint.confirmations < 1))
+        .values(
+            duplicates_count=dup_count,
+            confirmations=case((Complaint.confirmations < 1, 1), else_=Complaint.confirmations),
+            # duplicates_count в payload акимата не входит, confirmations — входит
+            payload_version=Complaint.payload_version + case((Complaint.confirmations < 1, 1), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return int(res.rowcount or 0)
+
+
+def recompute_open_priorities(db: Session, now: datetime | None = None, refresh_counts: bool = True) -> dict:
+    """
+    Пересчёт priority_score/priority_level для всех открытых жалоб.
+    - опционально обновляет duplicates_count/confirmations
+    - затем агрегаты приоритета кластеров дублей
+    - смены уровня пишутся в priority_transitions (INSERT ... SELECT)
+    - сам пересчёт — один UPDATE строк, где сменился уровень или score сдвинулся
+      на PRIORITY_SCORE_STEP
+    Всё в одной транзакции.
+    """
+    now = now or _utcnow_naive()
+    dialect = db.get_bind().dialect.name
+
+    refreshed = refresh_duplicate_counts(db) if refresh_counts else 0
+
+    raw = _raw_score_expr(dialect, now)
+    score = _rounded(raw)
+    level = _level_expr(raw)
+    is_open = Complaint.status.in_(OPEN_STATUSES)
+
+    transitions = db.execute(
+        insert(PriorityTransition)
+        .from_select(
+            ["complaint_id", "from_level", "to_level", "score", "created_at"],
+            select(Complaint.id, Complaint.priority_level, level, score, literal(now))
+            .where(is_open)
+            .where(Complaint.priority_level != level),
+        )
+    ).rowcount
+
+    # Слагаемое ожидания растёт непрерывно — без порога UPDATE переписывал бы почти все
+    # открытые жалобы каждый цикл (updated_at → delta-sync, версия таблицы → ETag).
+    # Пишем смену уровня или сдвиг score не меньше PRIORITY_SCORE_STEP; payload акимата
+    # содержит только уровень — его версию поднимает только смена уровня.
+    level_changed = Complaint.priority_level != level
+    drift = func.abs(func.coalesce(Complaint.priority_score, -1.0) - score)
+    updated = db.execute(
+        update(Complaint)
+        .where(is_open)
+        .where(level_changed | (drift >= settings.PRIORITY_SCORE_STEP))
+        .values(
+            priority_score=score,
+            priority_level=level,
+            payload_version=Complaint.payload_version + case((level_changed, 1), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    clusters = refresh_cluster_priorities(db)
+
+    db.commit()
+    return {
+        "updated": int(updated or 0),
+        "transitions": int(transitions or 0),
+        "counts_refreshed": refreshed,
+        "clusters_refreshed": clusters,
+        "at": now.isoformat(),
+    }
+
+
+async def priority_recompute_loop(interval_s: float) -> None:
+    """
+    Фоновый цикл для FastAPI: раз в interval_s секунд пересчитываем приоритеты.
+    Сам UPDATE блокирующий, поэтому уводим его в поток.
+    """
+
+    def _run() -> dict:
+        db = SessionLocal()
+        try:
+            return recompute_open_priorities(db)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            result = await asyncio.to_thread(_run)
+            print(f"[PRIORITY] recomputed: {result}")
+        except Exception as e:
+            print(f"[PRIORITY] recompute failed: {e}")
@@ -0,0 +1,413 @@
+# backend/app/services/reprocess.py
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from ..models import Complaint
+from ..settings import settings
+from .clusters import reset_clusters
+from .ingestion import dedup_complaint, parse_relevant, route_complaint, score_complaint
+from .text_dedup import TextIndex, signature
+
+# Порядок важен: routing зависит от CV/NLP, priority — от NLP и дублей
+STAGES = ("cv", "nlp", "routing", "dedup", "priority")
+
+# Какие поля жалобы переписывает каждый этап
+STAGE_FIELDS = {
+    "cv": ("cv_label", "cv_score", "is_relevant", "status"),
+    "nlp": ("nlp_category", "nlp_urgency", "nlp_confidence", "nlp_source"),
+    "routing": ("department", "routing_explain"),
+    "dedup": ("duplicate_group_id", "duplicates_count", "duplicate_of", "duplicate_explain", "text_duplicate_of"),
+    "priority": ("priority_score", "priority_level"),
+}
+
+# Статусы, которые выставляет сам пайплайн (а не оператор) — их можно пересчитывать
+_AUTO_STATUSES = ("NEW", "REJECTED")
+
+
+@dataclass
+class ReprocessOptions:
+    stages: tuple[str, ...] = STAGES
+    chunk_size: int = 200
+    # процессов для CV/NLP: каждый грузит свои CLIP и XLM-R large (несколько ГБ) —
+    # больше 1–2 только на машине с запасом памяти
+    workers: int = 1
+    dry_run: bool = False
+    checkpoint_path: Path | None = None
+    report_path: Path | None = None
+    limit: int | None = None
+
+
+@dataclass
+class ReprocessReport:
+    processed: int = 0
+    changed: int = 0
+    chunks: int = 0
+    errors: int = 0
+    changed_fields: dict[str, int] = field(default_factory=dict)
+    last_key: tuple[str, str] | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "changed": self.changed,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "changed_fields": dict(self.changed_fields),
+            "last_key": list(self.last_key) if self.last_key else None,
+        }
+
+
+def parse_stages(raw: str) -> tuple[str, ...]:
+    """
+    "cv,routing" → ("cv", "routing") в каноническом порядке STAGES.
+    """
+    wanted = {s.strip().lower() for s in (raw or "").split(",") if s.strip()}
+    if not wanted or "all" in wanted:
+        return STAGES
+    unknown = wanted - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+    return tuple(s for s in STAGES if s in wanted)
+
+
+# ---- checkpoint ----
+def load_checkpoint(path: Path | None, stages: tuple[str, ...]) -> tuple[str, str] | None:
+    """
+    Ключ, с которого продолжать. Checkpoint от прогона с другими этапами не подходит:
+    жалобы до ключа не пересчитаны на недостающих этапах — ValueError (начать заново: --reset).
+    """
+    if path is None or not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    saved = tuple(data.get("stages") or ())
+    if saved != tuple(stages):
+        raise ValueError(
+            f"{path}: checkpoint is for stages {','.join(saved) or '?'}, requested {','.join(stages)}; "
+            "finish that run or start over with --reset"
+        )
+    key = data.get("last_key")
+    return (key[0], key[1]) if key else None
+
+
+def save_checkpoint(path: Path | None, report: ReprocessReport, stages: tuple[str, ...]) -> None:
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    data = {"stages": list(stages), **report.to_dict()}
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # атомарная замена: при падении посреди записи старый checkpoint не портится
+    os.replace(tmp, path)
+
+
+# ---- streaming ----
+def _row_key(c: Complaint) -> tuple[str, str]:
+    return (c.created_at.isoformat(), c.id)
+
+
+def iter_chunks(
+    db: Session,
+    chunk_size: int,
+    after: tuple[str, str] | None = None,
+) -> Iterator[list[Complaint]]:
+    """
+    Keyset-пагинация по (created_at, id): не зависит от OFFSET
+    и стабильно продолжается с checkpoint.
+    """
+    last = after
+    while True:
+        q = db.query(Complaint)
+        if last is not None:
+            ts = datetime.fromisoformat(last[0])
+            q = q.filter(
+                or_(
+                    Complaint.created_at > ts,
+                    and_(Complaint.created_at == ts, Complaint.id > last[1]),
+                )
+            )
+        rows = q.order_by(Complaint.created_at.asc(), Complaint.id.asc()).limit(chunk_size).all()
+        if not rows:
+            return
+        # ключ берём до yield: после commit у потребителя атрибуты будут expired
+        last = _row_key(rows[-1])
+        yield rows
+
+
+def seed_text_index(db: Session, index: TextIndex, after: tuple[str, str]) -> int:
+    """
+    При продолжении с checkpoint: жалобы окна TEXT_DUP_WINDOW_DAYS до ключа — в текстовый индекс,
+    как если бы прогон шёл с начала. Сигнатуры считаются по тексту: в text_signatures
+    старые уже удалены.
+    """
+    if settings.TEXT_DUP_WINDOW_DAYS <= 0:
+        return 0
+    ts = datetime.fromisoformat(after[0])
+    q = (
+        db.query(Complaint.id, Complaint.created_at, Complaint.text)
+        .filter(Complaint.created_at >= ts - timedelta(days=settings.TEXT_DUP_WINDOW_DAYS))
+        .filter(or_(Complaint.created_at < ts, and_(Complaint.created_at == ts, Complaint.id <= after[1])))
+        .order_by(Complaint.created_at.asc(), Complaint.id.asc())
+    )
+    added = 0
+    for cid, created_at, text in q:
+        sig = signature(text or "")
+        if sig is not None:
+            index.push(cid, created_at, sig)
+            added += 1
+    return added
+
+
+# ---- model stages (выполняются в воркерах) ----
+def _init_worker(threads: int) -> None:
+    # Каждый процесс грузит свои модели; ограничиваем потоки torch,
+    # чтобы N процессов не дрались за одни и те же ядра.
+    import torch
+
+    torch.set_num_threads(max(1, threads))
+
+
+def _infer(item: dict[str, Any]) -> dict[str, Any]:
+    out: dict[str, Any] = {"id": item["id"]}
+
+    if "cv" in item["stages"]:
+        from ..ai.cv_clip import classify_image
+
+        try:
+            cv = classify_image(item["image_path"])
+        except Exception as e:  # файл мог пропасть с диска
+            out["error"] = f"cv: {e}"
+        else:
+            out["cv_label"] = cv.get("cv_label", "")
+            out["cv_score"] = float(cv.get("cv_score", 0.0) or 0.0)
+            out["is_relevant"] = "1" if cv.get("is_relevant", True) else "0"
+
+    if "nlp" in item["stages"]:
+        from ..ai.nlp_zero_shot import analyze_text
+
+        nlp = analyze_text(item["text"], item["lang"])
+        out["nlp_category"] = nlp.get("nlp_category", "")
+        out["nlp_urgency"] = nlp.get("nlp_urgency", "LOW")
+        out["nlp_confidence"] = float(nlp.get("nlp_confidence", 0.0) or 0.0)
+        out["nlp_source"] = nlp.get("nlp_source")
+
+    return out
+
+
+def _run_models(
+    rows: list[Complaint],
+    stages: tuple[str, ...],
+    pool: ProcessPoolExecutor | None,
+) -> dict[str, dict[str, Any]]:
+    model_stages = tuple(s for s in stages if s in ("cv", "nlp"))
+    if not model_stages:
+        return {}
+
+    items = [
+        {
+            "id": c.id,
+            "image_path": c.image_path,
+            "text": c.text or "",
+            "lang": c.lang or "ru",
+            "stages": model_stages,
+        }
+        for c in rows
+    ]
+    results = pool.map(_infer, items) if pool is not None else map(_infer, items)
+    return {r["id"]: r for r in results}
+
+
+# ---- per-row pipeline ----
+def _recompute(
+    db: Session,
+    c: Complaint,
+    stages: tuple[str, ...],
+    inferred: dict[str, Any],
+    text_index: TextIndex | None = None,
+) -> dict[str, Any]:
+    """
+    Возвращает новые значения полей (только для выбранных этапов).
+    Текущие значения жалобы используются как вход для следующих этапов.
+    text_index — текстовый индекс прогона (dedup), его наполняет сам _recompute.
+    """
+    new: dict[str, Any] = {}
+
+    def cur(name: str) -> Any:
+        return new.get(name, getattr(c, name))
+
+    if "cv" in stages and "cv_label" in inferred:
+        for k in ("cv_label", "cv_score", "is_relevant"):
+            new[k] = inferred[k]
+        if c.status in _AUTO_STATUSES:
+            new["status"] = "NEW" if new["is_relevant"] == "1" else "REJECTED"
+
+    if "nlp" in stages:
+        for k in STAGE_FIELDS["nlp"]:
+            new[k] = inferred[k]
+
+    is_relevant = parse_relevant(cur("is_relevant"))
+
+    if "routing" in stages:
+        new.update(route_complaint(cur("cv_label"), cur("nlp_category"), cur("nlp_urgency"), is_relevant))
+
+    if "dedup" in stages:
+        # Кластеры и текстовый индекс пересобираются в порядке created_at, поэтому
+        # каждая жалоба видит только более ранние. Поля пишем сразу: последующий
+        # union или вход в текстовую группу в этом же куске должен видеть и эту жалобу.
+        res = dedup_complaint(
+            db,
+            complaint_id=c.id,
+            lat=c.lat,
+            lng=c.lng,
+            text=c.text or "",
+            department=cur("department") or "",
+            created_at=c.created_at,
+            index=text_index,
+        )
+        if res.sig is not None and text_index is not None:
+            text_index.push(c.id, c.created_at, res.sig)
+        new["duplicate_group_id"] = res.dup.group_id
+        new["duplicates_count"] = res.dup.duplicates_count
+        new["duplicate_of"] = res.dup.duplicate_of
+        new["duplicate_explain"] = res.explain
+        new["text_duplicate_of"] = res.text_duplicate_of
+        db.execute(
+            update(Complaint)
+            .where(Complaint.id == c.id)
+            .values(
+                **{k: new[k] for k in STAGE_FIELDS["dedup"]},
+                payload_version=Complaint.payload_version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    if "priority" in stages:
+        pr = score_complaint(
+            urgency=cur("nlp_urgency"),
+            is_relevant=is_relevant,
+            created_at=c.created_at,
+            confirmations=int(cur("confirmations") or 1),
+            duplicates_count=int(cur("duplicates_count") or 0),
+        )
+        new["priority_score"] = float(pr.score)
+        new["priority_level"] = str(pr.level)
+
+    return new
+
+
+def _diff(c: Complaint, new: dict[str, Any]) -> dict[str, list[Any]]:
+    out: dict[str, list[Any]] = {}
+    for k, v in new.items():
+        old = getattr(c, k)
+        if isinstance(v, float) and isinstance(old, (int, float)):
+            if abs(float(old) - v) < 1e-9:
+                continue
+        elif old == v:
+            continue
+        out[k] = [old, v]
+    return out
+
+
+def reprocess(db: Session, opts: ReprocessOptions) -> ReprocessReport:
+    """
+    Потоково перепрогоняет выбранные этапы пайплайна по уже сохранённым жалобам.
+    - чтение кусками по chunk_size (keyset)
+    - CV/NLP параллельно в пуле процессов
+    - запись — один bulk UPDATE на кусок
+    - checkpoint после каждого куска (можно прервать и продолжить)
+    - dry_run: ничего не пишем в БД, только отчёт с диффом
+    """
+    report = ReprocessReport()
+    start_after = load_checkpoint(opts.checkpoint_path, opts.stages)
+    report.last_key = start_after
+
+    text_index = None
+    if "dedup" in opts.stages:
+        # свой индекс, а не общий из text_dedup: в нём только жалобы до текущей
+        text_index = TextIndex(timedelta(days=settings.TEXT_DUP_WINDOW_DAYS))
+        if start_after is None:
+            reset_clusters(db)
+        else:
+            seed_text_index(db, text_index, start_after)
+
+    workers = max(1, opts.workers)
+    needs_models = any(s in opts.stages for s in ("cv", "nlp"))
+    pool = None
+    if needs_models and workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,))
+
+    report_fh = None
+    if opts.report_path is not None:
+        opts.report_path.parent.mkdir(parents=True, exist_ok=True)
+        report_fh = opts.report_path.open("a", encoding="utf-8")
+
+    try:
+        for rows in iter_chunks(db, opts.chunk_size, after=start_after):
+            if opts.limit is not None:
+                rows = rows[: max(0, opts.limit - report.processed)]
+                if not rows:
+                    break
+
+            chunk_key = _row_key(rows[-1])
+            inferred = _run_models(rows, opts.stages, pool)
+
+            updates: list[dict[str, Any]] = []
+            for c in rows:
+                inf = inferred.get(c.id, {})
+                if "error" in inf:
+                    report.errors += 1
+                    if report_fh is not None:
+                        report_fh.write(json.dumps({"id": c.id, "error": inf["error"]}, ensure_ascii=False) + "\n")
+                new = _recompute(db, c, opts.stages, inf, text_index)
+                diff = _diff(c, new)
+                if not diff:
+                    continue
+                report.changed += 1
+                for k in diff:
+                    report.changed_fields[k] = report.changed_fields.get(k, 0) + 1
+                # dedup-поля уже записаны в _recompute
+                values = {k: v[1] for k, v in diff.items() if k not in STAGE_FIELDS["dedup"]}
+                if values:
+                    # bulk-обновление не вызывает ORM-события — версию payload поднимаем сами
+                    updates.append({"id": c.id, **values, "payload_version": int(c.payload_version or 0) + 1})
+                if report_fh is not None:
+                    report_fh.write(json.dumps({"id": c.id, "diff": diff}, ensure_ascii=False, default=str) + "\n")
+
+            if opts.dry_run:
+                # в dry-run держим одну транзакцию и откатываем её в конце,
+                # чтобы пересобранные кластеры были видны следующим кускам
+                db.flush()
+            else:
+                if updates:
+                    db.bulk_update_mappings(Complaint, updates)
+                db.commit()
+            # освобождаем identity map, иначе память растёт с каждым куском
+            db.expunge_all()
+
+            report.processed += len(rows)
+            report.chunks += 1
+            report.last_key = chunk_key
+            if not opts.dry_run:
+                save_checkpoint(opts.checkpoint_path, report, opts.stages)
+
+            if opts.limit is not None and report.processed >= opts.limit:
+                break
+    finally:
+        if opts.dry_run:
+            db.rollback()
+        if pool is not None:
+            pool.shutdown()
+        if report_fh is not None:
+            report_fh.close()
+
+    return report
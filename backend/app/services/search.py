@@ -0,0 +1,251 @@
+# backend/app/services/search.py
+"""
+Полнотекстовый поиск по тексту жалоб: GET /complaints/search?q=.
+
+SQLite — FTS5 (complaints_fts) + карта search_docs (docid ↔ complaint_id):
+rowid у complaints без INTEGER PRIMARY KEY может смениться после VACUUM,
+поэтому индекс ссылается на свой docid. Индекс ведут триггеры на complaints —
+в синхроне при любой записи (приём, PATCH, reprocess, перенос в архив и обратно).
+PostgreSQL — генерируемая колонка complaints.search_tsv (tsvector) + GIN.
+
+ru/kk: регистр снимает токенизатор, казахские буквы и ё сводятся к русским
+(қ→к, ә→а, ... — так пишут с русской раскладки), а окончания слов запроса
+отрезаются лёгким стеммером и ищутся префиксом: "фонари" → фонар*, "хана" → хан*.
+Архив (complaints_archive) не индексируется: перенос в архив удаляет строку
+из индекса, поиск идёт только по рабочей таблице, а include_archived=true
+в /complaints/search отклоняется с 422.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from sqlalchemy import Integer, func, literal_column, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import column, table
+
+from ..crud import LIST_COLUMNS, _row_dict
+from ..models import Complaint
+
+MAX_TERMS = 8
+MIN_STEM = 3  # у коротких слов (до 4 букв) — 2: "ямы" → ям*
+SNIPPET_WORDS = 12
+
+# казахские буквы и ё → ближайшая русская (обе стороны: индекс и запрос)
+_FOLD = {"ё": "е", "ә": "а", "ғ": "г", "қ": "к", "ң": "н", "ө": "о", "ұ": "у", "ү": "у", "һ": "х", "і": "и"}
+_FOLD_TABLE = str.maketrans({**_FOLD, **{k.upper(): v.upper() for k, v in _FOLD.items()}})
+
+# окончания после свёртки, длинные раньше коротких
+_ENDINGS = sorted(
+    {
+        # ru
+        "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+        "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ов", "ев",
+        "ах", "ях", "ам", "ям", "ом", "ем", "ью", "ия", "ья", "ию", "ии",
+        "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+        # kk: множественное число, падежи
+        "лар", "лер", "дар", "дер", "тар", "тер", "нын", "нин", "дын", "дин", "тын", "тин",
+        "га", "ге", "ка", "ке", "да", "де", "та", "те", "дан", "ден", "тан", "тен", "нан", "нен",
+        "ны", "ни", "ды", "ди", "ты", "ти", "ын", "ин",
+    },
+    key=len,
+    reverse=True,
+)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+_PG_CONFIG = "simple"
+
+
+def fold(s: str) -> str:
+    return (s or "").translate(_FOLD_TABLE).lower()
+
+
+def stem(word: str) -> str:
+    if word.isdigit():
+        return word
+    min_stem = MIN_STEM if len(word) > 4 else 2
+    for end in _ENDINGS:
+        if word.endswith(end) and len(word) - len(end) >= min_stem:
+            return word[: -len(end)]
+    return word
+
+
+def query_terms(q: str) -> list[str]:
+    """
+    Префиксы для поиска: свёрнутые слова запроса без окончаний, без повторов.
+    """
+    terms: list[str] = []
+    for word in _WORD.findall(fold(q)):
+        t = stem(word.replace("_", ""))
+        if t and t not in terms:
+            terms.append(t)
+    return terms[:MAX_TERMS]
+
+
+def _fts_match(terms: list[str]) -> str:
+    # каждый терм — строка в кавычках с префиксом: спецсинтаксис FTS5 из запроса не проходит
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def _pg_tsquery(terms: list[str]) -> str:
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def highlight(body: str, terms: list[str], words: int = SNIPPET_WORDS, mark: tuple[str, str] = ("<mark>", "</mark>")) -> str:
+    """
+    Фрагмент исходного текста (без свёртки) вокруг первого совпадения,
+    совпавшие слова обёрнуты в mark.
+    """
+    tokens = list(_WORD.finditer(body or ""))
+    if not tokens:
+        return ""
+    hits = [i for i, m in enumerate(tokens) if any(fold(m.group()).startswith(t) for t in terms)]
+    first = hits[0] if hits else 0
+    lo = max(0, first - words // 3)
+    hi = min(len(tokens), lo + words)
+    lo = max(0, hi - words)
+    hit_set = set(hits)
+
+    out: list[str] = []
+    pos = tokens[lo].start()
+    for i in range(lo, hi):
+        m = tokens[i]
+        out.append(body[pos:m.start()])
+        out.append(f"{mark[0]}{m.group()}{mark[1]}" if i in hit_set else m.group())
+        pos = m.end()
+    snippet = "".join(out)
+    if lo > 0:
+        snippet = "…" + snippet
+    if hi < len(tokens):
+        snippet += "…"
+    return snippet
+
+
+# ---- индекс ----
+def _sqlite_fold_sql(expr: str) -> str:
+    # lower() в SQLite только ASCII: регистр снимает unicode61, здесь — обе формы букв
+    for k, v in _FOLD.items():
+        expr = f"replace(replace({expr}, '{k}', '{v}'), '{k.upper()}', '{v.upper()}')"
+    return expr
+
+
+def _sqlite_ddl() -> list[str]:
+    new_body = _sqlite_fold_sql("coalesce(new.text, '')")
+    docid = "(SELECT docid FROM search_docs WHERE complaint_id = {}.id)"
+    return [
+        "CREATE TABLE IF NOT EXISTS search_docs ("
+        " docid INTEGER PRIMARY KEY AUTOINCREMENT, complaint_id TEXT NOT NULL UNIQUE)",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5("
+        f"body, tokenize = '{_FTS_TOKENIZE}', prefix = '2 3 4')",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS complaints_search_ai AFTER INSERT ON complaints BEGIN
+            INSERT OR IGNORE INTO search_docs (complaint_id) VALUES (new.id);
+            INSERT INTO complaints_fts (rowid, body) VALUES ({docid.format("new")}, {new_body});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS complaints_search_au AFTER UPDATE OF text ON complaints BEGIN
+            DELETE FROM complaints_fts WHERE rowid = {docid.format("old")};
+            INSERT INTO complaints_fts (rowid, body) VALUES ({docid.format("new")}, {new_body});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS complaints_search_ad AFTER DELETE ON complaints BEGIN
+            DELETE FROM complaints_fts WHERE rowid = {docid.format("old")};
+            DELETE FROM search_docs WHERE complaint_id = old.id;
+        END
+        """,
+    ]
+
+
+def _sqlite_backfill() -> list[str]:
+    # жалобы, записанные, пока триггеров ещё не было (старая БД, bench seed до старта API);
+    # docid растёт монотонно, поэтому новые строки карты — те, что старше max(rowid) индекса
+    body = _sqlite_fold_sql("coalesce(c.text, '')")
+    return [
+        "INSERT INTO search_docs (complaint_id)"
+        " SELECT c.id FROM complaints c"
+        " WHERE NOT EXISTS (SELECT 1 FROM search_docs d WHERE d.complaint_id = c.id)",
+        f"INSERT INTO complaints_fts (rowid, body)"
+        f" SELECT d.docid, {body}"
+        " FROM search_docs d JOIN complaints c ON c.id = d.complaint_id"
+        " WHERE d.docid > (SELECT coalesce(max(rowid), 0) FROM complaints_fts)",
+    ]
+
+
+def _pg_ddl() -> list[str]:
+    src = "".join(_FOLD)
+    dst = "".join(_FOLD.values())
+    return [
+        f"ALTER TABLE complaints ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS ("
+        f"to_tsvector('{_PG_CONFIG}'::regconfig, translate(lower(coalesce(text, '')), '{src}', '{dst}'))"
+        f") STORED",
+        "CREATE INDEX IF NOT EXISTS ix_complaints_search_tsv ON complaints USING GIN (search_tsv)",
+    ]
+
+
+def install_search(engine) -> None:
+    """
+    Создаёт индекс и триггеры (идемпотентно) и доиндексирует пропущенные строки.
+    Вызывается при старте после create_all.
+    """
+    statements = _pg_ddl() if engine.dialect.name == "postgresql" else _sqlite_ddl() + _sqlite_backfill()
+    with engine.begin() as conn:
+        for sql in statements:
+            conn.execute(text(sql))
+
+
+# ---- запрос ----
+_fts = table("complaints_fts", column("rowid", Integer))
+_docs = table("search_docs", column("docid", Integer), column("complaint_id"))
+
+
+def search_complaints(
+    db: Session,
+    q: str,
+    statuses: list[str] | None = None,
+    department: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> list[dict[str, Any]]:
+    """
+    Жалобы, где встречаются все слова запроса (по префиксу основы), по убыванию
+    релевантности (bm25 / ts_rank_cd), при равенстве — новые раньше.
+    Строки — как у GET /complaints + rank и snippet.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    if db.get_bind().dialect.name == "postgresql":
+        tsq = func.to_tsquery(literal_column(f"'{_PG_CONFIG}'::regconfig"), _pg_tsquery(terms))
+        tsv = literal_column("complaints.search_tsv")
+        rank = func.ts_rank_cd(tsv, tsq)
+        stmt = select(*LIST_COLUMNS, rank.label("rank")).where(tsv.op("@@")(tsq)).order_by(rank.desc())
+    else:
+        fts = literal_column("complaints_fts")
+        bm25 = func.bm25(fts)  # чем меньше, тем релевантнее
+        stmt = (
+            select(*LIST_COLUMNS, (-bm25).label("rank"))
+            .select_from(
+                _fts.join(_docs, _docs.c.docid == _fts.c.rowid)
+                .join(Complaint, Complaint.id == _docs.c.complaint_id)
+            )
+            .where(fts.op("MATCH")(_fts_match(terms)))
+            .order_by(bm25.asc())
+        )
+
+    if statuses:
+        stmt = stmt.where(Complaint.status.in_(statuses))
+    if department:
+        stmt = stmt.where(Complaint.department == department)
+    stmt = stmt.order_by(Complaint.created_at.desc()).offset(offset).limit(limit)
+
+    out = []
+    for row in db.execute(stmt):
+        d = _row_dict(row[:-1])
+        d["rank"] = round(float(row[-1]), 6)
+        d["snippet"] = highlight(d["text"], terms)
+        out.append(d)
+    return out
@@ -2,47 +2,48 @@
 from __future__ import annotations
 from datetime import datetime, timedelta, timezone
 from collections import Counter, defaultdict
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from ..models import Complaint
+from .archive import complaint_tables
 
 
-def stats_summary(db: Session) -> dict:
-    items = db.query(Complaint).all()
+# include_archived — считать и по архиву закрытых жалоб (services/archive.py)
+def stats_summary(db: Session, include_archived: bool = False) -> dict:
+    by_status = Counter()
+    by_category = Counter()
+    by_priority = Counter()
+    total = 0
 
-    by_status = Counter((c.status or "UNKNOWN") for c in items)
-    by_category = Counter((getattr(c, "nlp_category", None) or c.ui_category or "UNKNOWN") for c in items)
-    by_priority = Counter((getattr(c, "priority_level", None) or "MEDIUM") for c in items)
+    # группируем в БД, а не тащим все строки в Python
+    for t in complaint_tables(include_archived):
+        cols = (t.c.status, t.c.nlp_category, t.c.ui_category, t.c.priority_level)
+        for status, nlp_category, ui_category, priority_level, n in db.execute(
+            select(*cols, func.count()).group_by(*cols)
+        ):
+            total += n
+            by_status[status or "UNKNOWN"] += n
+            by_category[nlp_category or ui_category or "UNKNOWN"] += n
+            by_priority[priority_level or "MEDIUM"] += n
 
     return {
-        "total": len(items),
+        "total": total,
         "by_status": dict(by_status),
         "by_category": dict(by_category),
         "by_priority": dict(by_priority),
     }
 
 
-def stats_trends(db: Session, days: int = 7) -> dict:
+def stats_trends(db: Session, days: int = 7, include_archived: bool = False) -> dict:
     now = datetime.now(timezone.utc)
     start = now - timedelta(days=max(1, int(days)))
-
-    items = (
-        db.query(Complaint)
-        .filter(Complaint.created_at.isnot(None))
-        .all()
-    )
+    start_naive = start.replace(tzinfo=None)  # created_at хранится в UTC без tz
 
     # bucket by date
     buckets = defaultdict(int)
-    for c in items:
-        dt = c.created_at
-        if dt is None:
-            continue
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        if dt < start:
-            continue
-        key = dt.date().isoformat()
-        buckets[key] += 1
+    for t in complaint_tables(include_archived):
+        for (dt,) in db.execute(select(t.c.created_at).where(t.c.created_at >= start_naive)):
+            key = dt.date().isoformat()
+            buckets[key] += 1
 
     # fill missing days
     out = []
@@ -53,25 +54,20 @@ def stats_trends(db: Session, days: int = 7) -> dict:
     return {"days": days, "series": out}
 
 
-def stats_heatmap(db: Session, grid_size: float = 0.01) -> dict:
+def stats_heatmap(db: Session, grid_size: float = 0.01, include_archived: bool = False) -> dict:
     """
     Очень простой heatmap-стаб:
     группируем по "сетке" (lat/lng округление).
     grid_size ~ 0.01 ≈ ~1км (примерно, зависит от широты).
     """
-    pts = (
-        db.query(Complaint)
-        .filter(Complaint.lat.isnot(None))
-        .filter(Complaint.lng.isnot(None))
-        .all()
-    )
-
     cells = defaultdict(int)
-    for c in pts:
-        lat = float(c.lat)
-        lng = float(c.lng)
-        key = (round(lat / grid_size) * grid_size, round(lng / grid_size) * grid_size)
-        cells[key] += 1
+    for t in complaint_tables(include_archived):
+        pts = db.execute(select(t.c.lat, t.c.lng).where(t.c.lat.isnot(None)).where(t.c.lng.isnot(None)))
+        for lat, lng in pts:
+            lat = float(lat)
+            lng = float(lng)
+            key = (round(lat / grid_size) * grid_size, round(lng / grid_size) * grid_size)
+            cells[key] += 1
 
     result = [{"lat": k[0], "lng": k[1], "count": v} for k, v in cells.items()]
     return {"grid_size": grid_size, "cells": result}
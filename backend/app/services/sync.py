@@ -0,0 +1,156 @@
+# backend/app/services/sync.py
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import and_, delete, event, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..crud import LIST_COLUMNS
+from ..models import AkimatSubmission, Complaint, ComplaintTombstone, IdempotencyKey, TextSignature
+from ..settings import settings
+from .clusters import leave_groups
+
+SYNC_COLUMNS = tuple(c.key for c in LIST_COLUMNS)
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ---- курсор ----
+@dataclass
+class SyncCursor:
+    """
+    Позиция клиента: (updated_at, id) последней отданной жалобы и (deleted_at, id) последнего tombstone.
+    Пустой id = "всё строго после этого времени".
+    """
+
+    changed_at: datetime | None
+    changed_id: str
+    deleted_at: datetime
+    deleted_id: str
+
+    def encode(self) -> str:
+        def us(dt: datetime | None) -> str:
+            return "" if dt is None else str(int(dt.replace(tzinfo=timezone.utc).timestamp() * 1_000_000))
+
+        raw = f"1|{us(self.changed_at)}|{self.changed_id}|{us(self.deleted_at)}|{self.deleted_id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SyncCursor":
+        def dt(s: str) -> datetime | None:
+            if not s:
+                return None
+            return datetime.fromtimestamp(int(s) / 1_000_000, tz=timezone.utc).replace(tzinfo=None)
+
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+            version, c_at, c_id, d_at, d_id = raw.split("|")
+            if version != "1" or not d_at:
+                raise ValueError(token)
+            return cls(dt(c_at), c_id, dt(d_at), d_id)
+        except Exception as e:
+            raise ValueError("Invalid sync token") from e
+
+
+def _after(ts_col, id_col, ts: datetime | None, last_id: str):
+    if ts is None:
+        return None
+    if not last_id:
+        return ts_col > ts
+    return or_(ts_col > ts, and_(ts_col == ts, id_col > last_id))
+
+
+def changes_since(db: Session, token: str | None, limit: int | None = None) -> dict[str, Any]:
+    """
+    Изменённые жалобы (компактно: columns + массивы значений) и удалённые id после token.
+    Без token — полный снимок (постранично), удаления — только новые.
+    Отдаём только изменения старше SYNC_SAFETY_SECONDS: поздно закоммиченная транзакция
+    с более ранним updated_at иначе проскочила бы мимо курсора.
+    """
+    limit = limit or settings.SYNC_PAGE_LIMIT
+    horizon = _utcnow_naive() - timedelta(seconds=settings.SYNC_SAFETY_SECONDS)
+    cur = SyncCursor.decode(token) if token else SyncCursor(None, "", horizon, "")
+
+    q = select(*LIST_COLUMNS).where(Complaint.updated_at <= horizon)
+    cond = _after(Complaint.updated_at, Complaint.id, cur.changed_at, cur.changed_id)
+    if cond is not None:
+        q = q.where(cond)
+    rows = db.execute(q.order_by(Complaint.updated_at.asc(), Complaint.id.asc()).limit(limit)).all()
+
+    tq = (
+        select(ComplaintTombstone.id, ComplaintTombstone.deleted_at)
+        .where(ComplaintTombstone.deleted_at <= horizon)
+        .where(_after(ComplaintTombstone.deleted_at, ComplaintTombstone.id, cur.deleted_at, cur.deleted_id))
+        .order_by(ComplaintTombstone.deleted_at.asc(), ComplaintTombstone.id.asc())
+        .limit(limit)
+    )
+    tombs = db.execute(tq).all()
+
+    more = len(rows) == limit or len(tombs) == limit
+    # страница неполная → всё до horizon отдано, следующий запрос начинается строго после него
+    nxt = SyncCursor(
+        changed_at=rows[-1].updated_at if len(rows) == limit else max(horizon, cur.changed_at or horizon),
+        changed_id=rows[-1].id if len(rows) == limit else "",
+        deleted_at=tombs[-1].deleted_at if len(tombs) == limit else max(horizon, cur.deleted_at),
+        deleted_id=tombs[-1].id if len(tombs) == limit else "",
+    )
+
+    return {
+        "token": nxt.encode(),
+        "more": more,
+        "columns": SYNC_COLUMNS,
+        "changed": [tuple(r) for r in rows],
+        "deleted": [t.id for t in tombs],
+    }
+
+
+# ---- удаление с tombstone ----
+def delete_complaints(db: Session, ids: list[str], reason: str = "deleted") -> int:
+    """
+    Удаляет жалобы и оставляет tombstones (одна транзакция, НЕ коммитит).
+    В той же транзакции:
+    - группы дублей: member_count кластера и duplicates_count остальных жалоб — минус удалённые
+    - неотправленные payload в акимат — CANCELLED
+    - Idempotency-Key этих жалоб — GONE (повтор запроса получает 410, а не 404)
+    """
+    if not ids:
+        return 0
+    now = _utcnow_naive()
+    leave_groups(db, ids)
+    db.execute(
+        update(AkimatSubmission)
+        .where(AkimatSubmission.complaint_id.in_(ids))
+        .where(AkimatSubmission.status == "PENDING")
+        .values(status="CANCELLED", last_error=f"complaint {reason}", claim_token=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.complaint_id.in_(ids))
+        .values(status="GONE")
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(ComplaintTombstone).where(ComplaintTombstone.id.in_(ids)))
+    db.execute(
+        insert(ComplaintTombstone),
+        [{"id": i, "deleted_at": now, "reason": reason} for i in ids],
+    )
+    db.execute(delete(TextSignature).where(TextSignature.complaint_id.in_(ids)))
+    res = db.execute(
+        delete(Complaint).where(Complaint.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    return int(res.rowcount or 0)
+
+
+@event.listens_for(Complaint, "after_delete")
+def _tombstone_on_orm_delete(mapper, connection, target) -> None:
+    # db.delete(obj) тоже оставляет след (массовое удаление — через delete_complaints)
+    table = ComplaintTombstone.__table__
+    connection.execute(delete(table).where(table.c.id == target.id))
+    connection.execute(insert(table).values(id=target.id, deleted_at=_utcnow_naive(), reason="deleted"))
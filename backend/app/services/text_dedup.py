@@ -0,0 +1,308 @@
+# backend/app/services/text_dedup.py
+"""
+Текстовые дубли: MinHash + LSH по словам нормализованного текста.
+
+Гео-дедуп (clusters.assign_cluster) не видит жалоб без координат и жалоб,
+отправленных из дома про место на другом конце города. Текстовый сигнал
+находит почти одинаковые тексты за последние TEXT_DUP_WINDOW_DAYS.
+
+- сигнатура: PERMUTATIONS минимумов (a·h + b) mod p по crc32 шинглов-слов,
+  хранится в text_signatures (4 байта на перестановку) в коммите жалобы
+- индекс в памяти процесса: LSH_BANDS полос по LSH_ROWS значений → dict
+  ключ полосы → жалобы; поиск — LSH_BANDS обращений к dict, без сканирования
+- каждый воркер догоняет таблицу по курсору id (как live_feed), так что
+  жалобы, принятые другими воркерами serve.py, тоже находятся
+"""
+from __future__ import annotations
+
+import random
+import re
+import struct
+import threading
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from ..models import Complaint, TextSignature
+from ..settings import settings
+from ..utils.metrics import timed
+from .clusters import lock_cells
+from .search import fold
+
+PREFIX = 5
+LSH_BANDS = 16
+LSH_ROWS = 4
+PERMUTATIONS = LSH_BANDS * LSH_ROWS
+_PRIME = (1 << 61) - 1
+_MASK32 = 0xFFFFFFFF
+_SIG_FORMAT = f"<{PERMUTATIONS}I"
+
+# детерминированные перестановки: сигнатуры из БД совпадают между процессами и рестартами
+_rng = random.Random(20240611)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(PERMUTATIONS)]
+
+# см. live_feed: id автоинкремента могут стать видимыми не по порядку
+_REORDER_WINDOW = 50
+_PRUNE_EVERY = 1000
+MAX_CANDIDATES = 20
+
+Signature = tuple[int, ...]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str) -> set[int]:
+    """
+    Шинглы — слова, обрезанные до PREFIX букв (грубый стемминг, одинаковый для ru/kk:
+    "фонари"/"фонарь", "ауданы"/"ауданында"), после той же свёртки, что у поиска.
+    Числа — ещё и в паре с предыдущим словом ("дом 12"): шаблонные тексты про
+    разные дома не совпадают.
+    """
+    words = _WORD.findall(fold(text))
+    tokens: set[str] = set()
+    prev = ""
+    for w in words:
+        if w.isdigit():
+            tokens.add(w)
+            tokens.add(f"{prev}#{w}")
+        elif len(w) >= 3:
+            prev = w[:PREFIX]
+            tokens.add(prev)
+    if len(tokens) < settings.TEXT_DUP_MIN_TOKENS:
+        # "Яма на дороге" — слишком мало текста, совпадения случайны
+        return set()
+    return {zlib.crc32(t.encode("utf-8")) for t in tokens}
+
+
+def signature(text: str) -> Signature | None:
+    hs = shingles(text)
+    if not hs:
+        return None
+    return tuple(min([(a * h + b) % _PRIME for h in hs]) & _MASK32 for a, b in _PERMS)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """
+    Оценка Жаккара по доле совпавших минимумов.
+    """
+    return sum(x == y for x, y in zip(a, b)) / PERMUTATIONS
+
+
+def pack(sig: Signature) -> bytes:
+    return struct.pack(_SIG_FORMAT, *sig)
+
+
+def unpack(blob: bytes) -> Signature | None:
+    if len(blob) != struct.calcsize(_SIG_FORMAT):
+        return None  # другое число перестановок — старая сигнатура не сравнима
+    return struct.unpack(_SIG_FORMAT, blob)
+
+
+def _bands(sig: Signature) -> list[Signature]:
+    return [sig[i * LSH_ROWS:(i + 1) * LSH_ROWS] for i in range(LSH_BANDS)]
+
+
+@dataclass
+class TextCandidate:
+    complaint_id: str
+    similarity: float
+
+
+@dataclass
+class TextMatch:
+    complaint_id: str
+    group_id: str  # группа, к которой присоединяется новая жалоба
+    similarity: float
+
+
+class TextIndex:
+    """
+    LSH-индекс сигнатур последних TEXT_DUP_WINDOW_DAYS. Потокобезопасный:
+    пайплайны приёма идут параллельно в threadpool.
+    """
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        self.last_id: int | None = None
+        self._lock = threading.Lock()
+        self._catch_up_lock = threading.Lock()  # один догоняющий запрос за раз
+        self._entries: dict[int, tuple[str, datetime, Signature]] = {}  # id строки → (жалоба, время, сигнатура)
+        self._order: deque[int] = deque()  # id строк в порядке добавления — для вытеснения по окну
+        self._buckets: list[dict[Signature, list[int]]] = [{} for _ in range(LSH_BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, row_id: int, complaint_id: str, created_at: datetime, sig: Signature) -> None:
+        with self._lock:
+            old = self._entries.get(row_id)
+            if old is not None:
+                if old[0] == complaint_id:
+                    return
+                # SQLite (без AUTOINCREMENT) отдаёт id удалённой последней строки следующей
+                # сигнатуре: старая запись — от удалённой жалобы
+                self._unlink(row_id, old[2])
+                self._order.remove(row_id)
+            self._entries[row_id] = (complaint_id, created_at, sig)
+            self._order.append(row_id)
+            for band, key in enumerate(_bands(sig)):
+                self._buckets[band].setdefault(key, []).append(row_id)
+
+    def push(self, complaint_id: str, created_at: datetime, sig: Signature) -> None:
+        """
+        Для индекса без таблицы (reprocess наполняет его сам): номер строки — следующий
+        по счёту, жалобы старше окна от created_at вытесняются.
+        """
+        with self._catch_up_lock:
+            self.last_id = (self.last_id or 0) + 1
+            row_id = self.last_id
+        self.add(row_id, complaint_id, created_at, sig)
+        self.evict(created_at)
+
+    def evict(self, now: datetime) -> None:
+        cutoff = now - self.window
+        with self._lock:
+            while self._order and self._entries[self._order[0]][1] < cutoff:
+                row_id = self._order.popleft()
+                self._unlink(row_id, self._entries[row_id][2])
+
+    def _unlink(self, row_id: int, sig: Signature) -> None:
+        # под self._lock; из _order убирает вызывающий
+        del self._entries[row_id]
+        for band, key in enumerate(_bands(sig)):
+            ids = self._buckets[band].get(key)
+            if ids is not None:
+                ids.remove(row_id)
+                if not ids:
+                    del self._buckets[band][key]
+
+    def query(self, sig: Signature, now: datetime, threshold: float) -> list[TextCandidate]:
+        """
+        Жалобы окна с оценкой сходства >= threshold, самые похожие первыми (не больше MAX_CANDIDATES).
+        """
+        cutoff = now - self.window
+        with self._lock:
+            seen: set[int] = set()
+            for band, key in enumerate(_bands(sig)):
+                seen.update(self._buckets[band].get(key, ()))
+            found = []
+            for row_id in seen:
+                complaint_id, created_at, other = self._entries[row_id]
+                if created_at < cutoff:
+                    continue
+                sim = similarity(sig, other)
+                if sim >= threshold:
+                    found.append(TextCandidate(complaint_id, sim))
+        return sorted(found, key=lambda c: c.similarity, reverse=True)[:MAX_CANDIDATES]
+
+    def catch_up(self, db: Session, now: datetime) -> int:
+        """
+        Догружает сигнатуры, записанные после last_id (в том числе другими воркерами).
+        """
+        with self._catch_up_lock:
+            added = self._catch_up(db, now)
+        self.evict(now)
+        return added
+
+    def _catch_up(self, db: Session, now: datetime) -> int:
+        cutoff = now - self.window
+        q = select(TextSignature.id, TextSignature.complaint_id, TextSignature.created_at, TextSignature.sig)
+        if self.last_id is None:
+            q = q.where(TextSignature.created_at >= cutoff)  # старт: всё окно
+        else:
+            q = q.where(TextSignature.id > max(0, self.last_id - _REORDER_WINDOW))
+        added = 0
+        for row_id, complaint_id, created_at, blob in db.execute(q.order_by(TextSignature.id.asc())):
+            self.last_id = max(self.last_id or 0, row_id)
+            sig = unpack(blob)
+            if sig is None or created_at < cutoff:
+                continue
+            known = self._entries.get(row_id)
+            if known is not None and known[0] == complaint_id:
+                continue
+            self.add(row_id, complaint_id, created_at, sig)
+            added += 1
+        if self.last_id is None:
+            self.last_id = 0
+        return added
+
+
+text_index = TextIndex(timedelta(days=settings.TEXT_DUP_WINDOW_DAYS))
+_recorded = 0
+
+
+@timed("text_dedup")
+def find_text_duplicates(db: Session, sig: Signature, now: datetime, index: TextIndex | None = None) -> list[TextCandidate]:
+    """
+    index — свой индекс вызывающего (reprocess наполняет его сам, по порядку created_at);
+    по умолчанию — общий text_index, догоняющий text_signatures.
+    """
+    if settings.TEXT_DUP_WINDOW_DAYS <= 0:
+        return []
+    if index is None:
+        index = text_index
+        index.catch_up(db, now)
+    return index.query(sig, now, settings.TEXT_DUP_THRESHOLD)
+
+
+def lock_text(db: Session, department: str) -> None:
+    """
+    Замок текстового дедупа департамента до конца транзакции — строка dedup_cell_locks
+    с ключом "text:<департамент>", как у ячеек геосетки (clusters.lock_cells).
+    Без него две одинаковые жалобы без координат одновременно не видят сигнатур
+    друг друга (record_signature пишет их в той же транзакции) и обе остаются без группы.
+    Берётся после гео-замков: порядок одинаковый у всех, взаимоблокировок нет.
+    """
+    lock_cells(db, [f"text:{department or ''}"])
+
+
+def find_text_duplicate(
+    db: Session,
+    sig: Signature,
+    department: str,
+    now: datetime,
+    index: TextIndex | None = None,
+) -> TextMatch | None:
+    """
+    Самая похожая жалоба окна, которая ещё в горячей таблице (удалённые и
+    архивные могли остаться в индексах воркеров) и, если департамент известен,
+    того же департамента: одинаковый шаблон текста про разные службы — не дубль.
+    """
+    candidates = find_text_duplicates(db, sig, now, index)
+    if not candidates:
+        return None
+    rows = {
+        r.id: r
+        for r in db.execute(
+            select(Complaint.id, Complaint.department, Complaint.duplicate_group_id)
+            .where(Complaint.id.in_([c.complaint_id for c in candidates]))
+        )
+    }
+    for c in candidates:
+        row = rows.get(c.complaint_id)
+        if row is None:
+            continue
+        if department and row.department and row.department != department:
+            continue
+        return TextMatch(c.complaint_id, row.duplicate_group_id or row.id, round(c.similarity, 3))
+    return None
+
+
+def record_signature(db: Session, complaint_id: str, created_at: datetime, sig: Signature) -> None:
+    """
+    Пишет сигнатуру в транзакцию жалобы. НЕ коммитит.
+    Раз в _PRUNE_EVERY записей удаляет сигнатуры старше окна.
+    """
+    global _recorded
+    db.add(TextSignature(complaint_id=complaint_id, created_at=created_at, sig=pack(sig)))
+    _recorded += 1
+    if _recorded % _PRUNE_EVERY == 0 and settings.TEXT_DUP_WINDOW_DAYS > 0:
+        db.execute(
+            delete(TextSignature).where(
+                TextSignature.created_at < created_at - timedelta(days=settings.TEXT_DUP_WINDOW_DAYS)
+            )
+        )
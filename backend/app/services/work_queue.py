@@ -0,0 +1,139 @@
+# backend/app/services/work_queue.py
+from __future__ import annotations
+
+import heapq
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from ..models import Complaint, OPEN_STATUSES
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _is_free(now: datetime):
+    return or_(
+        Complaint.claimed_by.is_(None),
+        Complaint.claim_expires_at.is_(None),
+        Complaint.claim_expires_at < now,
+    )
+
+
+def _queue_query(db: Session, department: str, status: str, now: datetime, *entities):
+    # Равенство по (department, status) — дальше ix_complaints_queue_order уже отсортирован
+    # по (priority_score desc, created_at): чтение головы без сортировки.
+    # IN по двум статусам так не работает — каждый статус читается отдельно.
+    return (
+        db.query(*(entities or (Complaint,)))
+        .filter(Complaint.department == department)
+        .filter(Complaint.status == status)
+        .filter(_is_free(now))
+        .order_by(Complaint.priority_score.desc(), Complaint.created_at.asc())
+    )
+
+
+def _queue_head(db: Session, department: str, now: datetime, limit: int, *entities) -> list:
+    """
+    Первые limit строк очереди: головы по каждому открытому статусу, слитые
+    в общем порядке (priority_score desc, created_at).
+    """
+    heads = [_queue_query(db, department, status, now, *entities).limit(limit).all() for status in OPEN_STATUSES]
+    merged = heapq.merge(*heads, key=lambda r: (-r.priority_score, r.created_at))
+    return list(islice(merged, limit))
+
+
+def peek_queue(db: Session, department: str, limit: int) -> list[Complaint]:
+    """
+    Следующие N самых срочных открытых жалоб департамента, не захваченных никем.
+    Ничего не меняет.
+    """
+    return _queue_head(db, department, _utcnow_naive(), limit)
+
+
+def claim_next(
+    db: Session,
+    department: str,
+    worker: str,
+    limit: int,
+    lease_s: int,
+) -> list[Complaint]:
+    """
+    Захват N жалоб диспетчером на lease_s секунд.
+
+    Без блокировок: берём кандидатов с запасом и для каждого делаем
+    условный UPDATE ... WHERE свободна. Если другой диспетчер успел раньше —
+    rowcount == 0, просто берём следующего кандидата. Так два параллельных
+    claim никогда не получат одну и ту же жалобу (и в SQLite, и в PostgreSQL).
+    """
+    now = _utcnow_naive()
+    expires = now + timedelta(seconds=lease_s)
+    claimed_ids: list[str] = []
+
+    batch = max(limit * 2, 10)
+    while len(claimed_ids) < limit:
+        candidates = [
+            r.id
+            for r in _queue_head(db, department, now, batch, Complaint.id, Complaint.priority_score, Complaint.created_at)
+        ]
+        if not candidates:
+            break
+
+        for cid in candidates:
+            res = db.execute(
+                update(Complaint)
+                .where(Complaint.id == cid)
+                .where(Complaint.status.in_(OPEN_STATUSES))
+                .where(_is_free(now))
+                .values(claimed_by=worker, claim_expires_at=expires)
+                .execution_options(synchronize_session=False)
+            )
+            # коммитим каждый захват сразу, чтобы не держать write-lock SQLite
+            db.commit()
+            if res.rowcount == 1:
+                claimed_ids.append(cid)
+                if len(claimed_ids) >= limit:
+                    break
+
+        # и наши, и чужие захваты из следующей выборки уже выпадут,
+        # так что просто перечитываем голову очереди
+        if len(candidates) < batch:
+            break
+
+    if not claimed_ids:
+        return []
+    rows = db.query(Complaint).filter(Complaint.id.in_(claimed_ids)).all()
+    by_id = {c.id: c for c in rows}
+    return [by_id[cid] for cid in claimed_ids if cid in by_id]
+
+
+def renew_claim(db: Session, complaint_id: str, worker: str, lease_s: int) -> bool:
+    """
+    Продление lease. Только тот, кто держит захват (и он ещё не истёк).
+    """
+    now = _utcnow_naive()
+    res = db.execute(
+        update(Complaint)
+        .where(Complaint.id == complaint_id)
+        .where(Complaint.claimed_by == worker)
+        .where(Complaint.claim_expires_at >= now)
+        .values(claim_expires_at=now + timedelta(seconds=lease_s))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def release_claim(db: Session, complaint_id: str, worker: str) -> bool:
+    res = db.execute(
+        update(Complaint)
+        .where(Complaint.id == complaint_id)
+        .where(Complaint.claimed_by == worker)
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return res.rowcount == 1
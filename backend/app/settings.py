@@ -17,23 +17,129 @@ class Settings:
         "http://127.0.0.1:5173",
     )
 
+    # Прокси, которым serve.py доверяет X-Forwarded-For/-Proto (через запятую, "*" — всем).
+    # По этому адресу считается лимит на IP (utils/admission.py): чужой заголовок его не обойдёт
+    FORWARDED_ALLOW_IPS: str = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
     # Storage
     BASE_DIR: Path = Path(__file__).resolve().parents[1]  # backend/
     DATA_DIR: Path = BASE_DIR / "data"
     IMAGES_DIR: Path = DATA_DIR / "images"
     EXPORTS_DIR: Path = DATA_DIR / "exports"
+    NOTIFICATIONS_DIR: Path = DATA_DIR / "notifications"
+
+    # Заглушки вместо CLIP/XLM-R (детерминированные, без torch) — для бенчмарков и нагрузочных тестов
+    AI_STUB_MODELS: bool = os.getenv("AI_STUB_MODELS", "0") == "1"
+
+    # Потоки для параллельного декода/препроцессинга пачки фото перед CLIP
+    CLIP_PREPROCESS_THREADS: int = int(os.getenv("CLIP_PREPROCESS_THREADS", "4"))
+
+    # NLP-каскад: быстрая линейная модель (train_nlp_fast.py), XLM-R — только при уверенности ниже порога
+    NLP_FAST_MODEL_PATH: Path = Path(os.getenv("NLP_FAST_MODEL_PATH", str(DATA_DIR / "models" / "nlp_fast.json")))
+    NLP_FAST_THRESHOLD: float = float(os.getenv("NLP_FAST_THRESHOLD", "0.85"))
+    # Вторая ступень: zero_shot (XLM-R large) или student (дистиллированный, distill_nlp.py)
+    NLP_BACKEND: str = os.getenv("NLP_BACKEND", "zero_shot")
+    NLP_STUDENT_DIR: Path = Path(os.getenv("NLP_STUDENT_DIR", str(DATA_DIR / "models" / "nlp_student")))
+    NLP_STUDENT_INT8: bool = os.getenv("NLP_STUDENT_INT8", "0") == "1"
 
     # Duplicate detection
     DUP_RADIUS_METERS: float = 250.0
     DUP_SCAN_LIMIT: int = 200
+    # Текстовые дубли (MinHash/LSH, services/text_dedup.py) — когда гео-дубль не найден:
+    # нет координат или жалоба отправлена не с места. Окно 0 = выключено
+    TEXT_DUP_WINDOW_DAYS: int = int(os.getenv("TEXT_DUP_WINDOW_DAYS", "14"))
+    TEXT_DUP_THRESHOLD: float = float(os.getenv("TEXT_DUP_THRESHOLD", "0.7"))  # оценка Жаккара по словам
+    TEXT_DUP_MIN_TOKENS: int = 4
 
     # Priority thresholds
     PRIORITY_HIGH: float = 0.75
     PRIORITY_MEDIUM: float = 0.45
 
+    # Очередь диспетчеров: сколько секунд действует захват жалобы
+    QUEUE_LEASE_SECONDS: int = 300
+    QUEUE_MAX_LIMIT: int = 100
+
+    # Периодический пересчёт приоритетов открытых жалоб (0 = выключен).
+    # Строка переписывается, только если сменился уровень или score ушёл на PRIORITY_SCORE_STEP:
+    # иначе рост за ожидание переписывал бы все открытые жалобы каждый цикл (delta-sync, ETag)
+    PRIORITY_RECOMPUTE_SECONDS: float = float(os.getenv("PRIORITY_RECOMPUTE_SECONDS", "900"))
+    PRIORITY_SCORE_STEP: float = float(os.getenv("PRIORITY_SCORE_STEP", "0.05"))
+
+    # Уведомления (outbox): каналы через запятую — log, file, smtp
+    NOTIFY_CHANNELS: tuple[str, ...] = tuple(
+        c.strip() for c in os.getenv("NOTIFY_CHANNELS", "log").split(",") if c.strip()
+    )
+    NOTIFY_INTERVAL_SECONDS: float = float(os.getenv("NOTIFY_INTERVAL_SECONDS", "2"))
+    NOTIFY_BATCH_SIZE: int = 200
+    NOTIFY_MAX_ATTEMPTS: int = 6
+    NOTIFY_BACKOFF_BASE_SECONDS: float = 5.0
+    NOTIFY_BACKOFF_MAX_SECONDS: float = 900.0
+    NOTIFY_LOCK_SECONDS: int = 60
+
+    # Защита инференса (POST /complaints), utils/admission.py:
+    # token bucket на устройство (X-Device-Id); 0 — без лимита
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", "6"))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "10"))
+    # на IP — во столько раз больше (NAT операторов и офисов); 0 — без лимита на IP
+    RATE_LIMIT_IP_MULTIPLIER: float = float(os.getenv("RATE_LIMIT_IP_MULTIPLIER", "10"))
+    # memory — в процессе; sqlite — общий файл для нескольких воркеров
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_DB: Path = Path(os.getenv("RATE_LIMIT_DB", str(DATA_DIR / "ratelimit.db")))
+    # одновременных пайплайнов на процесс; ожидание в очереди дольше SLO → 503
+    INFERENCE_MAX_INFLIGHT: int = int(os.getenv("INFERENCE_MAX_INFLIGHT", "4"))
+    INFERENCE_QUEUE_SLO_SECONDS: float = float(os.getenv("INFERENCE_QUEUE_SLO_SECONDS", "10"))
+
+    # Архив: DONE/REJECTED без изменений дольше ARCHIVE_AFTER_DAYS переносятся в complaints_archive
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+    ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "86400"))  # 0 = выключен
+    ARCHIVE_BATCH_SIZE: int = 1000
+
+    # Idempotency-Key для POST /complaints: сколько помним ключ, сколько повтор ждёт первый запрос
+    IDEMPOTENCY_TTL_HOURS: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    IDEMPOTENCY_LOCK_SECONDS: int = 120
+    IDEMPOTENCY_WAIT_SECONDS: float = 60.0
+    IDEMPOTENCY_POLL_SECONDS: float = 0.2
+    IDEMPOTENCY_PRUNE_SECONDS: float = 3600.0
+
+    # Live-лента (SSE): один опрос feed_events на процесс, раздача всем подписчикам
+    FEED_POLL_SECONDS: float = float(os.getenv("FEED_POLL_SECONDS", "1"))
+    FEED_HEARTBEAT_SECONDS: float = 15.0
+    FEED_QUEUE_SIZE: int = 1000
+    FEED_CATCHUP_LIMIT: int = 1000
+    FEED_RETENTION_HOURS: int = 72
+
+    # Delta-sync (/complaints/changes): изменения моложе этого окна отдаются в следующий раз —
+    # транзакция могла получить updated_at раньше, а закоммититься позже
+    SYNC_SAFETY_SECONDS: float = float(os.getenv("SYNC_SAFETY_SECONDS", "5"))
+    SYNC_PAGE_LIMIT: int = 1000
+    SYNC_MAX_LIMIT: int = 5000
+
+    # Отправка в акимат. Пустой AKIMAT_ENDPOINT = режим заглушки (только экспорт).
+    # Локальный стенд: python akimat_stub_server.py → http://127.0.0.1:8088/api/complaints/batch
+    AKIMAT_ENDPOINT: str = os.getenv("AKIMAT_ENDPOINT", "")
+    AKIMAT_INTERVAL_SECONDS: float = float(os.getenv("AKIMAT_INTERVAL_SECONDS", "5"))
+    AKIMAT_BATCH_SIZE: int = int(os.getenv("AKIMAT_BATCH_SIZE", "50"))
+    AKIMAT_TIMEOUT_SECONDS: float = 15.0
+    AKIMAT_MAX_ATTEMPTS: int = 8
+    AKIMAT_BACKOFF_BASE_SECONDS: float = 10.0
+    AKIMAT_BACKOFF_MAX_SECONDS: float = 1800.0
+    AKIMAT_LOCK_SECONDS: int = 120
+    AKIMAT_EXPORT_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Сжатие ответов (gzip): меньше порога — отдаём как есть
+    GZIP_MIN_BYTES: int = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+    GZIP_LEVEL: int = 6
+
+    # SMTP (для локальной проверки: python -m aiosmtpd -n -l localhost:1025)
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "1025"))
+    SMTP_FROM: str = os.getenv("SMTP_FROM", "noreply@smartcity-shymkent.kz")
+    SMTP_TO: str = os.getenv("SMTP_TO", "dispatch@smartcity-shymkent.kz")
+
 
 settings = Settings()
 
 # Ensure dirs exist
 os.makedirs(settings.IMAGES_DIR, exist_ok=True)
 os.makedirs(settings.EXPORTS_DIR, exist_ok=True)
+os.makedirs(settings.NOTIFICATIONS_DIR, exist_ok=True)
@@ -0,0 +1,268 @@
+# backend/app/utils/admission.py
+"""
+Защита инференса (POST /complaints — секунды CPU на CLIP/XLM-R за запрос).
+
+1) Rate limit — token bucket на устройство (X-Device-Id): RATE_LIMIT_BURST запросов
+   подряд, дальше RATE_LIMIT_PER_MINUTE; на IP — в RATE_LIMIT_IP_MULTIPLIER раз больше
+   (за одним NAT оператора или офиса — много устройств). Токен списывается сразу из
+   обоих ведер или ни из одного. Пусто → 429 + Retry-After.
+   Состояние — в памяти процесса; RATE_LIMIT_BACKEND=sqlite — общий файл
+   (RATE_LIMIT_DB) для нескольких воркеров: одна транзакция на проверку.
+2) Admission control — не больше INFERENCE_MAX_INFLIGHT пайплайнов на процесс
+   (inference_gate.run в роуте — слот занимается уже после загрузки фото,
+   медленный клиент его не держит), остальные ждут в очереди. Если ожидаемое
+   ожидание (принятые запросы сверх слотов × среднее время пайплайна / слоты)
+   больше INFERENCE_QUEUE_SLO_SECONDS — сразу 503 + Retry-After, ещё до чтения тела.
+
+Остальные маршруты middleware не трогает: чтения работают и при сбросе загрузок,
+а ограничение слотов оставляет threadpool свободным для синхронных GET.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from ..settings import settings
+from .metrics import ADMISSION_REJECTED
+
+MAX_MEMORY_BUCKETS = 100_000
+
+
+def client_ip(request: Request) -> str:
+    # serve.py подставляет адрес из X-Forwarded-For только от доверенных прокси (FORWARDED_ALLOW_IPS)
+    return request.client.host if request.client else "unknown"
+
+
+# ---- token bucket ----
+Limits = dict[str, tuple[float, float]]  # вид ключа ("ip", "device") → (токенов в секунду, burst)
+
+
+def _kind(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def _plan(
+    limits: Limits, keys: list[str], saved: dict[str, tuple[float, float]], now: float
+) -> tuple[list[tuple[str, float]], tuple[float, str] | None]:
+    """
+    Пополняет ведра keys на момент now. → ([(ключ, токенов сейчас)], None) или,
+    если хоть в одном ведре меньше токена, (…, (ожидание, ключ) самого долгого).
+    """
+    refilled, short = [], []
+    for key in keys:
+        rate, burst = limits[_kind(key)]
+        tokens, ts = saved.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - ts) * rate)
+        refilled.append((key, tokens))
+        if tokens < 1.0:
+            short.append(((1.0 - tokens) / rate, key))
+    return refilled, max(short) if short else None
+
+
+class MemoryBuckets:
+    """
+    Ведра в памяти процесса; самые давно не использованные вытесняются (LRU),
+    чтобы поток случайных IP не съел память.
+    """
+
+    def __init__(self, limits: Limits, max_keys: int = MAX_MEMORY_BUCKETS):
+        self.limits = limits
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # ключ → (токены, время)
+
+    def take(self, keys: list[str], now: float | None = None) -> tuple[float, str | None]:
+        """
+        По токену из каждого ведра keys — или ни одного: отказ по одному ведру
+        не списывает токены других. (0.0, None) — разрешено, иначе
+        (через сколько секунд появится токен, ключ ведра, где его нет).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            refilled, short = _plan(self.limits, keys, self._buckets, now)
+            if short:
+                return short
+            for key, tokens in refilled:
+                self._buckets.pop(key, None)
+                self._buckets[key] = (tokens - 1.0, now)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            return 0.0, None
+
+
+class SqliteBuckets:
+    """
+    Общие для процессов ведра в отдельном SQLite (WAL). Проверка и списание —
+    в одной транзакции BEGIN IMMEDIATE (write-lock файла): две проверки из разных
+    воркеров не спишут один токен дважды.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: Path, limits: Limits):
+        self.path = path
+        self.limits = limits
+        # полное ведро ничем не отличается от отсутствующего: столько секунд без запросов — удаляем
+        self.idle_s = max(burst / rate for rate, burst in limits.values())
+        self._local = threading.local()
+        self._calls = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, ts REAL)")
+            self._local.conn = conn
+        return conn
+
+    def take(self, keys: list[str], now: float | None = None) -> tuple[float, str | None]:
+        """
+        Как MemoryBuckets.take.
+        """
+        # время — wall clock: monotonic у разных процессов не сравнимо
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT key, tokens, ts FROM buckets WHERE key IN ({','.join('?' * len(keys))})", keys
+            )
+            refilled, short = _plan(self.limits, keys, {k: (t, ts) for k, t, ts in rows}, now)
+            if not short:
+                conn.executemany(
+                    "INSERT INTO buckets (key, tokens, ts) VALUES (?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                    [(key, tokens - 1.0, now) for key, tokens in refilled],
+                )
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE ts < ?", (now - self.idle_s,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return short or (0.0, None)
+
+
+# ---- admission control ----
+class InferenceGate:
+    """
+    Слоты пайплайна на процесс + оценка ожидания по EWMA времени обработки.
+    admitted — запросы, пропущенные middleware и ещё не ответившие (грузят фото,
+    ждут слот или в пайплайне): так всплеск одновременных загрузок виден сразу,
+    а не только когда они дойдут до очереди слотов.
+    """
+
+    def __init__(self, max_inflight: int, slo_s: float, initial_service_s: float = 1.0, alpha: float = 0.2):
+        self.max_inflight = max(1, max_inflight)
+        self.slo_s = slo_s
+        self.service_s = initial_service_s
+        self.alpha = alpha
+        self.admitted = 0
+        self.inflight = 0
+        self._sem: asyncio.Semaphore | None = None
+
+    def expected_wait(self) -> float:
+        # впереди: все принятые сверх свободных слотов + мы сами; max_inflight за service_s
+        ahead = self.admitted + 1 - self.max_inflight
+        return max(0, ahead) * self.service_s / self.max_inflight
+
+    def stats(self) -> tuple[int, int]:
+        # (в пайплайне, принятые, но ещё не в пайплайне)
+        return self.inflight, self.admitted - self.inflight
+
+    async def run(self, call):
+        """
+        await call() в слоте; ждёт, если все слоты заняты.
+        """
+        if self._sem is None:
+            # создаётся в работающем event loop (в воркере, а не в master до fork)
+            self._sem = asyncio.Semaphore(self.max_inflight)
+        await self._sem.acquire()
+        self.inflight += 1
+        t0 = time.perf_counter()
+        try:
+            return await call()
+        finally:
+            dt = time.perf_counter() - t0
+            self.service_s += self.alpha * (dt - self.service_s)
+            self.inflight -= 1
+            self._sem.release()
+
+
+def _reject(status: int, reason: str, retry_after: float, detail: str) -> JSONResponse:
+    ADMISSION_REJECTED.inc(reason)
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class InferenceGuard:
+    """
+    dispatch для BaseHTTPMiddleware: rate limit + admission control для маршрутов
+    инференса (method, path). Отказ — до чтения тела запроса (фото не принимается);
+    сам слот занимает роут через gate.run.
+    """
+
+    def __init__(self, routes: set[tuple[str, str]], buckets, gate: InferenceGate, device_header: str = "X-Device-Id"):
+        self.routes = routes
+        self.buckets = buckets
+        self.gate = gate
+        self.device_header = device_header
+
+    async def _take(self, keys: list[str]) -> tuple[float, str | None]:
+        if isinstance(self.buckets, SqliteBuckets):
+            return await asyncio.to_thread(self.buckets.take, keys)
+        return self.buckets.take(keys)
+
+    async def __call__(self, request: Request, call_next):
+        if (request.method, request.url.path.rstrip("/") or "/") not in self.routes:
+            return await call_next(request)
+
+        if self.buckets is not None:
+            keys = [f"ip:{client_ip(request)}"] if "ip" in self.buckets.limits else []
+            device = (request.headers.get(self.device_header) or "").strip()[:128]
+            if device:
+                keys.append(f"device:{device}")
+            if keys:
+                wait, key = await self._take(keys)
+                if key is not None:
+                    return _reject(429, _kind(key), wait, "Too many complaints, retry later")
+
+        expected = self.gate.expected_wait()
+        if expected > self.gate.slo_s:
+            return _reject(503, "overload", expected, "Server is busy, retry later")
+        self.gate.admitted += 1
+        try:
+            return await call_next(request)
+        finally:
+            self.gate.admitted -= 1
+
+
+def build_buckets() -> MemoryBuckets | SqliteBuckets | None:
+    if settings.RATE_LIMIT_PER_MINUTE <= 0:
+        return None
+    rate = settings.RATE_LIMIT_PER_MINUTE / 60.0
+    limits: Limits = {"device": (rate, float(settings.RATE_LIMIT_BURST))}
+    k = settings.RATE_LIMIT_IP_MULTIPLIER
+    if k > 0:
+        limits["ip"] = (rate * k, settings.RATE_LIMIT_BURST * k)
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        return SqliteBuckets(settings.RATE_LIMIT_DB, limits)
+    return MemoryBuckets(limits)
+
+
+inference_gate = InferenceGate(settings.INFERENCE_MAX_INFLIGHT, settings.INFERENCE_QUEUE_SLO_SECONDS)
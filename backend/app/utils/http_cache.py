@@ -0,0 +1,181 @@
+# backend/app/utils/http_cache.py
+"""
+Условные GET (ETag / Last-Modified → 304) по версиям таблиц из БД.
+
+Версия данных — счётчик изменений таблицы в table_versions, который ведут триггеры
+самой БД (install_change_tracking): счётчик растёт в той же транзакции, что и запись,
+поэтому его видят все — воркеры serve.py, uvicorn --workers, CLI reprocess/archive,
+другие хосты с той же БД. Проверка актуальности — один SELECT по первичному ключу.
+
+- SQLite: строчные триггеры AFTER INSERT/UPDATE/DELETE (писатель всё равно один)
+- PostgreSQL: триггеры FOR EACH STATEMENT; счётчик разбит на SLOTS строк по
+  pg_backend_pid(), чтобы параллельные транзакции приёма не ждали одну строку
+- UPDATE только служебных колонок (untracked: updated_at, кэш payload) версию не меняет
+
+ETag = версии + время изменения таблиц маршрута + дата (UTC; /stats/trends зависит от "сегодня").
+Время изменения в ETag — чтобы пересозданная БД с теми же счётчиками не отдала 304.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+import re
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import Integer, Table, bindparam, func, select, text
+from sqlalchemy.sql import column, table
+from starlette.concurrency import run_in_threadpool
+
+SLOTS = 16  # строк счётчика на таблицу в PostgreSQL
+
+_versions = table("table_versions", column("name"), column("slot", Integer), column("version", Integer), column("modified_at", Integer))
+
+# Last-Modified — целые секунды с округлением вверх: изменение в текущей секунде
+# даёт время в будущем, и такой Last-Modified не отдаётся (см. ConditionalGet)
+_SQLITE_NOW = "CAST(strftime('%s', 'now') AS INTEGER) + 1"
+_PG_NOW = "floor(extract(epoch FROM clock_timestamp()))::bigint + 1"
+
+
+def _tracked_columns(t: Table, untracked: set[str]) -> list[str]:
+    return [c.name for c in t.columns if c.name not in untracked and not c.primary_key]
+
+
+def _sqlite_ddl(tables: list[Table], untracked: set[str]) -> list[str]:
+    out = [
+        "CREATE TABLE IF NOT EXISTS table_versions ("
+        " name TEXT NOT NULL, slot INTEGER NOT NULL, version INTEGER NOT NULL,"
+        " modified_at INTEGER NOT NULL, PRIMARY KEY (name, slot))",
+    ]
+    for t in tables:
+        bump = (
+            f"UPDATE table_versions SET version = version + 1, modified_at = {_SQLITE_NOW}"
+            f" WHERE name = '{t.name}' AND slot = 0;"
+        )
+        cols = ", ".join(_tracked_columns(t, untracked))
+        out += [
+            f"INSERT OR IGNORE INTO table_versions (name, slot, version, modified_at) VALUES ('{t.name}', 0, 0, {_SQLITE_NOW})",
+            # список колонок мог измениться с прошлого запуска — триггеры пересоздаём
+            f"DROP TRIGGER IF EXISTS {t.name}_version_ai",
+            f"DROP TRIGGER IF EXISTS {t.name}_version_au",
+            f"DROP TRIGGER IF EXISTS {t.name}_version_ad",
+            f"CREATE TRIGGER {t.name}_version_ai AFTER INSERT ON {t.name} BEGIN {bump} END",
+            f"CREATE TRIGGER {t.name}_version_au AFTER UPDATE OF {cols} ON {t.name} BEGIN {bump} END",
+            f"CREATE TRIGGER {t.name}_version_ad AFTER DELETE ON {t.name} BEGIN {bump} END",
+        ]
+    return out
+
+
+def _pg_ddl(tables: list[Table], untracked: set[str]) -> list[str]:
+    out = [
+        "CREATE TABLE IF NOT EXISTS table_versions ("
+        " name TEXT NOT NULL, slot INTEGER NOT NULL, version BIGINT NOT NULL,"
+        " modified_at BIGINT NOT NULL, PRIMARY KEY (name, slot))",
+        f"""
+        CREATE OR REPLACE FUNCTION table_versions_bump() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions SET version = version + 1, modified_at = {_PG_NOW}
+            WHERE name = TG_TABLE_NAME AND slot = pg_backend_pid() % {SLOTS};
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+    ]
+    for t in tables:
+        cols = ", ".join(_tracked_columns(t, untracked))
+        out += [
+            f"INSERT INTO table_versions (name, slot, version, modified_at)"
+            f" SELECT '{t.name}', s, 0, {_PG_NOW} FROM generate_series(0, {SLOTS - 1}) AS s"
+            f" ON CONFLICT DO NOTHING",
+            f"DROP TRIGGER IF EXISTS {t.name}_version_iud ON {t.name}",
+            f"DROP TRIGGER IF EXISTS {t.name}_version_u ON {t.name}",
+            f"CREATE TRIGGER {t.name}_version_iud AFTER INSERT OR DELETE OR TRUNCATE ON {t.name}"
+            f" FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump()",
+            f"CREATE TRIGGER {t.name}_version_u AFTER UPDATE OF {cols} ON {t.name}"
+            f" FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump()",
+        ]
+    return out
+
+
+def install_change_tracking(engine, tables: list[Table], untracked: set[str] = frozenset()) -> None:
+    """
+    Создаёт table_versions и триггеры на tables (идемпотентно). Вызывается при старте
+    после upgrade_schema. untracked — колонки, UPDATE которых не меняет ответ API.
+    """
+    ddl = _pg_ddl if engine.dialect.name == "postgresql" else _sqlite_ddl
+    with engine.begin() as conn:
+        for sql in ddl(tables, set(untracked)):
+            conn.execute(text(sql))
+
+
+def table_versions(engine, tables: tuple[str, ...]) -> tuple[tuple[int, ...], int]:
+    """
+    → (версии tables по порядку, время последнего изменения любой из них).
+    """
+    q = (
+        select(_versions.c.name, func.sum(_versions.c.version), func.max(_versions.c.modified_at))
+        .where(_versions.c.name.in_(bindparam("names", expanding=True)))
+        .group_by(_versions.c.name)
+    )
+    with engine.connect() as conn:
+        rows = {name: (int(v), int(m)) for name, v, m in conn.execute(q, {"names": list(tables)})}
+    pairs = [rows.get(t, (0, 0)) for t in tables]
+    return tuple(v for v, _ in pairs), max(m for _, m in pairs)
+
+
+class ConditionalGet:
+    """
+    HTTP-middleware: для GET-маршрутов из rules ставит ETag/Last-Modified
+    и отвечает 304, если клиент прислал актуальные If-None-Match / If-Modified-Since.
+    rules: [(regex пути, (таблицы, от которых зависит ответ))] — только коллекции:
+    ETag не содержит id, и 304 не проверяет, что ресурс существует.
+    """
+
+    def __init__(self, engine, rules: list[tuple[str, tuple[str, ...]]]):
+        self.engine = engine
+        self.rules = [(re.compile(p), tables) for p, tables in rules]
+
+    def _tables_for(self, path: str) -> tuple[str, ...] | None:
+        for rx, tables in self.rules:
+            if rx.match(path):
+                return tables
+        return None
+
+    async def __call__(self, request: Request, call_next):
+        tables = self._tables_for(request.url.path) if request.method in ("GET", "HEAD") else None
+        if tables is None:
+            return await call_next(request)
+
+        # версии читаются до ответа: запись, закоммиченная между ними, даст лишний 200, а не 304
+        versions, modified = await run_in_threadpool(table_versions, self.engine, tables)
+        now = datetime.now(timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        modified = max(modified, int(midnight.timestamp()))
+        etag = f'W/"{".".join(map(str, versions))}-{modified}-{now:%Y%m%d}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if modified <= now.timestamp():
+            headers["Last-Modified"] = formatdate(modified, usegmt=True)
+        else:
+            modified = None
+
+        if _not_modified(request, etag, modified):
+            return Response(status_code=304, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
+
+
+def _not_modified(request: Request, etag: str, modified: int | None) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = {t.strip() for t in inm.split(",")}
+        return etag in tags or "*" in tags
+    ims = request.headers.get("if-modified-since")
+    if ims and modified is not None:
+        try:
+            return parsedate_to_datetime(ims).timestamp() >= modified
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -0,0 +1,58 @@
+# backend/app/utils/jsonfast.py
+"""
+Канонический компактный JSON в bytes: orjson, если установлен, иначе stdlib json.
+Канонический = ключи отсортированы, без пробелов, UTF-8 без \\u-экранирования,
+поэтому одинаковый payload всегда даёт одинаковые байты (и одинаковый хэш).
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson опционален
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+
+def _default(o: Any) -> Any:
+    # datetime — в ISO как у Pydantic/orjson ("2024-01-01T12:00:00"), остальное — str
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return str(o)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=_default
+    ).encode("utf-8")
+
+
+def dumps_fast(obj: Any) -> bytes:
+    """
+    Для ответов API: без сортировки ключей (порядок не важен, а это лишний проход).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Аналог ORJSONResponse с фолбэком на stdlib json.
+    Уже сериализованные bytes/str отдаются как есть.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode("utf-8")
+        return dumps_fast(content)
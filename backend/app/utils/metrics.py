@@ -0,0 +1,249 @@
+# backend/app/utils/metrics.py
+"""
+Лёгкие метрики без внешних зависимостей: гистограммы длительностей, gauges
+и их выдача в текстовом формате Prometheus (GET /metrics).
+
+timer(name) / @timed(name) пишут длительность в smartcity_stage_seconds{stage=name}
+и в разбивку текущего запроса — её отдаёт заголовок Server-Timing (ServerTiming).
+"""
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from fastapi import Request
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _fmt(v: float) -> str:
+    v = float(v)
+    if v == float("inf"):
+        return "+Inf"
+    return str(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels → [counts по корзинам (+Inf последней), sum]
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labelvalues)
+            if s is None:
+                s = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][idx] += 1
+            s[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in sorted(self._series.items())]
+        for labels, counts, total in series:
+            acc = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                acc += n
+                le = _labels(self.labelnames, labels, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {acc}")
+            lab = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{lab} {total!r}")
+            lines.append(f"{self.name}_count{lab} {acc}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = float(value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, v in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def values(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        for labels, v in sorted(self.values().items()):
+            lines.append(f"{self.name}_total{_labels(self.labelnames, labels)} {_fmt(v)}")
+        return lines
+
+
+_REGISTRY: list[Histogram | Gauge | Counter] = []
+
+
+def _register(metric):
+    _REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for m in _REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = _register(Histogram(
+    "smartcity_stage_seconds", "Длительность этапов обработки (CV, NLP, маршрутизация, дедуп, коммит БД…).", ("stage",)
+))
+INGEST_STAGE_SECONDS = _register(Histogram(
+    "smartcity_ingest_stage_seconds", "Длительность этапов пайплайна приёма жалобы.", ("stage",)
+))
+HTTP_SECONDS = _register(Histogram(
+    "smartcity_http_request_seconds", "Длительность HTTP-запросов.", ("method", "route", "status")
+))
+QUEUE_DEPTH = _register(Gauge("smartcity_queue_depth", "Глубина очередей (считается при опросе /metrics).", ("queue",)))
+MODEL_LOADED = _register(Gauge("smartcity_model_loaded", "Модель загружена в память (0/1).", ("model",)))
+MODEL_LOAD_SECONDS = _register(Gauge("smartcity_model_load_seconds", "Время последней загрузки модели.", ("model",)))
+ADMISSION_REJECTED = _register(Counter(
+    "smartcity_admission_rejected", "Отказы на POST /complaints: ip/device — rate limit (429), overload — 503.", ("reason",)
+))
+NLP_CASCADE = _register(Counter(
+    "smartcity_nlp_cascade", "Кто ответил в NLP-каскаде: fast (первая ступень), teacher (XLM-R) или student.", ("head", "stage")
+))
+
+# Разбивка текущего запроса: stage → суммарные секунды. None — вне HTTP-запроса.
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe_stage(stage, time.perf_counter() - t0)
+
+        return wrapper
+
+    return deco
+
+
+@contextmanager
+def model_loading(model: str) -> Iterator[None]:
+    """
+    Оборачивает фактическую загрузку модели (не каждый вызов _load()).
+    """
+    t0 = time.perf_counter()
+    with timer(f"model_load_{model}"):
+        yield
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - t0, model)
+
+
+def instrument_sessions(session_factory) -> None:
+    """
+    Время каждого Session.commit() (flush + COMMIT) → stage="db_commit".
+    """
+    @event.listens_for(session_factory, "before_commit")
+    def _before_commit(session) -> None:
+        session.info["_commit_t0"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session) -> None:
+        t0 = session.info.pop("_commit_t0", None)
+        if t0 is not None:
+            observe_stage("db_commit", time.perf_counter() - t0)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _after_rollback(session) -> None:
+        session.info.pop("_commit_t0", None)
+
+
+def server_timing_header(timings: dict[str, float], total_s: float) -> str:
+    parts = [f"{stage};dur={sec * 1000:.1f}" for stage, sec in timings.items()]
+    parts.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTiming:
+    """
+    dispatch для BaseHTTPMiddleware: собирает этапы запроса в Server-Timing
+    и пишет длительность в smartcity_http_request_seconds (route — шаблон пути,
+    чтобы не плодить серии по id). Для стримов (SSE) заголовок уходит до тела,
+    поэтому там только время до начала ответа.
+    """
+
+    async def __call__(self, request: Request, call_next):
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+        t0 = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _request_timings.reset(token)
+        total = time.perf_counter() - t0
+
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        HTTP_SECONDS.observe(total, request.method, path, str(response.status_code))
+        response.headers["Server-Timing"] = server_timing_header(timings, total)
+        return response
@@ -0,0 +1,112 @@
+# backend/archive.py
+"""
+Архив закрытых жалоб (app/services/archive.py).
+
+  python archive.py run --dry-run                  # сколько жалоб уйдёт в архив
+  python archive.py run --older-than-days 365      # перенести DONE/REJECTED старше года
+  python archive.py export --from 2024-01-01 --to 2025-01-01 --out data/exports/complaints_2024.ndjson
+  python archive.py export --format csv --hot-only
+  python archive.py restore <id> [<id> ...]        # вернуть жалобы в горячую таблицу
+
+В API то же самое фоном (ARCHIVE_INTERVAL_SECONDS), чтения архива — include_archived=true.
+"""
+import argparse
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+
+from app.crud import iter_complaint_rows
+from app.db import SessionLocal, engine
+from app.migrations import upgrade_schema
+from app.services.archive import archive_closed, restore_complaints
+from app.settings import settings
+from app.utils.jsonfast import dumps_fast
+
+
+def _date(s: str) -> datetime:
+    return datetime.fromisoformat(s)
+
+
+def cmd_run(args, db) -> None:
+    report = archive_closed(
+        db,
+        older_than_days=args.older_than_days,
+        batch_size=args.batch_size,
+        max_batches=args.max_batches,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def _write_ndjson(out: Path, rows) -> int:
+    n = 0
+    with out.open("wb") as fh:
+        for row in rows:
+            fh.write(dumps_fast(row) + b"\n")
+            n += 1
+    return n
+
+
+def _write_csv(out: Path, rows) -> int:
+    n = 0
+    with out.open("w", newline="", encoding="utf-8") as fh:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(fh, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            n += 1
+    return n
+
+
+def cmd_export(args, db) -> None:
+    span = f"{args.start:%Y%m%d}" if args.start else "all"
+    out = args.out or settings.EXPORTS_DIR / f"complaints_{span}_{datetime.utcnow():%Y%m%d%H%M%S}.{args.format}"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    rows = iter_complaint_rows(db, start=args.start, end=args.end, include_archived=not args.hot_only)
+    n = (_write_ndjson if args.format == "ndjson" else _write_csv)(out, rows)
+    print(json.dumps({"rows": n, "out": str(out)}, ensure_ascii=False))
+
+
+def cmd_restore(args, db) -> None:
+    n = restore_complaints(db, args.ids)
+    db.commit()
+    print(json.dumps({"restored": n}, ensure_ascii=False))
+
+
+def main():
+    p = argparse.ArgumentParser(description="Archive closed complaints, export hot + archived rows, restore.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("run", help="move closed complaints into complaints_archive")
+    sp.add_argument("--older-than-days", type=int, default=None, help=f"по умолчанию ARCHIVE_AFTER_DAYS={settings.ARCHIVE_AFTER_DAYS}")
+    sp.add_argument("--batch-size", type=int, default=None)
+    sp.add_argument("--max-batches", type=int, default=None)
+    sp.add_argument("--dry-run", action="store_true", help="только посчитать")
+    sp.set_defaults(fn=cmd_run)
+
+    sp = sub.add_parser("export", help="export complaints (hot + archive) by created_at range")
+    sp.add_argument("--from", dest="start", type=_date, default=None, help="YYYY-MM-DD, включительно")
+    sp.add_argument("--to", dest="end", type=_date, default=None, help="YYYY-MM-DD, не включительно")
+    sp.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    sp.add_argument("--hot-only", action="store_true", help="без архива")
+    sp.add_argument("--out", type=Path, default=None)
+    sp.set_defaults(fn=cmd_export)
+
+    sp = sub.add_parser("restore", help="move complaints back from the archive")
+    sp.add_argument("ids", nargs="+")
+    sp.set_defaults(fn=cmd_restore)
+
+    args = p.parse_args()
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        args.fn(args, db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
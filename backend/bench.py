@@ -0,0 +1,840 @@
+# backend/bench.py
+"""
+Бенчмарки пайплайна жалоб. Результаты — JSON (--out), сравнение двух прогонов — compare.
+
+  python bench.py micro --rows 20000 --out data/bench/micro.json
+  python bench.py list --rows 10000 100000 --out data/bench/list.json
+  python bench.py load --rows 5000 --requests 1000 --concurrency 8 --out data/bench/load.json
+  python bench.py all --rows 20000 --out data/bench/$(git rev-parse --short HEAD).json
+  python bench.py compare data/bench/base.json data/bench/head.json --threshold 1.15
+
+micro — haversine_m / find_duplicate_geo, compute_priority, route, stats_*.
+dedup — гонка дублей: N параллельных POST /complaints в одной точке → ровно один кластер
+        из N жалоб (код выхода 1, если нет); --url — против сервера с той же базой (--db):
+        python bench.py dedup --uploads 64 --concurrency 64
+workers — serve.py (pre-fork) с 1/2/4/8 воркерами: суммарная память (PSS) и RPS:
+        python bench.py workers --real-models --requests 1000 --concurrency 32
+clip  — подготовка фото для CLIP: CLIPProcessor против app/ai/clip_preprocess (нужен torch).
+list  — GET /complaints: ORM → ComplaintOut → json против Core select → orjson.
+load  — POST /complaints + чтения (список, статистика, кластеры, очередь, delta-sync)
+        в процессе через ASGI; --url — против запущенного сервера:
+        AI_STUB_MODELS=1 uvicorn app.main:app --port 8000
+        python bench.py load --url http://127.0.0.1:8000 --requests 2000
+
+База — временный SQLite (или --db), засеянный --rows синтетическими жалобами по Шымкенту
+с фиксированным --seed: одинаковые данные от запуска к запуску. CLIP/XLM-R заменяются
+детерминированными заглушками (AI_STUB_MODELS=1), --real-models — настоящие модели.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Шымкент: центр и разброс точек (≈ 15 × 18 км)
+CITY_LAT, CITY_LNG = 42.3155, 69.5869
+CITY_SPREAD_LAT, CITY_SPREAD_LNG = 0.07, 0.11
+HOTSPOTS = 40  # места, где жалобы кучкуются (дубли)
+HOTSPOT_SHARE = 0.6
+HOTSPOT_SIGMA_DEG = 0.0012  # ≈ 130 м
+
+TEXTS = [
+    "Большая яма на дороге возле остановки, машины объезжают по встречной",
+    "Переполнены мусорные контейнеры во дворе, мусор не вывозят неделю",
+    "Не горит уличный фонарь на перекрёстке, вечером очень темно",
+    "Сломаны качели на детской площадке, торчат болты",
+    "Стихийная свалка строительного мусора за гаражами",
+    "Разбит тротуар, плитка вздулась, пожилым людям невозможно пройти",
+    "Аула жанында жарық жоқ, кешке қараңғы",
+    "Балалар алаңындағы әткеншек сынған",
+    "Открытый люк посреди дороги, очень опасно",
+    "",
+]
+
+PLAN_WEIGHTS = [
+    ("POST /complaints", 20),
+    ("GET /complaints", 30),
+    ("GET /stats/summary", 10),
+    ("GET /stats/heatmap", 10),
+    ("GET /clusters", 10),
+    ("GET /queue/{department}", 10),
+    ("GET /complaints/changes", 10),
+]
+
+# Ключи-метрики времени (меньше = лучше): их сравнивает compare
+TIME_KEYS = ("per_op_us", "median_s", "p50_ms", "p90_ms", "p99_ms")
+
+
+# ---- окружение ----
+def _setup(args) -> str:
+    """
+    Настраивает окружение до импорта app (engine создаётся при импорте app.db).
+    """
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    if not args.real_models:
+        os.environ["AI_STUB_MODELS"] = "1"
+    # весь генератор нагрузки — один IP: лимит на клиента мерил бы сам себя
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    # слоты пайплайна остаются, но без 503: меряем очередь, а не сброс
+    os.environ.setdefault("INFERENCE_QUEUE_SLO_SECONDS", "3600")
+    sys.path.insert(0, HERE)
+    return db_path
+
+
+def _meta(args) -> dict:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        rev = None
+    from app.utils.jsonfast import HAS_ORJSON
+
+    return {
+        "git": rev,
+        "at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": HAS_ORJSON,
+        "stub_models": not args.real_models,
+        "seed": args.seed,
+    }
+
+
+def _write(results: dict, out: str | None) -> None:
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if out:
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+
+
+# ---- синтетические данные ----
+def _hotspots(seed: int) -> list[tuple[float, float]]:
+    rnd = random.Random(seed)
+    return [
+        (CITY_LAT + rnd.uniform(-1, 1) * CITY_SPREAD_LAT, CITY_LNG + rnd.uniform(-1, 1) * CITY_SPREAD_LNG)
+        for _ in range(HOTSPOTS)
+    ]
+
+
+def random_point(rnd: random.Random, hotspots: list[tuple[float, float]]) -> tuple[float, float]:
+    if rnd.random() < HOTSPOT_SHARE:
+        lat, lng = rnd.choice(hotspots)
+        return lat + rnd.gauss(0, HOTSPOT_SIGMA_DEG), lng + rnd.gauss(0, HOTSPOT_SIGMA_DEG)
+    return (
+        CITY_LAT + rnd.uniform(-1, 1) * CITY_SPREAD_LAT,
+        CITY_LNG + rnd.uniform(-1, 1) * CITY_SPREAD_LNG,
+    )
+
+
+def seed_complaints(db, n: int, *, start: int = 0, seed: int = 42, days: int = 60) -> int:
+    """
+    n жалоб: id/координаты/тексты из Random(seed + start), маршрутизация и приоритет —
+    теми же функциями, что и в приёме. Без CV/NLP: метки выбираются из словарей моделей.
+    """
+    from app.ai.cv_clip import LABELS
+    from app.ai.nlp_zero_shot import CATEGORIES, URGENCY
+    from app.models import Complaint
+    from app.services.ingestion import route_complaint, score_complaint
+
+    rnd = random.Random(seed + start)
+    hotspots = _hotspots(seed)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(start, start + n):
+        lat, lng = random_point(rnd, hotspots)
+        created_at = now - timedelta(seconds=rnd.uniform(0, days * 86400))
+        cv_label = rnd.choice(LABELS)
+        is_relevant = cv_label != LABELS[-1]
+        nlp_category, nlp_urgency = rnd.choice(CATEGORIES), rnd.choice(URGENCY)
+        routing = route_complaint(cv_label, nlp_category, nlp_urgency, is_relevant)
+        pr = score_complaint(urgency=nlp_urgency, is_relevant=is_relevant, created_at=created_at)
+        rows.append(
+            {
+                "id": str(uuid.UUID(int=rnd.getrandbits(128))),
+                "created_at": created_at,
+                "lang": rnd.choice(("ru", "ru", "kz")),
+                "text": rnd.choice(TEXTS),
+                "ui_category": "",
+                "lat": lat,
+                "lng": lng,
+                "image_path": f"data/images/bench_{i}.jpg",
+                "status": rnd.choice(("NEW", "NEW", "IN_PROGRESS", "DONE")) if is_relevant else "REJECTED",
+                "cv_label": cv_label,
+                "cv_score": rnd.uniform(0.3, 0.99),
+                "is_relevant": "1" if is_relevant else "0",
+                "nlp_category": nlp_category,
+                "nlp_urgency": nlp_urgency,
+                "nlp_confidence": rnd.uniform(0.3, 0.99),
+                **routing,
+                "duplicates_count": 0,
+                "confirmations": 1,
+                "priority_score": float(pr.score),
+                "priority_level": str(pr.level),
+                "payload_version": 1,
+            }
+        )
+        if len(rows) == 5000:
+            db.bulk_insert_mappings(Complaint, rows)
+            rows = []
+    if rows:
+        db.bulk_insert_mappings(Complaint, rows)
+    db.commit()
+    return n
+
+
+def _prepare_db(args, rows: int) -> dict:
+    from app.db import Base, SessionLocal, engine
+    from app.services.reprocess import ReprocessOptions, reprocess
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        seed_complaints(db, rows, seed=args.seed)
+        out = {"rows": rows, "seed_s": round(time.perf_counter() - t0, 3)}
+        if not args.no_clusters:
+            # кластеры дублей строим штатным reprocess (как после миграции)
+            t0 = time.perf_counter()
+            reprocess(db, ReprocessOptions(stages=("dedup",), workers=1, chunk_size=1000))
+            out["clusters_s"] = round(time.perf_counter() - t0, 3)
+        return out
+    finally:
+        db.close()
+
+
+# ---- micro ----
+def _bench(fn, ops: int, repeat: int) -> dict:
+    """
+    fn() делает ops операций; время на операцию — медиана и минимум по repeat прогонам.
+    """
+    fn()  # прогрев
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) / ops)
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "per_op_us": round(statistics.median(samples) * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+    }
+
+
+def run_micro(args) -> dict:
+    from app.ai.cv_clip import LABELS
+    from app.ai.nlp_zero_shot import CATEGORIES, URGENCY
+    from app.ai.router import route
+    from app.db import SessionLocal
+    from app.services.duplicate import find_duplicate_geo, haversine_m
+    from app.services.priority import compute_priority
+    from app.services.stats import stats_heatmap, stats_summary, stats_trends
+    from app.settings import settings
+
+    rnd = random.Random(args.seed + 1)
+    hotspots = _hotspots(args.seed)
+    points = [random_point(rnd, hotspots) for _ in range(10_000)]
+    pairs = list(zip(points, points[1:] + points[:1]))
+    now = datetime.utcnow()
+    prio_args = [
+        dict(
+            confirmations=rnd.randint(1, 5),
+            created_at=now - timedelta(hours=rnd.uniform(0, 24 * 14)),
+            object_type=rnd.choice(("unknown", "road", "school", "yard")),
+            urgency=rnd.choice(("low", "medium", "high")),
+            is_relevant=rnd.random() > 0.1,
+            duplicates_count=rnd.randint(0, 10),
+        )
+        for _ in range(10_000)
+    ]
+    route_args = [
+        (rnd.choice(LABELS), rnd.choice(CATEGORIES), rnd.choice(URGENCY), rnd.random() > 0.1) for _ in range(10_000)
+    ]
+    geo_points = points[:200]
+
+    def haversine_all():
+        for (a, b), (c, d) in pairs:
+            haversine_m(a, b, c, d)
+
+    def priority_all():
+        for kw in prio_args:
+            compute_priority(**kw)
+
+    def route_all():
+        for a in route_args:
+            route(*a)
+
+    db = SessionLocal()
+    try:
+        def dup_all():
+            for lat, lng in geo_points:
+                find_duplicate_geo(db=db, lat=lat, lng=lng, radius_m=settings.DUP_RADIUS_METERS, limit=settings.DUP_SCAN_LIMIT)
+
+        r = args.repeat
+        return {
+            "haversine_m": _bench(haversine_all, len(pairs), r),
+            "find_duplicate_geo": _bench(dup_all, len(geo_points), r),
+            "compute_priority": _bench(priority_all, len(prio_args), r),
+            "route": _bench(route_all, len(route_args), r),
+            "stats_summary": _bench(lambda: stats_summary(db), 1, r),
+            "stats_trends": _bench(lambda: stats_trends(db, days=30), 1, r),
+            "stats_heatmap": _bench(lambda: stats_heatmap(db, grid_size=0.01), 1, r),
+        }
+    finally:
+        db.close()
+
+
+# ---- list ----
+def _time_call(fn, repeat: int) -> dict:
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = len(fn())
+        samples.append(time.perf_counter() - t0)
+    return {"median_s": round(statistics.median(samples), 4), "min_s": round(min(samples), 4), "bytes": size}
+
+
+def run_list(args, rows: int, check: bool) -> dict:
+    from fastapi.encoders import jsonable_encoder
+
+    from app.crud import list_complaint_rows
+    from app.db import SessionLocal
+    from app.models import Complaint
+    from app.schemas import ComplaintOut
+    from app.utils.jsonfast import dumps_fast
+
+    def orm_path():
+        db = SessionLocal()
+        try:
+            objs = db.query(Complaint).order_by(Complaint.created_at.desc()).all()
+            data = jsonable_encoder([ComplaintOut.model_validate(o) for o in objs])
+            return json.dumps(data, ensure_ascii=False).encode("utf-8")
+        finally:
+            db.close()
+
+    def fast_path():
+        db = SessionLocal()
+        try:
+            return dumps_fast(list_complaint_rows(db))
+        finally:
+            db.close()
+
+    orm = _time_call(orm_path, args.repeat)
+    fast = _time_call(fast_path, args.repeat)
+    run = {"rows": rows, "orm_pydantic": orm, "fast": fast, "speedup": round(orm["median_s"] / fast["median_s"], 2)}
+    if check:
+        # быстрый путь обязан отдавать тот же JSON
+        run["same_output"] = json.loads(orm_path()) == json.loads(fast_path())
+    return run
+
+
+# ---- load ----
+def _plan(args, departments: list[str]) -> list[tuple[str, str, dict]]:
+    """
+    Детерминированная последовательность запросов: (вид, путь, параметры POST).
+    """
+    rnd = random.Random(args.seed + 2)
+    hotspots = _hotspots(args.seed)
+    kinds = [k for k, _ in PLAN_WEIGHTS]
+    weights = [w for _, w in PLAN_WEIGHTS]
+    plan = []
+    for _ in range(args.warmup + args.requests):
+        kind = rnd.choices(kinds, weights)[0]
+        if kind == "POST /complaints":
+            lat, lng = random_point(rnd, hotspots)
+            plan.append((kind, "/complaints", {
+                "text": rnd.choice(TEXTS),
+                "lat": f"{lat:.6f}",
+                "lng": f"{lng:.6f}",
+                "lang": "ru",
+                "photo": rnd.getrandbits(8 * 2048).to_bytes(2048, "big"),
+            }))
+        elif kind == "GET /complaints":
+            plan.append((kind, f"/complaints?limit=100&offset={rnd.randrange(0, 1000, 100)}", {}))
+        elif kind == "GET /stats/summary":
+            plan.append((kind, "/stats/summary", {}))
+        elif kind == "GET /stats/heatmap":
+            plan.append((kind, "/stats/heatmap?grid_size=0.01", {}))
+        elif kind == "GET /clusters":
+            plan.append((kind, "/clusters?min_members=2&limit=50", {}))
+        elif kind == "GET /queue/{department}":
+            plan.append((kind, f"/queue/{rnd.choice(departments)}?limit=20", {}))
+        else:
+            plan.append((kind, "/complaints/changes?limit=500", {}))
+    return plan
+
+
+def _percentile(sorted_ms: list[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    i = min(len(sorted_ms) - 1, max(0, math.ceil(q * len(sorted_ms)) - 1))
+    return round(sorted_ms[i], 2)
+
+
+def _summarize(samples: list[tuple[str, int, float]]) -> dict:
+    by_kind: dict[str, list[tuple[int, float]]] = {}
+    for kind, status, ms in samples:
+        by_kind.setdefault(kind, []).append((status, ms))
+    out = {}
+    for kind, items in sorted(by_kind.items()):
+        ms = sorted(m for _, m in items)
+        out[kind] = {
+            "count": len(items),
+            "errors": sum(1 for s, _ in items if s >= 400),
+            "mean_ms": round(statistics.fmean(ms), 2),
+            "p50_ms": _percentile(ms, 0.50),
+            "p90_ms": _percentile(ms, 0.90),
+            "p99_ms": _percentile(ms, 0.99),
+            "max_ms": round(ms[-1], 2),
+        }
+    return out
+
+
+async def _drive(client, plan, concurrency: int) -> list[tuple[str, int, float, str | None]]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+    samples = []
+
+    async def worker():
+        while True:
+            try:
+                kind, path, form = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            if form:
+                data = {k: v for k, v in form.items() if k != "photo"}
+                files = {"photo": ("bench.jpg", form["photo"], "image/jpeg")}
+                r = await client.post(path, data=data, files=files)
+            else:
+                r = await client.get(path)
+            ms = (time.perf_counter() - t0) * 1000.0
+            created = r.json().get("id") if form and r.status_code == 200 else None
+            samples.append((kind, r.status_code, ms, created))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def run_load(args) -> dict:
+    import httpx
+
+    departments = [
+        "Коммунальные службы / Санитария",
+        "Горсвет / Отдел освещения",
+        "Благоустройство / ЖКХ",
+        "Дорожная служба / Транспорт",
+        "Единая диспетчерская",
+    ]
+    plan = _plan(args, departments)
+    warmup, measured = plan[: args.warmup], plan[args.warmup:]
+
+    async def main():
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=120)
+        else:
+            from app.main import app
+
+            # Без lifespan: фоновые циклы (пересчёт, outbox, акимат) не шумят в замерах
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+        async with client:
+            warm = await _drive(client, warmup, args.concurrency)
+            t0 = time.perf_counter()
+            samples = await _drive(client, measured, args.concurrency)
+            wall = time.perf_counter() - t0
+        return samples, wall, [s[3] for s in warm + samples]
+
+    samples, wall, created = asyncio.run(main())
+    if not args.url or getattr(args, "local_server", False):
+        # в процессе (и у локального serve.py) картинки пишутся в data/images — убираем за собой
+        from app.utils.files import IMAGES_DIR
+
+        for cid in filter(None, created):
+            (IMAGES_DIR / f"{cid}.jpg").unlink(missing_ok=True)
+
+    return {
+        "target": args.url or "in-process",
+        "requests": len(samples),
+        "concurrency": args.concurrency,
+        "wall_s": round(wall, 3),
+        "rps": round(len(samples) / wall, 1) if wall else None,
+        "endpoints": _summarize([(k, s, ms) for k, s, ms, _ in samples]),
+    }
+
+
+# ---- dedup ----
+def run_dedup(args) -> tuple[dict, bool]:
+    """
+    Параллельные загрузки в радиусе --jitter-m от одной точки: все должны попасть
+    в один кластер, member_count и duplicates_count «оригинала» — совпасть с числом жалоб.
+    """
+    import httpx
+    from sqlalchemy import func
+
+    from app.db import Base, SessionLocal, engine
+    from app.models import Complaint, DuplicateCluster
+    from app.services.duplicate import haversine_m
+    from app.settings import settings
+
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(args.seed + 3)
+    lat0, lng0 = _hotspots(args.seed)[0]
+    jitter = args.jitter_m / 111_320.0
+    plan = [
+        ("POST /complaints", "/complaints", {
+            "text": rnd.choice(TEXTS),
+            "lat": f"{lat0 + rnd.uniform(-jitter, jitter):.6f}",
+            "lng": f"{lng0 + rnd.uniform(-jitter, jitter):.6f}",
+            "lang": "ru",
+            "photo": rnd.getrandbits(8 * 2048).to_bytes(2048, "big"),
+        })
+        for _ in range(args.uploads)
+    ]
+
+    async def main():
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=120)
+        else:
+            from app.main import app
+
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+        async with client:
+            t0 = time.perf_counter()
+            samples = await _drive(client, plan, args.concurrency)
+            return samples, time.perf_counter() - t0
+
+    samples, wall = asyncio.run(main())
+    created = [s[3] for s in samples if s[3]]
+    if not args.url:
+        from app.utils.files import IMAGES_DIR
+
+        for cid in created:
+            (IMAGES_DIR / f"{cid}.jpg").unlink(missing_ok=True)
+
+    db = SessionLocal()
+    try:
+        roots = [
+            c for c in db.query(DuplicateCluster).filter(DuplicateCluster.parent_id.is_(None))
+            if haversine_m(lat0, lng0, c.centroid_lat, c.centroid_lng) <= settings.DUP_RADIUS_METERS + args.jitter_m
+        ]
+        groups = dict(
+            db.query(Complaint.duplicate_group_id, func.count(Complaint.id))
+            .filter(Complaint.id.in_(created))
+            .group_by(Complaint.duplicate_group_id)
+            .all()
+        ) if created else {}
+        root = roots[0] if len(roots) == 1 else None
+        root_row = db.get(Complaint, root.id) if root else None
+        report = {
+            "uploads": args.uploads,
+            "concurrency": args.concurrency,
+            "created": len(created),
+            "errors": sum(1 for s in samples if s[1] >= 400),
+            "wall_s": round(wall, 3),
+            "clusters_near": len(roots),
+            "member_count": root.member_count if root else [c.member_count for c in roots],
+            "groups": len(groups),
+            "root_duplicates_count": root_row.duplicates_count if root_row else None,
+        }
+    finally:
+        db.close()
+
+    ok = (
+        report["created"] == args.uploads
+        and root is not None
+        and root.member_count == args.uploads
+        and groups == {root.id: args.uploads}
+        and report["root_duplicates_count"] == args.uploads - 1
+    )
+    report["ok"] = ok
+    return report, ok
+
+
+# ---- workers ----
+def _proc_kb(pid: int, path: str, key: str) -> int:
+    try:
+        with open(f"/proc/{pid}/{path}", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith(key):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid: int) -> list[int]:
+    out = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", encoding="ascii") as fh:
+                out.extend(int(x) for x in fh.read().split())
+    except OSError:
+        pass
+    return out
+
+
+def _memory(master: int) -> dict:
+    """
+    PSS — общие (copy-on-write) страницы делятся между процессами: сумма = реальная память.
+    RSS каждого процесса считает общие веса целиком — сумма их многократно завышает.
+    """
+    pids = [master, *_children(master)]
+    pss = sum(_proc_kb(p, "smaps_rollup", "Pss:") for p in pids)
+    rss = sum(_proc_kb(p, "status", "VmRSS:") for p in pids)
+    return {"processes": len(pids), "pss_mb": round(pss / 1024, 1), "rss_sum_mb": round(rss / 1024, 1)}
+
+
+def run_workers(args) -> dict:
+    """
+    serve.py с 1, 2, 4, 8 воркерами на одной засеянной базе: память (PSS) и пропускная способность.
+    С заглушками моделей меряется только само приложение — для весов нужен --real-models.
+    """
+    import httpx
+
+    out = []
+    for n in args.workers:
+        url = f"http://127.0.0.1:{args.port}"
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "serve.py"), "--workers", str(n),
+             "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+            cwd=HERE,
+            env={**os.environ, "PRIORITY_RECOMPUTE_SECONDS": "0"},
+        )
+        try:
+            deadline = time.monotonic() + args.startup_timeout
+            while True:
+                try:
+                    if httpx.get(url + "/", timeout=2).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise SystemExit(f"serve.py --workers {n} did not start")
+                time.sleep(0.5)
+            idle = _memory(proc.pid)
+            args.url, args.local_server = url, True
+            load = run_load(args)
+            out.append({
+                "workers": n,
+                "memory_idle": idle,
+                "memory_after_load": _memory(proc.pid),
+                "rps": load["rps"],
+                "load": load,
+            })
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        args.url = None
+    return {"runs": out}
+
+
+# ---- clip ----
+def run_clip(args) -> dict:
+    """
+    Подготовка фото для CLIP: CLIPProcessor против clip_preprocess (draft-декод + буфер),
+    на синтетических JPEG размера телефонной камеры. Нужны PIL/torch/transformers.
+    """
+    import numpy as np
+    from PIL import Image
+    from transformers import CLIPProcessor
+
+    from app.ai.clip_preprocess import preprocess_images
+
+    rnd = np.random.default_rng(args.seed)
+    tmpdir = tempfile.mkdtemp(prefix="bench_clip_")
+    paths = []
+    w, h = args.photo_size
+    for i in range(args.photos):
+        # гладкий шум — JPEG с реалистичным размером файла, а не сплошной цвет
+        small = rnd.integers(0, 256, size=(h // 32, w // 32, 3), dtype=np.uint8)
+        img = Image.fromarray(small).resize((w, h), Image.BILINEAR)
+        path = os.path.join(tmpdir, f"{i}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+
+    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+
+    def reference(p):
+        return processor(images=Image.open(p).convert("RGB"), return_tensors="pt")["pixel_values"]
+
+    ops = len(paths)
+    out = {
+        "photo_size": [w, h],
+        "photos": ops,
+        "clip_processor": _bench(lambda: [reference(p) for p in paths], ops, args.repeat),
+        "fast_single": _bench(lambda: [preprocess_images([p]) for p in paths], ops, args.repeat),
+        "fast_batch": _bench(lambda: preprocess_images(paths), ops, args.repeat),
+    }
+    out["speedup_single"] = round(out["clip_processor"]["per_op_us"] / out["fast_single"]["per_op_us"], 1)
+    out["speedup_batch"] = round(out["clip_processor"]["per_op_us"] / out["fast_batch"]["per_op_us"], 1)
+    # draft-декод масштабирует DCT — пиксели чуть отличаются, проверяем, насколько
+    out["max_abs_diff"] = round(float((reference(paths[0])[0] - preprocess_images(paths[:1])[0]).abs().max()), 4)
+    out["mean_abs_diff"] = round(float((reference(paths[0])[0] - preprocess_images(paths[:1])[0]).abs().mean()), 4)
+    return out
+
+
+# ---- compare ----
+def _flatten(obj, prefix: str = "") -> dict[str, float]:
+    out = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            out.update(_flatten(v, f"{prefix}.{k}" if prefix else str(k)))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            key = v.get("rows", i) if isinstance(v, dict) else i
+            out.update(_flatten(v, f"{prefix}[{key}]"))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix] = float(obj)
+    return out
+
+
+def run_compare(args) -> int:
+    with open(args.base, encoding="utf-8") as fh:
+        base = _flatten(json.load(fh))
+    with open(args.head, encoding="utf-8") as fh:
+        head = _flatten(json.load(fh))
+
+    regressions = 0
+    for key in sorted(base.keys() & head.keys()):
+        if key.rsplit(".", 1)[-1] not in TIME_KEYS or base[key] <= 0:
+            continue
+        ratio = head[key] / base[key]
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+        print(f"{key:70s} {base[key]:>12.3f} → {head[key]:>12.3f}  x{ratio:.2f}{flag}")
+    print(f"{regressions} regression(s) over x{args.threshold}")
+    return 1 if regressions else 0
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmarks for the complaint pipeline.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    def common(sp, rows_default=None):
+        if rows_default is not None:
+            sp.add_argument("--rows", type=int, default=rows_default, help="сколько жалоб засеять")
+        sp.add_argument("--seed", type=int, default=42)
+        sp.add_argument("--repeat", type=int, default=5)
+        sp.add_argument("--db", default=None, help="путь к SQLite (по умолчанию — временный файл)")
+        sp.add_argument("--no-clusters", action="store_true", help="не строить кластеры дублей после засева")
+        sp.add_argument("--real-models", action="store_true", help="настоящие CLIP/XLM-R вместо заглушек")
+        sp.add_argument("--out", default=None, help="куда записать результаты (JSON)")
+
+    def load_opts(sp):
+        sp.add_argument("--requests", type=int, default=500)
+        sp.add_argument("--warmup", type=int, default=50)
+        sp.add_argument("--concurrency", type=int, default=8)
+        sp.add_argument("--url", default=None, help="база запущенного сервера; без неё — ASGI в процессе")
+
+    common(sub.add_parser("micro", help="micro-benchmarks"), 20_000)
+
+    sp = sub.add_parser("list", help="GET /complaints serialization paths")
+    common(sp)
+    sp.set_defaults(repeat=3)
+    sp.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="размеры базы по возрастанию")
+
+    sp = sub.add_parser("load", help="end-to-end load generator")
+    common(sp, 5_000)
+    load_opts(sp)
+
+    sp = sub.add_parser("all", help="micro + list + load on one seeded database")
+    common(sp, 20_000)
+    load_opts(sp)
+
+    sp = sub.add_parser("dedup", help="concurrent uploads at one spot must form exactly one cluster")
+    common(sp)
+    sp.add_argument("--uploads", type=int, default=64)
+    sp.add_argument("--concurrency", type=int, default=64)
+    sp.add_argument("--jitter-m", type=float, default=20.0, help="разброс точек вокруг центра, м")
+    sp.add_argument("--url", default=None, help="база запущенного сервера (вместе с --db его базы)")
+
+    sp = sub.add_parser("workers", help="serve.py memory and throughput at 1/2/4/8 workers")
+    common(sp, 5_000)
+    load_opts(sp)
+    sp.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    sp.add_argument("--port", type=int, default=18080)
+    sp.add_argument("--startup-timeout", type=float, default=600.0, help="загрузка настоящих моделей — минуты")
+
+    sp = sub.add_parser("clip", help="CLIP image preprocessing: CLIPProcessor vs fast path")
+    common(sp)
+    sp.add_argument("--photos", type=int, default=16)
+    sp.add_argument("--photo-size", type=int, nargs=2, default=[4000, 3000], metavar=("W", "H"))
+
+    sp = sub.add_parser("compare", help="compare two result files")
+    sp.add_argument("base")
+    sp.add_argument("head")
+    sp.add_argument("--threshold", type=float, default=1.15, help="head/base выше этого — регрессия")
+
+    args = p.parse_args()
+    if args.cmd == "compare":
+        sys.exit(run_compare(args))
+
+    _setup(args)
+    results = {"meta": _meta(args)}
+
+    if args.cmd == "clip":
+        results["clip"] = run_clip(args)
+        _write(results, args.out)
+        return
+
+    if args.cmd == "dedup":
+        results["dedup"], ok = run_dedup(args)
+        _write(results, args.out)
+        sys.exit(0 if ok else 1)
+
+    if args.cmd == "list":
+        from app import models  # noqa: F401 — таблицы регистрируются в Base.metadata при импорте
+        from app.db import Base, SessionLocal, engine
+
+        Base.metadata.create_all(bind=engine)
+        results["list"] = []
+        seeded = 0
+        for n in sorted(args.rows):
+            db = SessionLocal()
+            seed_complaints(db, n - seeded, start=seeded, seed=args.seed)
+            db.close()
+            seeded = n
+            results["list"].append(run_list(args, n, check=not results["list"]))
+        _write(results, args.out)
+        return
+
+    if args.cmd == "load" and args.url:
+        results["seed"] = None  # сервер работает со своей базой
+    else:
+        results["seed"] = _prepare_db(args, args.rows)
+    if args.cmd in ("micro", "all"):
+        results["micro"] = run_micro(args)
+    if args.cmd == "all":
+        results["list"] = [run_list(args, args.rows, check=True)]
+    if args.cmd in ("load", "all"):
+        results["load"] = run_load(args)
+    if args.cmd == "workers":
+        results["workers"] = run_workers(args)
+    _write(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
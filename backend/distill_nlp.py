@@ -0,0 +1,257 @@
+# backend/distill_nlp.py
+"""
+Дистилляция XLM-R large zero-shot (учитель) в маленького студента (app/ai/nlp_student.py).
+
+1) Разметка истории жалоб учителем — полные распределения по меткам (soft targets),
+   можно прерывать: уже размеченные id пропускаются.
+     python distill_nlp.py label --out data/distill/labels.jsonl --batch-size 16
+2) Обучение студента: KL к мягким меткам учителя (температура T) + CE к его top-1.
+     python distill_nlp.py train --labels data/distill/labels.jsonl --epochs 4
+3) Отчёт: согласие с учителем по головам и задержка на CPU (батч 1) учителя и студента.
+     python distill_nlp.py eval --labels data/distill/labels.jsonl --report data/distill/report.json
+
+Отложенная выборка — по хэшу id (одна и та же для train и eval).
+Включить студента в API: NLP_BACKEND=student (NLP_STUDENT_INT8=1 — int8 на CPU).
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import zlib
+from pathlib import Path
+
+from app.ai.nlp_zero_shot import CATEGORIES, URGENCY
+from app.settings import settings
+
+LABELS = {"category": CATEGORIES, "urgency": URGENCY}
+DEFAULT_LABELS = settings.DATA_DIR / "distill" / "labels.jsonl"
+
+
+def is_holdout(complaint_id: str, share: float) -> bool:
+    return zlib.crc32(complaint_id.encode("utf-8")) % 10_000 < share * 10_000
+
+
+def read_labels(path: Path) -> list[dict]:
+    with path.open(encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+# ---- 1) разметка учителем ----
+def cmd_label(args) -> None:
+    from app.ai.nlp_zero_shot import _load
+    from app.db import SessionLocal, engine
+    from app.migrations import upgrade_schema
+    from app.models import Complaint
+
+    upgrade_schema(engine)
+    done = {r["id"] for r in read_labels(args.out)} if args.out.exists() else set()
+
+    db = SessionLocal()
+    try:
+        q = (
+            db.query(Complaint.id, Complaint.text, Complaint.lang)
+            .filter(Complaint.text.isnot(None), Complaint.text != "")
+            .order_by(Complaint.created_at.asc(), Complaint.id.asc())
+        )
+        if args.limit:
+            q = q.limit(args.limit)
+        todo = [(cid, text.strip(), lang or "ru") for cid, text, lang in q if cid not in done and text.strip()]
+    finally:
+        db.close()
+
+    zs = _load()
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with args.out.open("a", encoding="utf-8") as fh:
+        for start in range(0, len(todo), args.batch_size):
+            batch = todo[start:start + args.batch_size]
+            texts = [t for _, t, _ in batch]
+            soft = {}
+            for head, labels in LABELS.items():
+                res = zs(texts, labels, multi_label=False, batch_size=args.batch_size)
+                res = res if isinstance(res, list) else [res]
+                soft[head] = [dict(zip(r["labels"], map(float, r["scores"]))) for r in res]
+            for i, (cid, text, lang) in enumerate(batch):
+                row = {"id": cid, "text": text, "lang": lang}
+                row.update({head: soft[head][i] for head in LABELS})
+                fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+            fh.flush()
+            print(f"labelled {start + len(batch)}/{len(todo)}  {time.perf_counter() - t0:.0f}s")
+
+
+# ---- 2) обучение студента ----
+def cmd_train(args) -> None:
+    import torch
+    import torch.nn.functional as F
+
+    from app.ai.nlp_student import DEFAULT_BASE, MAX_LEN, build_student, save_student
+
+    torch.manual_seed(args.seed)
+    rows = read_labels(args.labels)
+    train_rows = [r for r in rows if not is_holdout(r["id"], args.holdout)]
+    test_rows = [r for r in rows if is_holdout(r["id"], args.holdout)]
+    if not train_rows:
+        raise SystemExit(f"{args.labels}: нет строк для обучения — сначала distill_nlp.py label")
+
+    model, tokenizer = build_student(args.base or DEFAULT_BASE, LABELS)
+    opt = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=0.01)
+    steps = args.epochs * ((len(train_rows) + args.batch_size - 1) // args.batch_size)
+    sched = torch.optim.lr_scheduler.LambdaLR(opt, lambda s: max(0.0, 1.0 - s / max(1, steps)))
+
+    def targets(batch, head):
+        labels = LABELS[head]
+        return torch.tensor([[r[head].get(l, 0.0) for l in labels] for r in batch])
+
+    def encode(batch):
+        return tokenizer([r["text"] for r in batch], padding=True, truncation=True, max_length=MAX_LEN, return_tensors="pt")
+
+    rnd = random.Random(args.seed)
+    T = args.temperature
+    best = -1.0
+    for epoch in range(args.epochs):
+        model.train()
+        rnd.shuffle(train_rows)
+        t0 = time.perf_counter()
+        total = 0.0
+        for start in range(0, len(train_rows), args.batch_size):
+            batch = train_rows[start:start + args.batch_size]
+            enc = encode(batch)
+            logits = model(enc["input_ids"], enc["attention_mask"])
+            loss = 0.0
+            for head, z in logits.items():
+                p_teacher = targets(batch, head)
+                # мягкие метки учителя (с температурой) + его top-1 как жёсткая метка
+                soft_t = F.softmax(torch.log(p_teacher.clamp(min=1e-8)) / T, dim=-1)
+                kl = F.kl_div(F.log_softmax(z / T, dim=-1), soft_t, reduction="batchmean") * (T * T)
+                ce = F.cross_entropy(z, p_teacher.argmax(dim=-1))
+                loss = loss + args.alpha * kl + (1 - args.alpha) * ce
+            opt.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            opt.step()
+            sched.step()
+            total += float(loss) * len(batch)
+
+        model.eval()
+        agreement = _agreement((model, tokenizer, LABELS), test_rows) if test_rows else None
+        print(json.dumps({
+            "epoch": epoch + 1,
+            "loss": round(total / len(train_rows), 4),
+            "epoch_s": round(time.perf_counter() - t0, 1),
+            "holdout_agreement": agreement,
+        }, ensure_ascii=False))
+
+        score = statistics.fmean(agreement.values()) if agreement else epoch
+        if score > best:
+            best = score
+            save_student(model, tokenizer, LABELS, args.out, {
+                "base": args.base or DEFAULT_BASE,
+                "epoch": epoch + 1,
+                "holdout_agreement": agreement,
+                "train_rows": len(train_rows),
+            })
+    print(f"saved {args.out}")
+
+
+def _agreement(student, rows: list[dict], batch_size: int = 64) -> dict[str, float]:
+    from app.ai.nlp_student import predict_batch
+
+    hits = {h: 0 for h in LABELS}
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        preds = predict_batch([r["text"] for r in batch], student=student)
+        for r, p in zip(batch, preds):
+            for head in LABELS:
+                teacher_top = max(r[head].items(), key=lambda kv: kv[1])[0]
+                hits[head] += p[head][0] == teacher_top
+    return {h: round(n / max(1, len(rows)), 4) for h, n in hits.items()}
+
+
+# ---- 3) отчёт ----
+def _latency(fn, texts: list[str]) -> dict:
+    fn(texts[0])  # прогрев
+    samples = []
+    for t in texts:
+        t0 = time.perf_counter()
+        fn(t)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 2),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+
+def cmd_eval(args) -> None:
+    import torch
+
+    from app.ai.nlp_student import load_student, predict_batch
+    from app.ai.nlp_zero_shot import _load
+
+    torch.set_num_threads(args.threads)
+    rows = [r for r in read_labels(args.labels) if is_holdout(r["id"], args.holdout)] or read_labels(args.labels)
+    report = {"holdout_rows": len(rows), "threads": args.threads, "student_dir": str(args.student)}
+
+    variants = {"student": load_student(args.student)}
+    if args.int8:
+        variants["student_int8"] = load_student(args.student, quantize=True)
+    for name, student in variants.items():
+        report[name] = {"agreement": _agreement(student, rows)}
+
+    texts = [r["text"] for r in random.Random(args.seed).sample(rows, min(args.latency_sample, len(rows)))]
+    zs = _load()
+    report["teacher"] = {"latency": _latency(lambda t: (zs(t, CATEGORIES), zs(t, URGENCY)), texts)}
+    for name, student in variants.items():
+        lat = _latency(lambda t: predict_batch([t], student=student), texts)
+        report[name]["latency"] = lat
+        report[name]["speedup_p50"] = round(report["teacher"]["latency"]["p50_ms"] / max(lat["p50_ms"], 1e-6), 1)
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main():
+    p = argparse.ArgumentParser(description="Distill the zero-shot XLM-R classifier into a small student.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("label", help="label complaint history with the teacher")
+    sp.add_argument("--out", type=Path, default=DEFAULT_LABELS)
+    sp.add_argument("--limit", type=int, default=None)
+    sp.add_argument("--batch-size", type=int, default=16)
+    sp.set_defaults(fn=cmd_label)
+
+    sp = sub.add_parser("train", help="train the student on teacher labels")
+    sp.add_argument("--labels", type=Path, default=DEFAULT_LABELS)
+    sp.add_argument("--out", type=Path, default=settings.NLP_STUDENT_DIR)
+    sp.add_argument("--base", default=None, help="энкодер студента (HF id)")
+    sp.add_argument("--epochs", type=int, default=4)
+    sp.add_argument("--batch-size", type=int, default=32)
+    sp.add_argument("--lr", type=float, default=5e-5)
+    sp.add_argument("--temperature", type=float, default=2.0)
+    sp.add_argument("--alpha", type=float, default=0.7, help="вес KL к мягким меткам (остальное — CE к top-1)")
+    sp.add_argument("--holdout", type=float, default=0.1)
+    sp.add_argument("--seed", type=int, default=42)
+    sp.set_defaults(fn=cmd_train)
+
+    sp = sub.add_parser("eval", help="agreement and CPU latency: student vs teacher")
+    sp.add_argument("--labels", type=Path, default=DEFAULT_LABELS)
+    sp.add_argument("--student", type=Path, default=settings.NLP_STUDENT_DIR)
+    sp.add_argument("--holdout", type=float, default=0.1)
+    sp.add_argument("--latency-sample", type=int, default=100)
+    sp.add_argument("--threads", type=int, default=4)
+    sp.add_argument("--int8", action="store_true", help="также оценить int8-квантованного студента")
+    sp.add_argument("--seed", type=int, default=42)
+    sp.add_argument("--report", type=Path, default=None)
+    sp.set_defaults(fn=cmd_eval)
+
+    args = p.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# backend/reprocess.py
+"""
+Пересчёт уже сохранённых жалоб после смены моделей/правил
+(LABELS, CATEGORIES, порог CLIP, маршрутизация, приоритет).
+
+Примеры:
+  python reprocess.py --stages routing,priority --dry-run --report data/reprocess_diff.ndjson
+  python reprocess.py --stages cv,nlp,routing --workers 2 --chunk-size 100   # 2 копии моделей в памяти
+  python reprocess.py --stages all --reset      # начать заново, игнорируя checkpoint
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from app.db import SessionLocal, engine
+from app.migrations import upgrade_schema
+from app.services.reprocess import ReprocessOptions, parse_stages, reprocess
+from app.settings import settings
+
+
+def main():
+    p = argparse.ArgumentParser(description="Reprocess stored complaints with current models/rules.")
+    p.add_argument("--stages", default="all", help="cv,nlp,routing,dedup,priority или all")
+    p.add_argument("--chunk-size", type=int, default=200)
+    p.add_argument("--workers", type=int, default=1, help="процессов для CV/NLP; каждый грузит свои модели (несколько ГБ)")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--dry-run", action="store_true", help="не писать в БД, только отчёт")
+    p.add_argument("--report", type=Path, default=None, help="NDJSON с диффом по жалобам")
+    p.add_argument("--checkpoint", type=Path, default=settings.DATA_DIR / "reprocess.checkpoint.json")
+    p.add_argument("--reset", action="store_true", help="удалить checkpoint и начать сначала")
+    args = p.parse_args()
+
+    if args.reset and args.checkpoint.exists():
+        args.checkpoint.unlink()
+
+    opts = ReprocessOptions(
+        stages=parse_stages(args.stages),
+        chunk_size=max(1, args.chunk_size),
+        workers=max(1, args.workers),
+        dry_run=args.dry_run,
+        # в dry-run checkpoint не двигаем, но и не игнорируем
+        checkpoint_path=args.checkpoint,
+        report_path=args.report,
+        limit=args.limit,
+    )
+
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        report = reprocess(db, opts)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        db.close()
+
+    print(json.dumps({"stages": list(opts.stages), "dry_run": opts.dry_run, **report.to_dict()}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# backend/serve.py
+"""
+Продакшн-запуск с несколькими воркерами и общими весами моделей.
+
+  python serve.py --workers 4 --port 8000
+  WORKERS=4 TORCH_THREADS=2 python serve.py
+
+uvicorn --workers N запускает N независимых процессов, и каждый грузит свои CLIP и XLM-R
+(гигабайты на воркер). Здесь master импортирует приложение, один раз грузит и
+«замораживает» модели (eval, requires_grad=False, gc.freeze), открывает сокет и
+делает fork() воркеров. Веса остаются общими страницами (copy-on-write), т.к. их
+никто не пишет.
+
+- потоки torch на воркер: intra = cpu_count // workers (или --torch-threads), inter = 1 —
+  N воркеров не дерутся за одни и те же ядра
+- master не делает инференс до fork: пулы потоков OpenMP после fork не наследуются
+- фоновые циклы (пересчёт приоритетов, outbox, акимат) — только в воркере 0,
+  live-лента (SSE) — в каждом; версии для условных GET — в БД (http_cache)
+- упавший воркер перезапускается; SIGTERM/SIGINT — мягкая остановка всех
+- метрики /metrics — по воркеру, который ответил на запрос
+- X-Forwarded-For принимается только от FORWARDED_ALLOW_IPS (по умолчанию 127.0.0.1)
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def _threads_per_worker(workers: int, requested: int | None) -> int:
+    if requested:
+        return requested
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _preload() -> list[str]:
+    """
+    Грузит модели в master. Возвращает имена загруженных (пусто в режиме заглушек).
+    """
+    from app.settings import settings
+
+    if settings.AI_STUB_MODELS:
+        return []
+
+    import torch
+
+    from app.ai import cv_clip, embeddings, nlp_zero_shot
+
+    models = {"clip": cv_clip._load()[0]}
+    embeddings._load_clip()  # на CPU — та же модель, что у cv_clip
+    if settings.NLP_BACKEND == "student":
+        from app.ai import nlp_student
+
+        models["nlp_student"] = nlp_student._load()[0]
+    else:
+        models["nlp"] = nlp_zero_shot._load().model
+
+    torch.set_grad_enabled(False)
+    for model in models.values():
+        model.eval()
+        for p in model.parameters():
+            p.requires_grad_(False)
+    return list(models)
+
+
+def _run_worker(index: int, sock: socket.socket, args, threads: int, with_torch: bool) -> None:
+    # Соединения из пула master не переиспользуем: у каждого процесса свои
+    from app.db import engine
+
+    engine.dispose(close=False)
+
+    if with_torch:
+        import torch
+
+        torch.set_num_threads(threads)
+
+    import uvicorn
+
+    from app.main import app
+    from app.settings import settings
+
+    app.state.run_background = index == 0
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+        timeout_keep_alive=5,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    p = argparse.ArgumentParser(description="Pre-fork server: load models once, fork workers sharing them.")
+    p.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    p.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    p.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")))
+    p.add_argument("--torch-threads", type=int, default=int(os.getenv("TORCH_THREADS", "0")),
+                   help="intra-op потоков на воркер (0 = cpu_count // workers)")
+    p.add_argument("--graceful-timeout", type=float, default=30.0)
+    p.add_argument("--log-level", default="info")
+    args = p.parse_args()
+
+    workers_n = max(1, args.workers)
+    threads = _threads_per_worker(workers_n, args.torch_threads)
+    # До импорта torch: OpenMP/MKL читают переменные при инициализации
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from app.main import app  # noqa: F401 — импорт приложения и create_all до fork
+
+    t0 = time.perf_counter()
+    loaded = _preload()
+    if loaded:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    print(f"[master {os.getpid()}] models {loaded or 'stubbed'} loaded in {time.perf_counter() - t0:.1f}s; "
+          f"{workers_n} workers x {threads} torch threads", flush=True)
+
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    sock.set_inheritable(True)
+
+    # Всё, что создано до сих пор, — в постоянное поколение: сборщик мусора в воркерах
+    # не трогает эти объекты, и их страницы не копируются
+    gc.collect()
+    gc.freeze()
+
+    workers: dict[int, int] = {}  # pid → номер воркера
+    state = {"stopping": False, "deadline": 0.0}
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                _run_worker(index, sock, args, threads, bool(loaded))
+            except BaseException as e:  # noqa: BLE001 — воркер должен завершиться, а не вернуться в цикл master
+                print(f"[worker {index}] crashed: {e!r}", file=sys.stderr, flush=True)
+                code = 1
+            finally:
+                os._exit(code)
+        workers[pid] = index
+        print(f"[master] worker {index} started, pid {pid}", flush=True)
+
+    def stop(signum, frame) -> None:
+        if state["stopping"]:
+            return
+        state["stopping"] = True
+        state["deadline"] = time.monotonic() + args.graceful_timeout
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for i in range(workers_n):
+        spawn(i)
+
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if state["stopping"] and time.monotonic() > state["deadline"]:
+                for pid in list(workers):
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            time.sleep(0.2)
+            continue
+        index = workers.pop(pid, None)
+        if index is None or state["stopping"]:
+            continue
+        print(f"[master] worker {index} (pid {pid}) exited with {os.waitstatus_to_exitcode(status)}, restarting",
+              file=sys.stderr, flush=True)
+        time.sleep(1.0)
+        spawn(index)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
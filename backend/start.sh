@@ -1 +1 @@
-uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000}
+python serve.py --host 0.0.0.0 --port ${PORT:-8000} --workers ${WORKERS:-1}
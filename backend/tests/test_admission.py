@@ -0,0 +1,71 @@
+# backend/tests/test_admission.py
+import pytest
+
+from app.main import app
+from app.utils.admission import InferenceGuard, MemoryBuckets, SqliteBuckets, inference_gate
+from app.utils.metrics import ADMISSION_REJECTED
+
+PER_MIN = 1 / 60.0
+LIMITS = {"device": (PER_MIN, 2.0), "ip": (10 * PER_MIN, 3.0)}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteBuckets(tmp_path / "rl.db", LIMITS)
+    return MemoryBuckets(LIMITS)
+
+
+def test_rejected_device_does_not_charge_ip(buckets):
+    keys = ["ip:1.2.3.4", "device:a"]
+    assert buckets.take(keys, now=0.0) == (0.0, None)
+    assert buckets.take(keys, now=0.0) == (0.0, None)
+    for _ in range(5):
+        wait, key = buckets.take(keys, now=0.0)
+        assert key == "device:a" and wait == pytest.approx(60.0)
+
+    # IP-ведро потратило 2 из 3 токенов: другое устройство за тем же NAT проходит
+    assert buckets.take(["ip:1.2.3.4", "device:b"], now=0.0) == (0.0, None)
+    wait, key = buckets.take(["ip:1.2.3.4", "device:c"], now=0.0)
+    assert key == "ip:1.2.3.4" and wait == pytest.approx(6.0)
+
+
+def test_buckets_refill(buckets):
+    keys = ["device:a"]
+    buckets.take(keys, now=0.0)
+    buckets.take(keys, now=0.0)
+    assert buckets.take(keys, now=30.0)[1] == "device:a"
+    assert buckets.take(keys, now=61.0) == (0.0, None)
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    (g,) = [m.kwargs["dispatch"] for m in app.user_middleware if isinstance(m.kwargs.get("dispatch"), InferenceGuard)]
+    monkeypatch.setattr(g, "buckets", MemoryBuckets(LIMITS))
+    return g
+
+
+def test_rate_limited_upload_gets_429(guard, client, post_complaint):
+    before = ADMISSION_REJECTED.values().get(("device",), 0.0)
+    device = {"X-Device-Id": "phone-1"}
+    assert post_complaint(headers=device).status_code == 200
+    assert post_complaint(headers=device).status_code == 200
+
+    r = post_complaint(headers=device)
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "60"
+    assert ADMISSION_REJECTED.values()[("device",)] == before + 1
+
+    # другое устройство с того же адреса — проходит, пока не кончится IP-ведро
+    assert post_complaint(headers={"X-Device-Id": "phone-2"}).status_code == 200
+    assert post_complaint(headers={"X-Device-Id": "phone-3"}).status_code == 429
+    assert client.get("/complaints", params={"limit": 1}).status_code == 200  # чтения лимит не трогает
+
+
+def test_overload_sheds_with_503(post_complaint, monkeypatch):
+    # ожидание в очереди: (1000 принятых - слоты) × 10 с / слоты — больше SLO
+    monkeypatch.setattr(inference_gate, "admitted", 1000)
+    monkeypatch.setattr(inference_gate, "service_s", 10.0)
+    r = post_complaint()
+    assert r.status_code == 503
+    assert int(r.headers["Retry-After"]) >= 1
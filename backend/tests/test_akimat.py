@@ -0,0 +1,88 @@
+# backend/tests/test_akimat.py
+import json
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Complaint
+from app.services.akimat import MIN_TEXT_LEN, _text_ok, _text_ok_sql
+
+
+def _etag(client, path="/complaints"):
+    return client.get(path).headers["ETag"]
+
+
+def _eligible(db, post_complaint) -> str:
+    # seed 1 — релевантное фото у заглушки CV; приоритет у заглушек LOW — поднимаем до гейта
+    cid = post_complaint(seed=1).json()["id"]
+    db.get(Complaint, cid).priority_level = "MEDIUM"
+    db.commit()
+    return cid
+
+
+def test_payload_get_is_read_only(client, db, post_complaint):
+    cid = post_complaint().json()["id"]
+    before = db.get(Complaint, cid)
+    updated_at, version = before.updated_at, before.payload_version
+    assert before.akimat_payload is None
+    etag = _etag(client)
+
+    r = client.get(f"/admin/akimat/payload/{cid}")
+    assert r.status_code == 200 and r.json()["complaint_id"] == cid
+
+    db.expire_all()
+    c = db.get(Complaint, cid)
+    assert c.akimat_payload is None  # GET не пишет кэш
+    assert (c.updated_at, c.payload_version) == (updated_at, version)
+    assert client.get("/complaints", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_prepare_stores_payload_without_touching_sync(client, db, post_complaint):
+    cid = _eligible(db, post_complaint)
+    updated_at = db.get(Complaint, cid).updated_at
+    etag = _etag(client)
+
+    r = client.post(f"/admin/akimat/prepare/{cid}")
+    assert r.status_code == 200 and r.json()["ok"] is True
+
+    db.expire_all()
+    c = db.get(Complaint, cid)
+    assert c.akimat_payload_version == c.payload_version
+    assert json.loads(c.akimat_payload) == r.json()["payload"]
+    assert c.updated_at == updated_at  # не всплывает в /complaints/changes
+    assert client.get("/complaints", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/admin/akimat/payload/{cid}").content == c.akimat_payload.encode("utf-8")
+
+
+def test_stale_payload_is_rebuilt_on_read_not_stored(client, db, post_complaint):
+    cid = _eligible(db, post_complaint)
+    assert client.post(f"/admin/akimat/prepare/{cid}").json()["ok"] is True
+    stored = db.get(Complaint, cid).akimat_payload
+    assert client.patch(f"/complaints/{cid}", json={"status": "IN_PROGRESS"}).status_code == 200
+
+    assert client.get(f"/admin/akimat/payload/{cid}").json()["status"] == "IN_PROGRESS"
+    db.expire_all()
+    c = db.get(Complaint, cid)
+    assert c.akimat_payload == stored
+    assert c.akimat_payload_version < c.payload_version
+
+
+@pytest.mark.parametrize("text", [
+    "а" * MIN_TEXT_LEN,
+    "а" * (MIN_TEXT_LEN - 1),
+    "  " + "а" * (MIN_TEXT_LEN - 1) + "  ",
+    "\n\t" + "а" * (MIN_TEXT_LEN - 1) + "\r\n",
+    "\u00a0" + "а" * (MIN_TEXT_LEN - 2) + "\u00a0\u00a0",
+    " \t\n\v\f" * 10,
+    "\n" + "а б " * 6 + "\n",
+    "",
+    None,
+])
+def test_text_gate_same_in_python_and_sql(db, text):
+    # одна и та же строка: проверка по одной жалобе и WHERE массового отбора
+    cid = f"gate-{uuid.uuid4().hex[:8]}"
+    db.add(Complaint(id=cid, text=text))
+    db.commit()
+    in_sql = db.execute(select(Complaint.id).where(Complaint.id == cid, _text_ok_sql())).first() is not None
+    assert in_sql == _text_ok(db.get(Complaint, cid).text)
@@ -0,0 +1,140 @@
+# backend/tests/test_akimat_dispatch.py
+import dataclasses
+import threading
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.db import SessionLocal
+from app.models import AkimatSubmission, Complaint
+from app.services import akimat_dispatch
+from app.services.akimat_dispatch import drain_submissions, enqueue_many, enqueue_submission
+from app.settings import settings
+
+from conftest import make_due
+
+
+@pytest.fixture
+def akimat_down(monkeypatch, tmp_path):
+    def post_batch(rows):
+        raise OSError("connection refused")
+
+    live = dataclasses.replace(settings, AKIMAT_ENDPOINT="http://akimat.invalid", EXPORTS_DIR=tmp_path)
+    monkeypatch.setattr(akimat_dispatch, "settings", live)
+    monkeypatch.setattr(akimat_dispatch, "_post_batch", post_batch)
+    return monkeypatch
+
+
+def _complaint(db) -> Complaint:
+    c = Complaint(id=str(uuid.uuid4()), text="", created_at=datetime.utcnow())
+    db.add(c)
+    db.commit()
+    return c
+
+
+def test_akimat_submission_dead_then_requeued(db, akimat_down, tmp_path):
+    c = _complaint(db)
+    sub = enqueue_submission(db, c, '{"id":1}')
+    db.commit()
+    assert enqueue_submission(db, c, '{"id":1}').id == sub.id  # тот же payload — та же строка
+    db.commit()
+
+    for attempt in range(1, settings.AKIMAT_MAX_ATTEMPTS + 1):
+        make_due(db, AkimatSubmission, sub.id)
+        drain_submissions(db)
+        db.refresh(sub)
+        assert sub.attempts == attempt
+        assert sub.last_error == "connection refused"
+    assert sub.status == "DEAD"
+    db.refresh(c)
+    assert c.akimat_status == "FAILED"
+    assert len(list(tmp_path.glob("*.ndjson"))) == 1  # ретраи не дублируют экспорт
+
+    # повторная постановка того же payload — ручной ретрай с нуля
+    akimat_down.undo()
+    again = enqueue_submission(db, c, '{"id":1}')
+    db.commit()
+    assert again.id == sub.id
+    assert (again.status, again.attempts, again.last_error) == ("PENDING", 0, None)
+    assert c.akimat_status == "QUEUED"
+    assert db.query(AkimatSubmission).filter(AkimatSubmission.complaint_id == c.id).count() == 1
+
+
+def test_akimat_rejected_batch_is_dead_immediately(db, akimat_down):
+    import urllib.error
+
+    def post_batch(rows):
+        raise urllib.error.HTTPError("http://akimat.invalid", 400, "Bad Request", {}, None)
+
+    akimat_down.setattr(akimat_dispatch, "_post_batch", post_batch)
+    c = _complaint(db)
+    sub = enqueue_submission(db, c, '{"id":2}')
+    db.commit()
+    make_due(db, AkimatSubmission, sub.id)
+    drain_submissions(db)
+    db.refresh(sub)
+    assert (sub.status, sub.attempts, sub.last_error) == ("DEAD", 1, "HTTP 400")
+
+
+def _subs(db, *complaints):
+    return db.query(AkimatSubmission).filter(AkimatSubmission.complaint_id.in_([c.id for c in complaints])).all()
+
+
+def test_enqueue_many_skips_queued_payloads(db):
+    a, b = _complaint(db), _complaint(db)
+    items = [(a.id, '{"n":1}'), (b.id, '{"n":2}'), (a.id, '{"n":1}')]  # повтор внутри одной пачки
+    assert enqueue_many(db, items) == {"queued": 2, "existing": 1}
+    db.commit()
+    assert enqueue_many(db, items[:2]) == {"queued": 0, "existing": 2}
+    db.commit()
+    assert len(_subs(db, a, b)) == 2
+
+    # новый payload той же жалобы (она изменилась) — новая строка
+    assert enqueue_many(db, [(a.id, '{"n":3}')])["queued"] == 1
+    db.commit()
+    assert len(_subs(db, a, b)) == 3
+
+
+def test_enqueue_many_revives_dead_rows(db):
+    a, b = _complaint(db), _complaint(db)
+    enqueue_many(db, [(a.id, '{"n":1}'), (b.id, '{"n":2}')])
+    db.commit()
+    (dead,) = _subs(db, a)
+    dead.status, dead.attempts, dead.last_error = "DEAD", settings.AKIMAT_MAX_ATTEMPTS, "HTTP 400"
+    dead.claim_token, dead.locked_until = "stale", datetime.utcnow()
+    a.akimat_status = "FAILED"
+    db.commit()
+
+    assert enqueue_many(db, [(a.id, '{"n":1}'), (b.id, '{"n":2}')]) == {"queued": 0, "existing": 2}
+    db.commit()
+    db.expire_all()
+    row = db.get(AkimatSubmission, dead.id)
+    assert (row.status, row.attempts, row.last_error) == ("PENDING", 0, None)
+    assert row.claim_token is None and row.locked_until is None
+    assert row.next_attempt_at <= datetime.utcnow()
+    assert db.get(Complaint, a.id).akimat_status == "QUEUED"
+
+
+def test_parallel_enqueue_of_one_payload_keeps_one_row(db):
+    c = _complaint(db)
+    errors, barrier = [], threading.Barrier(6)
+
+    def one():
+        s = SessionLocal()
+        try:
+            barrier.wait()
+            enqueue_submission(s, s.get(Complaint, c.id), '{"same":true}')
+            s.commit()
+        except Exception as e:  # noqa: BLE001 — проверяем, что их нет
+            errors.append(e)
+        finally:
+            s.close()
+
+    threads = [threading.Thread(target=one) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(_subs(db, c)) == 1
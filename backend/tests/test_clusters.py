@@ -0,0 +1,32 @@
+# backend/tests/test_clusters.py
+from datetime import datetime
+
+from app.models import Complaint, DuplicateCluster
+from app.services.clusters import assign_cluster
+
+
+def _add(db, cid: str, lat: float, lng: float) -> None:
+    a = assign_cluster(db, complaint_id=cid, lat=lat, lng=lng, radius_m=250)
+    db.add(Complaint(
+        id=cid, text="", lat=lat, lng=lng, created_at=datetime.utcnow(),
+        duplicate_group_id=a.group_id, duplicate_of=a.duplicate_of, duplicates_count=a.duplicates_count,
+    ))
+    db.commit()
+
+
+def test_union_updates_absorbed_members(db):
+    # два кластера в ~400 м, жалоба посередине их сливает
+    _add(db, "u-a1", 43.0, 70.0)
+    _add(db, "u-a2", 43.0, 70.0)
+    _add(db, "u-b1", 43.0036, 70.0)
+    _add(db, "u-b2", 43.0036, 70.0)
+    _add(db, "u-m", 43.0018, 70.0)
+
+    db.expire_all()
+    rows = {c.id: c for c in db.query(Complaint).filter(Complaint.id.like("u-%"))}
+    assert {c.duplicate_group_id for c in rows.values()} == {"u-a1"}
+    assert rows["u-a1"].duplicate_of is None
+    assert {c.duplicate_of for k, c in rows.items() if k != "u-a1"} == {"u-a1"}
+    assert {c.duplicates_count for c in rows.values()} == {4}
+    assert db.get(DuplicateCluster, "u-a1").member_count == 5
+    assert db.get(DuplicateCluster, "u-b1").parent_id == "u-a1"
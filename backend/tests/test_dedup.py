@@ -0,0 +1,54 @@
+# backend/tests/test_dedup.py
+import asyncio
+import random
+
+import httpx
+from sqlalchemy import func
+
+from app.main import app
+from app.models import Complaint, DuplicateCluster
+from app.services.duplicate import haversine_m
+
+from conftest import _created, complaint_form, photo
+
+
+def test_concurrent_uploads_at_one_spot_form_one_cluster(db):
+    # как bench.py dedup: все загрузки идут одновременно, каждая видит кластер остальных только после их коммита
+    n = 24
+    lat0, lng0 = 42.1, 69.4
+    rnd = random.Random(7)
+    jitter = 20 / 111_320.0
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            async def one(i: int):
+                form = complaint_form(
+                    f"Переполнен контейнер во дворе, мусор вокруг, жалоба {i}",
+                    lat0 + rnd.uniform(-jitter, jitter),
+                    lng0 + rnd.uniform(-jitter, jitter),
+                )
+                return await client.post("/complaints", data=form, files=photo(1000 + i))
+
+            return await asyncio.gather(*(one(i) for i in range(n)))
+
+    responses = asyncio.run(main())
+    assert [r.status_code for r in responses] == [200] * n
+    ids = [r.json()["id"] for r in responses]
+    _created.extend(ids)
+
+    roots = [
+        c for c in db.query(DuplicateCluster).filter(DuplicateCluster.parent_id.is_(None))
+        if haversine_m(lat0, lng0, c.centroid_lat, c.centroid_lng) < 100
+    ]
+    assert len(roots) == 1
+    assert roots[0].member_count == n
+
+    groups = dict(
+        db.query(Complaint.duplicate_group_id, func.count(Complaint.id))
+        .filter(Complaint.id.in_(ids))
+        .group_by(Complaint.duplicate_group_id)
+        .all()
+    )
+    assert groups == {roots[0].id: n}
+    assert db.get(Complaint, roots[0].id).duplicates_count == n - 1
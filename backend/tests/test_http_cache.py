@@ -0,0 +1,79 @@
+# backend/tests/test_http_cache.py
+import subprocess
+import sys
+import time
+
+from app.db import DATABASE_URL
+from app.services.sync import delete_complaints
+
+
+def _etag(client, path="/complaints"):
+    r = client.get(path)
+    assert r.status_code == 200
+    return r.headers["ETag"]
+
+
+def _status(client, etag, path="/complaints"):
+    return client.get(path, headers={"If-None-Match": etag}).status_code
+
+
+def test_not_modified_until_a_write(client, post_complaint):
+    post_complaint()
+    etag = _etag(client)
+    assert _status(client, etag) == 304
+
+    post_complaint()
+    assert _status(client, etag) == 200
+    etag = _etag(client)
+
+    cid = client.get("/complaints", params={"limit": 1}).json()[0]["id"]
+    client.patch(f"/complaints/{cid}", json={"status": "IN_PROGRESS"})
+    assert _status(client, etag) == 200
+
+
+def test_route_depends_only_on_its_tables(client, post_complaint):
+    post_complaint()
+    etag = _etag(client, "/clusters")
+    cid = client.get("/complaints", params={"limit": 1}).json()[0]["id"]
+    client.patch(f"/complaints/{cid}", json={"status": "IN_PROGRESS"})
+    assert _status(client, etag, "/clusters") == 304
+
+    post_complaint()  # новая точка — новый кластер
+    assert _status(client, etag, "/clusters") == 200
+
+
+def test_write_from_another_process_invalidates(client, post_complaint):
+    # как CLI reprocess/archive или другой воркер: счётчик ведут триггеры в БД, а не процесс API
+    cid = post_complaint().json()["id"]
+    etag = _etag(client)
+    path = DATABASE_URL[len("sqlite:///"):]
+    code = (
+        "import sqlite3, sys; c = sqlite3.connect(sys.argv[1]);"
+        " c.execute(\"UPDATE complaints SET status = 'DONE' WHERE id = ?\", (sys.argv[2],)); c.commit()"
+    )
+    subprocess.run([sys.executable, "-c", code, path, cid], check=True)
+    assert _status(client, etag) == 200
+
+
+def test_if_modified_since(client, post_complaint):
+    post_complaint()
+    time.sleep(1.1)  # изменение в текущей секунде: Last-Modified ещё в будущем и не отдаётся
+    lm = client.get("/stats/summary").headers["Last-Modified"]
+    assert client.get("/stats/summary", headers={"If-Modified-Since": lm}).status_code == 304
+
+    post_complaint()
+    assert client.get("/stats/summary", headers={"If-Modified-Since": lm}).status_code == 200
+
+
+def test_no_304_for_unknown_or_deleted_id(client, db, post_complaint):
+    cid = post_complaint().json()["id"]
+    path = f"/admin/akimat/payload/{cid}"
+    r = client.get(path)
+    assert r.status_code == 200
+    stale = {"If-None-Match": r.headers.get("ETag", "*"), "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+
+    assert client.get("/admin/akimat/payload/missing", headers=stale).status_code == 404
+    assert client.get("/admin/akimat/payload/missing", headers={"If-None-Match": "*"}).status_code == 404
+    delete_complaints(db, [cid])
+    db.commit()
+    assert client.get(path, headers=stale).status_code == 404
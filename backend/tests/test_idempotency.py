@@ -0,0 +1,54 @@
+# backend/tests/test_idempotency.py
+import uuid
+
+from fastapi import HTTPException
+
+from app.models import Complaint, IdempotencyKey
+from app.utils.admission import inference_gate
+
+from conftest import complaint_form
+
+
+def _key() -> dict:
+    return {"Idempotency-Key": uuid.uuid4().hex}
+
+
+def test_replay_returns_first_complaint(db, post_complaint):
+    key, form = _key(), complaint_form()
+    first = post_complaint(form=form, seed=1, headers=key)
+    again = post_complaint(form=form, seed=1, headers=key)
+
+    assert first.status_code == again.status_code == 200
+    assert again.json()["id"] == first.json()["id"]
+    assert again.headers.get("Idempotent-Replayed") == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert db.query(Complaint).filter(Complaint.text == form["text"]).count() == 1
+    assert db.get(IdempotencyKey, key["Idempotency-Key"]).status == "DONE"
+
+
+def test_same_key_with_different_body_is_rejected(post_complaint):
+    key, form = _key(), complaint_form()
+    assert post_complaint(form=form, seed=2, headers=key).status_code == 200
+
+    assert post_complaint(form=form, seed=3, headers=key).status_code == 422  # другое фото
+    assert post_complaint(form={**form, "text": "другой текст"}, seed=2, headers=key).status_code == 422
+
+
+def test_rejected_request_releases_key(db, post_complaint, monkeypatch):
+    async def busy(call):
+        raise HTTPException(status_code=503, detail="Server is busy, retry later")
+
+    key, form = _key(), complaint_form()
+    monkeypatch.setattr(inference_gate, "run", busy)
+    assert post_complaint(form=form, seed=5, headers=key).status_code == 503
+    assert db.get(IdempotencyKey, key["Idempotency-Key"]) is None
+
+    monkeypatch.undo()
+    retry = post_complaint(form=form, seed=5, headers=key)
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+
+
+def test_key_too_long(post_complaint):
+    r = post_complaint(headers={"Idempotency-Key": "k" * 256})
+    assert r.status_code == 400
@@ -0,0 +1,22 @@
+# backend/tests/test_listing.py
+from app.models import Complaint
+from app.schemas import ComplaintOut
+
+
+def test_list_rows_match_complaint_out(client, db, post_complaint):
+    # быстрый путь списка обходит ComplaintOut — формат должен совпадать с ним
+    cid = post_complaint().json()["id"]
+    r = client.get("/complaints", params={"limit": 1})
+    assert r.status_code == 200 and r.headers["content-type"] == "application/json"
+    (row,) = r.json()
+    assert row["id"] == cid
+
+    expected = ComplaintOut.model_validate(db.get(Complaint, cid)).model_dump(mode="json")
+    assert row == expected
+
+
+def test_list_order_and_paging(client, post_complaint):
+    ids = [post_complaint().json()["id"] for _ in range(3)]
+    newest = [c["id"] for c in client.get("/complaints", params={"limit": 3}).json()]
+    assert newest == ids[::-1]
+    assert [c["id"] for c in client.get("/complaints", params={"limit": 2, "offset": 1}).json()] == newest[1:]
@@ -0,0 +1,78 @@
+# backend/tests/test_notifications.py
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models import NotificationOutbox
+from app.services.notifications import CHANNELS, drain_outbox, enqueue_notification, register_channel
+from app.settings import settings
+
+from conftest import make_due, photo
+
+
+@pytest.fixture
+def flaky_channel():
+    calls = {"fail": True, "sent": []}
+
+    def channel(recipient, events):
+        if calls["fail"]:
+            raise RuntimeError("smtp down")
+        calls["sent"].append((recipient, events))
+
+    register_channel("flaky", channel)
+    yield calls
+    CHANNELS.pop("flaky", None)
+
+
+def _notification(db) -> NotificationOutbox:
+    recipient = f"r-{uuid.uuid4().hex[:8]}"
+    enqueue_notification(db, "complaint_updated", {"id": recipient}, recipient=recipient, channels=("flaky",))
+    db.commit()
+    return db.query(NotificationOutbox).filter(NotificationOutbox.recipient == recipient).one()
+
+
+def test_notification_retries_with_backoff_then_sends(db, flaky_channel):
+    row = _notification(db)
+
+    drain_outbox(db)
+    db.refresh(row)
+    assert (row.status, row.attempts, row.last_error) == ("PENDING", 1, "smtp down")
+    assert row.next_attempt_at > datetime.utcnow()  # backoff: сразу не берётся снова
+    drain_outbox(db)
+    db.refresh(row)
+    assert row.attempts == 1
+
+    flaky_channel["fail"] = False
+    make_due(db, NotificationOutbox, row.id)
+    drain_outbox(db)
+    db.refresh(row)
+    assert (row.status, row.attempts) == ("SENT", 2)
+    assert [r for r, _ in flaky_channel["sent"]] == [row.recipient]
+
+
+def test_notification_goes_dead_after_max_attempts(db, flaky_channel):
+    row = _notification(db)
+    for attempt in range(1, settings.NOTIFY_MAX_ATTEMPTS + 1):
+        make_due(db, NotificationOutbox, row.id)
+        drain_outbox(db)
+        db.refresh(row)
+        assert row.attempts == attempt
+    assert row.status == "DEAD"
+    assert row.claim_token is None and row.locked_until is None
+
+    make_due(db, NotificationOutbox, row.id)
+    drain_outbox(db)
+    db.refresh(row)
+    assert row.attempts == settings.NOTIFY_MAX_ATTEMPTS  # DEAD больше не берётся
+
+
+def test_after_photo_saves_file_and_notifies(client, db, post_complaint):
+    cid = post_complaint().json()["id"]
+    r = client.post(f"/complaints/{cid}/after_photo", files=photo(7))
+    assert r.status_code == 200 and r.json()["after_image_path"]
+    q = db.query(NotificationOutbox).filter(
+        NotificationOutbox.event == "after_photo_uploaded", NotificationOutbox.payload.contains(cid)
+    )
+    assert q.count() > 0
+    assert client.post("/complaints/missing/after_photo", files=photo(7)).status_code == 404
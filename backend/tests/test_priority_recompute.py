@@ -0,0 +1,74 @@
+# backend/tests/test_priority_recompute.py
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Complaint, PriorityTransition
+from app.services.ingestion import score_complaint
+from app.services.priority_recompute import recompute_open_priorities
+
+
+def _complaint(db, urgency: str, confirmations: int = 1, status: str = "NEW") -> Complaint:
+    created = datetime.utcnow()
+    pr = score_complaint(urgency=urgency, is_relevant=True, created_at=created, confirmations=confirmations)
+    c = Complaint(
+        id=str(uuid.uuid4()), text="", created_at=created, status=status, nlp_urgency=urgency,
+        confirmations=confirmations, priority_score=pr.score, priority_level=pr.level,
+    )
+    db.add(c)
+    db.commit()
+    return c
+
+
+def _state(db, c: Complaint) -> tuple:
+    db.expire_all()
+    row = db.get(Complaint, c.id)
+    return row.priority_score, row.priority_level, row.payload_version, row.updated_at
+
+
+def _transitions(db, c: Complaint) -> list[tuple[str, str]]:
+    rows = db.query(PriorityTransition).filter(PriorityTransition.complaint_id == c.id).order_by(PriorityTransition.id)
+    return [(t.from_level, t.to_level) for t in rows]
+
+
+def test_waiting_promotes_level_and_records_transition(db):
+    c = _complaint(db, "HIGH", confirmations=6)  # 0.35 + 0.15 + 0.08 = 0.58
+    _, level, version, _ = _state(db, c)
+    assert level == "MEDIUM"
+
+    recompute_open_priorities(db, now=c.created_at + timedelta(days=7))
+    score, level, new_version, _ = _state(db, c)
+    assert (score, level) == (pytest.approx(0.78), "HIGH")
+    assert new_version == version + 1  # уровень — в payload акимата
+    assert _transitions(db, c) == [("MEDIUM", "HIGH")]
+
+    recompute_open_priorities(db, now=c.created_at + timedelta(days=8))  # ожидание уже упёрлось в 7 дней
+    assert _transitions(db, c) == [("MEDIUM", "HIGH")]
+
+
+def test_small_drift_is_not_written(db):
+    c = _complaint(db, "LOW")  # 0.175
+    before = _state(db, c)
+    recompute_open_priorities(db, now=c.created_at + timedelta(hours=6))  # +0.007
+    assert _state(db, c) == before
+    assert _transitions(db, c) == []
+
+
+def test_drift_past_step_updates_score_but_not_payload(db):
+    c = _complaint(db, "LOW")
+    score, level, version, updated_at = _state(db, c)
+    recompute_open_priorities(db, now=c.created_at + timedelta(days=3))  # +0.086, всё ещё LOW
+    new_score, new_level, new_version, new_updated_at = _state(db, c)
+    assert new_score == pytest.approx(score + 0.2 * 3 / 7, abs=1e-3)
+    assert new_level == level == "LOW"
+    assert new_version == version
+    assert new_updated_at > updated_at  # строка переписана — delta-sync её отдаст
+    assert _transitions(db, c) == []
+
+
+def test_closed_complaints_are_left_alone(db):
+    c = _complaint(db, "HIGH", confirmations=6, status="DONE")
+    before = _state(db, c)
+    recompute_open_priorities(db, now=c.created_at + timedelta(days=7))
+    assert _state(db, c) == before
@@ -0,0 +1,66 @@
+# backend/tests/test_search.py
+import pytest
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.models import Complaint
+from app.services.archive import archive_closed, restore_complaints
+from app.services.search import query_terms
+
+
+def _ids(client, q: str, **params) -> list[str]:
+    r = client.get("/complaints/search", params={"q": q, **params})
+    assert r.status_code == 200
+    return [hit["id"] for hit in r.json()]
+
+
+@pytest.fixture
+def docs(post_complaint):
+    ru = post_complaint("Не горят светильники на бульваре Кунаева, во дворе совсем темно").json()["id"]
+    kk = post_complaint("Шағын ауданында қоқыс жиналып қалды, контейнерлер толы").json()["id"]
+    return ru, kk
+
+
+@pytest.mark.parametrize("q", ["светильник", "Светильников", "бульвар кунаева", "ТЕМНО во дворах"])
+def test_russian_word_forms(client, docs, q):
+    assert docs[0] in _ids(client, q)
+
+
+@pytest.mark.parametrize("q", ["қоқыс", "кокыс", "ауданы", "контейнер"])
+def test_kazakh_forms_and_russian_layout(client, docs, q):
+    # "кокыс" — как пишут с русской раскладки; "ауданы" → аудан* находит "ауданында"
+    assert docs[1] in _ids(client, q)
+
+
+def test_all_terms_must_match(client, docs):
+    assert docs[0] not in _ids(client, "светильники қоқыс")
+    assert docs[0] in _ids(client, "светильники темно")
+
+
+def test_hit_has_snippet_and_rank(client, docs):
+    (hit,) = [h for h in client.get("/complaints/search", params={"q": "светильники"}).json() if h["id"] == docs[0]]
+    assert "<mark>светильники</mark>" in hit["snippet"]
+    assert hit["rank"] > 0
+
+
+def test_query_syntax_is_not_passed_to_fts(client):
+    assert client.get("/complaints/search", params={"q": 'светил* OR "x" NEAR('}).status_code == 200
+    assert query_terms("!!! ...") == []
+    assert client.get("/complaints/search", params={"q": "!!!"}).json() == []
+
+
+def test_archive_is_not_searched(client, db, post_complaint):
+    cid = post_complaint("Разбита остановка у рынка Самал, стекло валяется на тротуаре").json()["id"]
+    old = datetime.utcnow() - timedelta(days=365)
+    db.execute(update(Complaint).where(Complaint.id == cid).values(status="DONE", updated_at=old))
+    db.commit()
+    archive_closed(db, older_than_days=30)
+    assert cid not in _ids(client, "остановка самал")
+    r = client.get("/complaints/search", params={"q": "остановка самал", "include_archived": "true"})
+    assert r.status_code == 422
+
+    restore_complaints(db, [cid])
+    db.commit()
+    assert cid in _ids(client, "остановка самал")
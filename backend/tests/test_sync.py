@@ -0,0 +1,104 @@
+# backend/tests/test_sync.py
+import uuid
+
+import pytest
+
+from app.models import AkimatSubmission, Complaint, ComplaintTombstone, DuplicateCluster
+from app.services.akimat_dispatch import enqueue_submission
+
+from conftest import complaint_form
+
+
+def _drain(client, token=None, limit=1000):
+    """
+    Все страницы /complaints/changes от token. → (строки по порядку, удалённые id, последний token)
+    """
+    rows, deleted = [], []
+    while True:
+        params = {"limit": limit}
+        if token:
+            params["since"] = token
+        r = client.get("/complaints/changes", params=params)
+        assert r.status_code == 200
+        page = r.json()
+        cols = page["columns"]
+        rows += [dict(zip(cols, values)) for values in page["changed"]]
+        deleted += page["deleted"]
+        token = page["token"]
+        if not page["more"]:
+            return rows, deleted, token
+
+
+def test_snapshot_pages_cover_every_row_once(client, post_complaint):
+    ids = [post_complaint().json()["id"] for _ in range(5)]
+
+    rows, _, _ = _drain(client, limit=2)
+    seen = [r["id"] for r in rows]
+    assert len(seen) == len(set(seen))
+    assert set(ids) <= set(seen)
+    keys = [(r["updated_at"], r["id"]) for r in rows]
+    assert keys == sorted(keys)
+
+
+def test_changes_after_cursor_and_tombstones(client, post_complaint):
+    a, b = (post_complaint().json()["id"] for _ in range(2))
+    _, _, token = _drain(client)
+
+    assert _drain(client, token)[:2] == ([], [])
+
+    assert client.patch(f"/complaints/{a}", json={"status": "IN_PROGRESS"}).status_code == 200
+    assert client.delete(f"/admin/complaints/{b}").status_code == 200
+
+    rows, deleted, token = _drain(client, token, limit=1)
+    assert [r["id"] for r in rows] == [a]
+    assert rows[0]["status"] == "IN_PROGRESS"
+    assert deleted == [b]
+
+    assert _drain(client, token)[:2] == ([], [])
+
+
+def test_deleted_rows_leave_tombstone(client, db, post_complaint):
+    cid = post_complaint().json()["id"]
+    assert client.delete(f"/admin/complaints/{cid}").status_code == 200
+    tomb = db.get(ComplaintTombstone, cid)
+    assert tomb is not None and tomb.reason == "deleted"
+    assert client.delete(f"/admin/complaints/{cid}").status_code == 404
+
+
+def test_bad_token_is_rejected(client):
+    r = client.get("/complaints/changes", params={"since": "not-a-token"})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, 10_000_000])
+def test_limit_bounds(client, limit):
+    assert client.get("/complaints/changes", params={"limit": limit}).status_code == 422
+
+
+def test_replay_after_delete_is_gone(client, post_complaint):
+    key, form = {"Idempotency-Key": uuid.uuid4().hex}, complaint_form()
+    cid = post_complaint(form=form, seed=4, headers=key).json()["id"]
+    assert client.delete(f"/admin/complaints/{cid}").status_code == 200
+
+    assert post_complaint(form=form, seed=4, headers=key).status_code == 410
+
+
+def test_delete_leaves_group_and_cancels_submissions(client, db, post_complaint):
+    form = complaint_form()
+    a = post_complaint(form=form).json()
+    b = post_complaint(form={**form, "text": form["text"] + " и второй раз"}).json()
+    assert b["duplicate_group_id"] == a["id"]
+    c = db.get(Complaint, b["id"])
+    enqueue_submission(db, c, '{"id":"b"}')
+    db.commit()
+
+    assert client.delete(f"/admin/complaints/{b['id']}").status_code == 200
+    db.expire_all()
+    assert db.get(DuplicateCluster, a["id"]).member_count == 1
+    assert db.get(Complaint, a["id"]).duplicates_count == 0
+    sub = db.query(AkimatSubmission).filter(AkimatSubmission.complaint_id == b["id"]).one()
+    assert sub.status == "CANCELLED"
+
+    assert client.delete(f"/admin/complaints/{a['id']}").status_code == 200
+    db.expire_all()
+    assert db.get(DuplicateCluster, a["id"]) is None  # опустевший кластер удаляется
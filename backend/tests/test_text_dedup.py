@@ -0,0 +1,83 @@
+# backend/tests/test_text_dedup.py
+import asyncio
+import json
+
+import httpx
+
+from app.main import app
+from app.models import Complaint, DuplicateCluster
+from app.services.priority_recompute import refresh_duplicate_counts
+from app.services.reprocess import ReprocessOptions, reprocess
+from app.utils.admission import inference_gate
+
+from conftest import _created, complaint_form, photo
+
+
+def test_text_match_with_coords_keeps_geo_cluster(db, post_complaint):
+    text = "Не работает светофор на перекрёстке Байтурсынова и Жибек жолы, пробка с утра"
+    first = post_complaint(text, seed=4141).json()
+    second = post_complaint(text, seed=4141).json()  # другая точка (> радиуса), тот же текст
+
+    assert second["duplicate_group_id"] == second["id"]
+    assert second["text_duplicate_of"] == first["id"]
+    assert json.loads(second["duplicate_explain"])["decision"] == "text_link"
+    assert db.get(DuplicateCluster, second["id"]).member_count == 1
+    assert db.get(Complaint, first["id"]).duplicates_count == 0
+
+
+def test_refresh_keeps_text_only_group_counts(db, post_complaint):
+    text = "Огромная яма на дороге по улице Тауке хана у дома 77, машины объезжают по встречке"
+    # то же фото и текст: у заглушек CV/NLP тот же департамент (текстовый дубль ищется внутри него)
+    first = post_complaint(text, lat="", lng="", seed=4242).json()
+    second = post_complaint(text, lat="", lng="", seed=4242).json()
+    assert second["duplicate_group_id"] == first["id"]
+
+    refresh_duplicate_counts(db)
+    db.commit()
+    db.expire_all()
+    assert db.get(DuplicateCluster, first["id"]) is None
+    assert db.get(Complaint, first["id"]).duplicates_count == 1
+    assert db.get(Complaint, second["id"]).duplicates_count == 1
+
+
+def test_reprocess_keeps_text_only_group(db, post_complaint):
+    text = "Прорвало трубу возле остановки Самал, вода течёт по тротуару уже третий день подряд"
+    first = post_complaint(text, lat="", lng="", seed=4343).json()
+    second = post_complaint(text, lat="", lng="", seed=4343).json()
+    assert second["duplicate_group_id"] == first["id"]
+
+    report = reprocess(db, ReprocessOptions(stages=("dedup",)))
+    assert report.errors == 0
+
+    db.expire_all()
+    a, b = db.get(Complaint, first["id"]), db.get(Complaint, second["id"])
+    assert (b.duplicate_group_id, b.duplicate_of, b.text_duplicate_of) == (a.id, a.id, None)
+    assert a.duplicate_group_id == a.id
+    assert a.duplicates_count == b.duplicates_count == 1
+    assert json.loads(b.duplicate_explain)["decision"] == "text"
+
+
+def test_concurrent_text_duplicates_form_one_group(db, monkeypatch):
+    # без координат гео-замков нет: очередь даёт только замок текстового дедупа департамента
+    n = 8
+    monkeypatch.setattr(inference_gate, "_sem", None)  # семафор привязан к loop прошлого asyncio.run
+    text = "Прорвало трубу отопления в подвале дома 15 по Желтоксан, кипяток заливает подъезд"
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            form = complaint_form(text, lat="")
+            return await asyncio.gather(
+                *(client.post("/complaints", data=form, files=photo(4343)) for _ in range(n))
+            )
+
+    responses = asyncio.run(main())
+    assert [r.status_code for r in responses] == [200] * n
+    ids = [r.json()["id"] for r in responses]
+    _created.extend(ids)
+
+    groups = {c.duplicate_group_id for c in db.query(Complaint).filter(Complaint.id.in_(ids))}
+    assert len(groups) == 1 and None not in groups
+    (root,) = groups
+    assert root in ids
+    assert db.get(Complaint, root).duplicates_count == n - 1
@@ -0,0 +1,131 @@
+# backend/train_nlp_fast.py
+"""
+Обучение первой ступени NLP-каскада (app/ai/nlp_fast.py) по уже размеченным жалобам.
+
+Разметка — ответы XLM-R, сохранённые в complaints (nlp_category / nlp_urgency).
+Ответы самой первой ступени (nlp_source = "fast/…") в обучение не берём,
+чтобы модель не училась на собственных ошибках. Плюс словарь-затравка SEED_LEXICON.
+
+  python train_nlp_fast.py --dry-run                 # только отчёт на отложенной выборке
+  python train_nlp_fast.py --epochs 8 --holdout 0.2  # обучить и сохранить в NLP_FAST_MODEL_PATH
+  python train_nlp_fast.py --report data/models/nlp_fast.report.json
+
+Отчёт по головам: accuracy (согласие с XLM-R), hit rate — доля текстов, на которых
+первая ступень уверена (≥ порога) и XLM-R не вызывается, и accuracy на них.
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from sqlalchemy import or_
+
+from app.ai.nlp_fast import FastTextModel, Sample, seed_samples, train
+from app.ai.nlp_zero_shot import CATEGORIES, URGENCY
+from app.db import SessionLocal, engine
+from app.migrations import upgrade_schema
+from app.models import Complaint
+from app.settings import settings
+
+LABELS = {"category": CATEGORIES, "urgency": URGENCY}
+
+
+def load_samples(limit: int | None) -> list[Sample]:
+    db = SessionLocal()
+    try:
+        q = (
+            db.query(Complaint.text, Complaint.lang, Complaint.nlp_category, Complaint.nlp_urgency, Complaint.nlp_source)
+            .filter(Complaint.text.isnot(None), Complaint.text != "")
+            .filter(or_(Complaint.nlp_category.in_(CATEGORIES), Complaint.nlp_urgency.in_(URGENCY)))
+            .order_by(Complaint.created_at.asc(), Complaint.id.asc())
+        )
+        if limit:
+            q = q.limit(limit)
+        out: list[Sample] = []
+        for text, lang, category, urgency, source in q:
+            cat_src, _, urg_src = (source or "teacher/teacher").partition("/")
+            y = {}
+            if category in CATEGORIES and cat_src == "teacher":
+                y["category"] = category
+            if urgency in URGENCY and urg_src == "teacher":
+                y["urgency"] = urgency
+            if y:
+                out.append((text, lang or "ru", y))
+        return out
+    finally:
+        db.close()
+
+
+def evaluate(model: FastTextModel, samples: list[Sample], threshold: float) -> dict:
+    stats = {h: {"n": 0, "correct": 0, "hits": 0, "hits_correct": 0} for h in LABELS}
+    for text, lang, y in samples:
+        pred = model.predict(text, lang)
+        for head, label in y.items():
+            got, conf = pred[head]
+            s = stats[head]
+            s["n"] += 1
+            s["correct"] += got == label
+            if conf >= threshold:
+                s["hits"] += 1
+                s["hits_correct"] += got == label
+    out = {}
+    for head, s in stats.items():
+        n = s["n"] or 1
+        out[head] = {
+            "n": s["n"],
+            "accuracy": round(s["correct"] / n, 4),
+            "hit_rate": round(s["hits"] / n, 4),
+            "hit_accuracy": round(s["hits_correct"] / (s["hits"] or 1), 4),
+        }
+    # вызовов XLM-R на текст: было 2 (по одному на голову)
+    out["teacher_calls_per_text"] = round(sum(1 - out[h]["hit_rate"] for h in LABELS), 4)
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description="Train the fast first-stage NLP classifier from labelled complaints.")
+    p.add_argument("--limit", type=int, default=None, help="взять не больше N жалоб")
+    p.add_argument("--holdout", type=float, default=0.2, help="доля для оценки")
+    p.add_argument("--epochs", type=int, default=8)
+    p.add_argument("--lr", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--threshold", type=float, default=settings.NLP_FAST_THRESHOLD)
+    p.add_argument("--no-lexicon", action="store_true", help="не добавлять словарь-затравку")
+    p.add_argument("--out", type=Path, default=settings.NLP_FAST_MODEL_PATH)
+    p.add_argument("--report", type=Path, default=None, help="куда записать отчёт (JSON)")
+    p.add_argument("--dry-run", action="store_true", help="не сохранять модель")
+    args = p.parse_args()
+
+    upgrade_schema(engine)
+    rows = load_samples(args.limit)
+    random.Random(args.seed).shuffle(rows)
+    n_test = int(len(rows) * args.holdout)
+    test, train_rows = rows[:n_test], rows[n_test:]
+    if not args.no_lexicon:
+        train_rows = train_rows + seed_samples()
+    if not train_rows:
+        raise SystemExit("Нет размеченных жалоб и словарь отключён — обучать не на чем.")
+
+    t0 = time.perf_counter()
+    model = train(train_rows, LABELS, epochs=args.epochs, lr=args.lr, seed=args.seed)
+    report = {
+        "rows": len(rows),
+        "train": len(train_rows),
+        "holdout": len(test),
+        "threshold": args.threshold,
+        "train_s": round(time.perf_counter() - t0, 2),
+        "eval": evaluate(model, test, args.threshold) if test else None,
+    }
+
+    if not args.dry_run:
+        model.save(args.out)
+        report["model"] = str(args.out)
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()